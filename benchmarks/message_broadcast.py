@@ -0,0 +1,72 @@
+"""Measure swarm-wide broadcast latency of the IR message network
+
+For every robot count a swarm is generated with a fixed seed and one robot
+broadcasts a message. The robots stand still, so the link table is
+computed once and every tick only runs the message network. Reported are
+the ticks until 50%, 90% and all robots had the message, the number of
+transmissions and the time per network step, for every router.
+
+Usage:
+    python benchmarks/message_broadcast.py [--counts 500 1000] [--layout grid] [--spacing 0.4]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models.message_network import ROUTERS  # noqa: E402
+from models.simulation import Simulation  # noqa: E402
+from models.swarm_generator import LAYOUTS, populate_simulation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[500, 1000], help="robot counts")
+    parser.add_argument('--layout', choices=LAYOUTS, default='grid')
+    parser.add_argument('--spacing', type=float, default=0.4, help="grid spacing (m)")
+    parser.add_argument('--routers', choices=ROUTERS, nargs='+', default=list(ROUTERS))
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--transmit-probability', type=float, default=0.5)
+    parser.add_argument('--max-ticks', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'robots':>8}{'router':>10}{'links':>9}{'t50':>6}{'t90':>6}{'t100':>6}"
+          f"{'transmissions':>15}{'step (ms)':>11}")
+    for count in args.counts:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        simulation = Simulation()
+        side = args.spacing * (int(np.ceil(np.sqrt(count))) + 2)
+        populate_simulation(simulation, count, layout=args.layout, spacing=args.spacing,
+                            arena=(side, side), seed=args.seed)
+        links = simulation.link_engine.compute()
+
+        for router in args.routers:
+            network = simulation.enable_messaging(router, repeats=args.repeats,
+                                                  transmit_probability=args.transmit_probability,
+                                                  seed=args.seed)
+            network.step(links, 0)  # Learn the robots (and the tree)
+            message = network.send(simulation.robots[0].id)
+            times = []
+            for tick in range(1, args.max_ticks + 1):
+                start = time.perf_counter()
+                network.step(links, tick)
+                times.append((time.perf_counter() - start) * 1000)
+                if network.coverage(message) >= 1.0 and not any(network.outboxes):
+                    break
+
+            latencies = [network.latency(message, fraction) for fraction in (0.5, 0.9, 1.0)]
+            latencies = ['-' if latency is None else str(latency) for latency in latencies]
+            print(f"{count:>8}{router:>10}{len(links):>9}{latencies[0]:>6}{latencies[1]:>6}{latencies[2]:>6}"
+                  f"{network.stats['transmissions']:>15}{np.median(times):>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
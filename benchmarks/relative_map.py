@@ -0,0 +1,65 @@
+"""Measure the accuracy and cost of the swarm-wide relative map
+
+For every robot count a swarm is generated with a fixed seed. The robots
+wander randomly for a number of ticks while the relative map is solved
+after every simulation update. The first solve is a cold start (classical
+MDS), the later ones are warm-started from the previous tick. Errors are
+measured against the true positions after aligning each connected group.
+
+Usage:
+    python benchmarks/relative_map.py [--counts 50 100 300] [--layout uniform] [--ticks 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models.simulation import Simulation  # noqa: E402
+from models.swarm_generator import LAYOUTS, populate_simulation  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[50, 100, 300], help="robot counts")
+    parser.add_argument('--layout', choices=LAYOUTS, default='uniform')
+    parser.add_argument('--ticks', type=int, default=20)
+    parser.add_argument('--step', type=float, default=0.005, help="random motion per tick (m)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'robots':>8}{'edges':>8}{'groups':>8}{'cold (ms)':>11}{'warm (ms)':>11}"
+          f"{'rmse (m)':>10}{'max (m)':>9}{'residual (m)':>14}")
+    for count in args.counts:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        rng = np.random.default_rng(args.seed)
+        simulation = Simulation()
+        populate_simulation(simulation, count, layout=args.layout, seed=args.seed)
+        solver = simulation.enable_relative_map(seed=args.seed)
+
+        # Solve outside update() to time the solver alone
+        simulation.relative_map = None
+        times = []
+        for _ in range(args.ticks):
+            for robot in simulation.robots:
+                robot.x += rng.normal(0, args.step * simulation.scale)
+                robot.y += rng.normal(0, args.step * simulation.scale)
+            simulation.update()
+            start = time.perf_counter()
+            solver.update(simulation)
+            times.append((time.perf_counter() - start) * 1000)
+
+        metrics = solver.accuracy(simulation)
+        warm = np.median(times[1:]) if len(times) > 1 else float('nan')
+        print(f"{count:>8}{metrics['edges']:>8}{metrics['components']:>8}{times[0]:>11.1f}{warm:>11.1f}"
+              f"{metrics['rmse']:>10.3f}{metrics['max_error']:>9.3f}{metrics['residual_rms']:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
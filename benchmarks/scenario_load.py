@@ -0,0 +1,62 @@
+"""Measure generating, saving and loading synthetic swarm scenarios
+
+For every robot count a scenario is generated with a fixed seed, written
+to a JSON scenario file, read back and applied to a fresh Simulation.
+Use --output to keep the generated files as inputs for other benchmarks.
+
+Usage:
+    python benchmarks/scenario_load.py [--counts 100 1000 5000] [--layout uniform] [--output DIR]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models.scenario import load_scenario, save_scenario  # noqa: E402
+from models.simulation import Simulation  # noqa: E402
+from models.swarm_generator import LAYOUTS, generate_swarm  # noqa: E402
+
+
+def timed(func, *args, **kwargs):
+    """Return (result, milliseconds) of one call"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 1000, 5000], help="robot counts")
+    parser.add_argument('--layout', choices=LAYOUTS, default='uniform')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="directory to keep the generated scenario files in")
+    args = parser.parse_args()
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        run(args, args.output)
+        print(f"Scenario files written to {args.output}")
+    else:
+        with tempfile.TemporaryDirectory(prefix='scenarios-') as output:
+            run(args, output)
+
+
+def run(args, output):
+    """Time each step for every robot count, files go to output"""
+    print(f"{'robots':>8}{'generate (ms)':>15}{'save (ms)':>12}{'load (ms)':>12}{'apply (ms)':>12}")
+    for count in args.counts:
+        scenario, generate_ms = timed(generate_swarm, count, layout=args.layout,
+                                      waypoints=8, seed=args.seed)
+        filename = os.path.join(output, f"{args.layout}_{count}.json")
+        _, save_ms = timed(save_scenario, scenario, filename)
+        loaded, load_ms = timed(load_scenario, filename)
+        _, apply_ms = timed(loaded.apply, Simulation())
+        print(f"{count:>8}{generate_ms:>15.1f}{save_ms:>12.1f}{load_ms:>12.1f}{apply_ms:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Measure start-up import time of the GUI and headless entry points
+
+Each measurement runs in a fresh interpreter so that module caches do not
+hide the cost. The 'eager' variant additionally imports the evaluation
+window module, which is what every launch paid before plotting was split
+out of models.path_manager.
+
+Usage:
+    python benchmarks/startup_time.py [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    # What main.py imports before creating the window
+    'gui': "import ui.main_window, models.simulation, models.path_manager",
+    # Batch scripts: simulation + path following + export, no UI
+    'headless': "import models.simulation, models.path_manager, utils.data_export",
+}
+
+EAGER_IMPORT = "import ui.path_analysis"
+
+SNIPPET = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(elapsed, int('matplotlib' in sys.modules))
+"""
+
+
+def measure(imports, repeat):
+    """Return (median seconds, matplotlib loaded) over `repeat` fresh interpreters"""
+    timings = []
+    loaded = False
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SNIPPET.format(imports=imports)],
+            cwd=ROOT, text=True)
+        elapsed, has_matplotlib = output.split()
+        timings.append(float(elapsed))
+        loaded = bool(int(has_matplotlib))
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="interpreter launches per measurement")
+    args = parser.parse_args()
+
+    print(f"{'entry point':<12}{'lazy (ms)':>12}{'eager (ms)':>12}{'gain (ms)':>12}  matplotlib loaded (lazy)")
+    for name, imports in ENTRY_POINTS.items():
+        lazy, lazy_loaded = measure(imports, args.repeat)
+        eager, _ = measure(f"{imports}\n{EAGER_IMPORT}", args.repeat)
+        print(f"{name:<12}{lazy * 1000:>12.1f}{eager * 1000:>12.1f}{(eager - lazy) * 1000:>12.1f}  {lazy_loaded}")
+
+
+if __name__ == '__main__':
+    main()
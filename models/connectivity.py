@@ -0,0 +1,261 @@
+"""Robot-level connectivity graph kept up to date from link diffs
+
+The link table of a tick lists sensor-level links. The graph keeps the
+directed robot pairs (transmitting robot, receiving robot) as a sorted
+NumPy key array together with the tick each pair was last heard, so every
+update is a vectorized merge that yields the pairs that came up and went
+down. Only those diffs touch the adjacency (dict of robot id -> {neighbour
+id: directions}) and the connected components:
+
+    - an added edge merges two components, relabelling the smaller one
+    - a removed edge searches from one end for the other, and splits the
+      component only when it is not reached
+
+Two robots are neighbours when either hears the other. With a transmission
+schedule a pair stays up until it was not heard for max_age ticks, so
+links do not flap between the slots of a schedule.
+"""
+from collections import deque
+import numpy as np
+
+# Directed pair key: transmitting robot id * PAIR_KEY + receiving robot id
+PAIR_KEY = 1 << 32
+
+
+def encode_pairs(tx_ids, rx_ids):
+    """Int64 keys of directed (transmitting robot id, receiving robot id) pairs, sorted like the pairs"""
+    return np.asarray(tx_ids, dtype=np.int64) * PAIR_KEY + np.asarray(rx_ids, dtype=np.int64)
+
+
+def decode_pairs(keys):
+    """(tx_ids, rx_ids) arrays of pair keys made by encode_pairs"""
+    return np.divmod(np.asarray(keys, dtype=np.int64), PAIR_KEY)
+
+
+class ConnectivityGraph:
+    """Adjacency, connected components and degrees of the robots"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget all robots and links"""
+        self.keys = np.empty(0, dtype=np.int64)        # Sorted directed pair keys that are up
+        self.last_heard = np.empty(0, dtype=np.int64)  # Tick each pair was last heard
+        self.adjacency = {}    # robot_id -> {neighbour_id: number of directions heard (1 or 2)}
+        self.component = {}    # robot_id -> component label
+        self.members = {}      # component label -> set of robot ids
+        self.version = 0       # Incremented whenever an edge or robot changes
+        self._next_label = 0
+        self._diameters = {}   # component label -> (version, estimate)
+
+    def __len__(self):
+        return len(self.adjacency)
+
+    def update(self, links, tick, max_age=1, robot_ids=None):
+        """Apply the links of one tick
+
+        Args:
+            links: LinkTable of the tick
+            tick: Tick number
+            max_age: Ticks without reception after which a pair goes down
+            robot_ids: All robots in the simulation, to add isolated robots and drop removed ones
+
+        Returns:
+            (added, removed): (N, 2) arrays of directed (tx robot id, rx robot id) pairs
+        """
+        if robot_ids is not None:
+            self._sync_robots(robot_ids)
+
+        if links is not None and len(links):
+            other = links.tx_robot != links.rx_robot
+            heard = np.unique(encode_pairs(links.tx_robot[other], links.rx_robot[other]))
+        else:
+            heard = np.empty(0, dtype=np.int64)
+
+        # Merge the pairs heard now into the sorted pairs that are up
+        keys = np.union1d(self.keys, heard)
+        last_heard = np.full(len(keys), tick, dtype=np.int64)
+        known = np.searchsorted(keys, self.keys)
+        was_heard = np.isin(keys[known], heard)
+        last_heard[known[~was_heard]] = self.last_heard[~was_heard]
+
+        alive = tick - last_heard < max_age
+        added = np.setdiff1d(heard, self.keys, assume_unique=True)
+        removed = keys[~alive]
+        self.keys, self.last_heard = keys[alive], last_heard[alive]
+
+        added_pairs = np.column_stack(decode_pairs(added))
+        removed_pairs = np.column_stack(decode_pairs(removed))
+        for tx, rx in removed_pairs.tolist():
+            self._remove_direction(tx, rx)
+        for tx, rx in added_pairs.tolist():
+            self._add_direction(tx, rx)
+        return added_pairs, removed_pairs
+
+    def neighbours(self, robot_id):
+        """Robots that hear or are heard by a robot"""
+        return set(self.adjacency.get(robot_id, ()))
+
+    def degree(self, robot_id):
+        """Number of neighbours of a robot"""
+        return len(self.adjacency.get(robot_id, ()))
+
+    def degrees(self):
+        """(robot_ids, in_degree, out_degree, degree) arrays, sorted by robot id
+
+        in_degree counts the robots a robot hears, out_degree the robots
+        that hear it.
+        """
+        ids = np.array(sorted(self.adjacency), dtype=np.int64)
+        tx, rx = decode_pairs(self.keys)
+        out_degree = np.zeros(len(ids), dtype=np.int64)
+        in_degree = np.zeros(len(ids), dtype=np.int64)
+        if len(ids):
+            np.add.at(out_degree, np.searchsorted(ids, tx), 1)
+            np.add.at(in_degree, np.searchsorted(ids, rx), 1)
+        degree = np.array([len(self.adjacency[robot_id]) for robot_id in ids.tolist()], dtype=np.int64)
+        return ids, in_degree, out_degree, degree
+
+    def component_of(self, robot_id):
+        """Set of robots connected to a robot (itself included)"""
+        label = self.component.get(robot_id)
+        return set() if label is None else set(self.members[label])
+
+    def components(self):
+        """Connected components as sets of robot ids, largest first"""
+        return sorted((set(members) for members in self.members.values()), key=len, reverse=True)
+
+    def is_connected(self, first_id, second_id):
+        """Whether two robots can reach each other over links"""
+        label = self.component.get(first_id)
+        return label is not None and label == self.component.get(second_id)
+
+    def all_connected(self, robot_ids):
+        """Whether all given robots are in one component (e.g. a formation health check)"""
+        labels = {self.component.get(robot_id) for robot_id in robot_ids}
+        return len(labels) <= 1 and None not in labels
+
+    def diameter(self, robot_id=None):
+        """Hop diameter estimate of the component of a robot (default the largest)
+
+        Uses a double breadth-first sweep, which gives a lower bound that is
+        exact on trees and usually close on swarm graphs. Cached until the
+        graph changes.
+        """
+        if robot_id is None:
+            if not self.members:
+                return 0
+            label = max(self.members, key=lambda key: len(self.members[key]))
+        else:
+            label = self.component.get(robot_id)
+            if label is None:
+                return 0
+        cached = self._diameters.get(label)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+
+        start = next(iter(self.members[label]))
+        far, _ = self._farthest(start)
+        _, estimate = self._farthest(far)
+        self._diameters[label] = (self.version, estimate)
+        return estimate
+
+    def _farthest(self, start):
+        """(robot farthest from start in hops, its distance)"""
+        distance = {start: 0}
+        queue = deque([start])
+        node = start
+        while queue:
+            node = queue.popleft()
+            for other in self.adjacency[node]:
+                if other not in distance:
+                    distance[other] = distance[node] + 1
+                    queue.append(other)
+        return node, distance[node]
+
+    def _sync_robots(self, robot_ids):
+        robot_ids = set(robot_ids)
+        for robot_id in [robot_id for robot_id in self.adjacency if robot_id not in robot_ids]:
+            self._remove_robot(robot_id)
+        for robot_id in robot_ids:
+            if robot_id not in self.adjacency:
+                self._add_robot(robot_id)
+
+    def _add_robot(self, robot_id):
+        self.adjacency[robot_id] = {}
+        label = self._next_label
+        self._next_label += 1
+        self.component[robot_id] = label
+        self.members[label] = {robot_id}
+        self.version += 1
+
+    def _remove_robot(self, robot_id):
+        # Drop its pairs from the arrays without reporting them
+        tx, rx = decode_pairs(self.keys)
+        keep = (tx != robot_id) & (rx != robot_id)
+        self.keys, self.last_heard = self.keys[keep], self.last_heard[keep]
+        for other in list(self.adjacency[robot_id]):
+            del self.adjacency[other][robot_id]
+            del self.adjacency[robot_id][other]
+            self._split(robot_id, other)
+        label = self.component.pop(robot_id)
+        self.members[label].discard(robot_id)
+        if not self.members[label]:
+            del self.members[label]
+        del self.adjacency[robot_id]
+        self.version += 1
+
+    def _add_direction(self, tx, rx):
+        for robot_id in (tx, rx):
+            if robot_id not in self.adjacency:
+                self._add_robot(robot_id)
+        directions = self.adjacency[tx].get(rx, 0)
+        self.adjacency[tx][rx] = self.adjacency[rx][tx] = directions + 1
+        if directions == 0:
+            self._merge(tx, rx)
+            self.version += 1
+
+    def _remove_direction(self, tx, rx):
+        directions = self.adjacency.get(tx, {}).get(rx, 0)
+        if directions == 0:
+            return
+        if directions > 1:
+            self.adjacency[tx][rx] = self.adjacency[rx][tx] = directions - 1
+            return
+        del self.adjacency[tx][rx]
+        del self.adjacency[rx][tx]
+        self._split(tx, rx)
+        self.version += 1
+
+    def _merge(self, first, second):
+        """Join the components of two robots, relabelling the smaller one"""
+        label, other = self.component[first], self.component[second]
+        if label == other:
+            return
+        if len(self.members[label]) < len(self.members[other]):
+            label, other = other, label
+        for robot_id in self.members[other]:
+            self.component[robot_id] = label
+        self.members[label] |= self.members.pop(other)
+
+    def _split(self, first, second):
+        """After removing the edge first-second, split the component if they got disconnected"""
+        seen = {first}
+        queue = deque([first])
+        while queue:
+            node = queue.popleft()
+            for other in self.adjacency[node]:
+                if other == second:
+                    return
+                if other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+
+        old = self.component[first]
+        label = self._next_label
+        self._next_label += 1
+        self.members[old] -= seen
+        self.members[label] = seen
+        for robot_id in seen:
+            self.component[robot_id] = label
@@ -0,0 +1,201 @@
+"""Compact events published by the simulation step
+
+Instead of diffing receiver.signals dicts after every update, consumers
+(UI, recorder, controllers) subscribe to a stream of small Event tuples:
+
+    LINK_UP          robot_id started hearing other_id, value is the strength
+    LINK_DOWN        robot_id stopped hearing other_id (not heard for max_age ticks)
+    STRENGTH_ABOVE   the strongest signal of other_id at robot_id rose to threshold value
+    STRENGTH_BELOW   it fell below threshold value - hysteresis
+    WAYPOINT_REACHED the path leader robot_id reached waypoint number value
+
+Link events come from the diffs of the connectivity graph, so they are per
+robot pair, not per sensor pair. Threshold crossings are detected on the
+strongest link of each pair that is up, vectorized over the link table.
+
+Every subscription owns a bounded queue. When a consumer does not poll
+often enough the oldest events are dropped and counted, so a stalled UI
+never makes the simulation thread grow memory. Subscriptions with a
+callback are called on the simulation thread instead of queueing.
+"""
+from collections import deque, namedtuple
+import numpy as np
+
+from models.connectivity import encode_pairs, decode_pairs
+
+LINK_UP = 'link_up'
+LINK_DOWN = 'link_down'
+STRENGTH_ABOVE = 'strength_above'
+STRENGTH_BELOW = 'strength_below'
+WAYPOINT_REACHED = 'waypoint_reached'
+EVENT_TYPES = (LINK_UP, LINK_DOWN, STRENGTH_ABOVE, STRENGTH_BELOW, WAYPOINT_REACHED)
+
+Event = namedtuple('Event', 'tick type robot_id other_id value')
+
+
+class Subscription:
+    """Bounded queue of the events matching a filter"""
+
+    def __init__(self, bus, callback=None, types=None, robot_ids=None, maxlen=1024):
+        if types is not None:
+            unknown = set(types) - set(EVENT_TYPES)
+            if unknown:
+                raise ValueError(f"Unknown event types: {sorted(unknown)}")
+        if maxlen < 1:
+            raise ValueError("maxlen must be at least 1")
+        self.bus = bus
+        self.callback = callback
+        self.types = None if types is None else frozenset(types)
+        self.robot_ids = None if robot_ids is None else frozenset(robot_ids)
+        self.queue = deque(maxlen=maxlen)
+        self.dropped = 0  # Events lost because the queue was full
+
+    def __len__(self):
+        return len(self.queue)
+
+    def matches(self, event):
+        return ((self.types is None or event.type in self.types)
+                and (self.robot_ids is None or event.robot_id in self.robot_ids))
+
+    def deliver(self, events):
+        events = [event for event in events if self.matches(event)]
+        if not events:
+            return
+        if self.callback is not None:
+            try:
+                self.callback(events)
+            except Exception as e:
+                print(f"Error in event callback: {e}")
+            return
+        overflow = len(self.queue) + len(events) - self.queue.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self.queue.extend(events)
+
+    def poll(self, max_events=None):
+        """Take the queued events, oldest first"""
+        events = []
+        while self.queue and (max_events is None or len(events) < max_events):
+            events.append(self.queue.popleft())
+        return events
+
+    def close(self):
+        """Stop receiving events"""
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Publishes the events of the simulation to its subscriptions"""
+
+    def __init__(self, thresholds=(20.0, 50.0, 80.0), hysteresis=5.0):
+        """
+        Args:
+            thresholds: Strength levels (0-100) whose crossings are reported
+            hysteresis: A pair above a threshold goes below only under threshold - hysteresis
+        """
+        self.subscriptions = []
+        self.set_thresholds(thresholds, hysteresis)
+
+    def set_thresholds(self, thresholds, hysteresis=5.0):
+        """Change the strength levels and forget the crossing state"""
+        if hysteresis < 0:
+            raise ValueError("hysteresis must not be negative")
+        self.thresholds = np.sort(np.asarray(thresholds, dtype=float))
+        self.hysteresis = float(hysteresis)
+        self.reset()
+
+    def reset(self):
+        """Forget the crossing state (subscriptions are kept)"""
+        self.keys = np.empty(0, dtype=np.int64)    # Sorted pair keys with a known level
+        self.levels = np.empty(0, dtype=np.int64)  # Number of thresholds each pair is above
+
+    @property
+    def active(self):
+        """Whether anyone listens, events are only built then"""
+        return bool(self.subscriptions)
+
+    def subscribe(self, callback=None, types=None, robot_ids=None, maxlen=1024):
+        """Receive events, by queue (poll it) or by callback(events)
+
+        Args:
+            callback: Called with the list of matching events of each publish, instead of queueing
+            types: Event types to receive (default all of EVENT_TYPES)
+            robot_ids: Only events about these robots (default all)
+            maxlen: Queue size, older events are dropped beyond it
+        """
+        subscription = Subscription(self, callback, types, robot_ids, maxlen)
+        self.subscriptions = self.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions = [other for other in self.subscriptions if other is not subscription]
+
+    def publish(self, events):
+        """Hand events to every subscription whose filter they match"""
+        # subscribe() replaces the list, so callbacks may subscribe or close while iterating
+        for subscription in self.subscriptions:
+            subscription.deliver(events)
+
+    def link_events(self, tick, added, removed, links, up_keys):
+        """Events of one update from the connectivity diffs and the link table
+
+        Args:
+            tick: Tick number
+            added, removed: (N, 2) directed (tx robot id, rx robot id) pairs from ConnectivityGraph.update
+            links: LinkTable of the tick
+            up_keys: Sorted keys of all pairs that are up (ConnectivityGraph.keys)
+        """
+        # Strongest link per pair heard in this tick
+        if links is not None and len(links):
+            other = links.tx_robot != links.rx_robot
+            keys = encode_pairs(links.tx_robot[other], links.rx_robot[other])
+            strength = links.strength[other]
+            order = np.lexsort((-strength, keys))
+            keys, strength = keys[order], strength[order]
+            first = np.ones(len(keys), dtype=bool)
+            first[1:] = keys[1:] != keys[:-1]
+            heard, best = keys[first], strength[first]
+        else:
+            heard, best = np.empty(0, dtype=np.int64), np.empty(0)
+
+        events = []
+        for tx, rx in removed.tolist():
+            events.append(Event(tick, LINK_DOWN, rx, tx, None))
+        added_keys = encode_pairs(added[:, 0], added[:, 1])
+        added_strength = best[np.searchsorted(heard, added_keys)] if len(added_keys) else best[:0]
+        for (tx, rx), strength in zip(added.tolist(), added_strength.tolist()):
+            events.append(Event(tick, LINK_UP, rx, tx, strength))
+
+        # Keep the level only of pairs that are still up
+        keep = np.isin(self.keys, up_keys, assume_unique=True)
+        self.keys, self.levels = self.keys[keep], self.levels[keep]
+        if not len(self.thresholds) or not len(heard):
+            return events
+
+        thresholds = self.thresholds
+        rising = np.searchsorted(thresholds, best, side='right')                   # Levels reached going up
+        falling = np.searchsorted(thresholds, best + self.hysteresis, side='right')  # Levels kept going down
+        previous = rising.copy()
+        known = np.isin(heard, self.keys, assume_unique=True)
+        previous[known] = self.levels[np.searchsorted(self.keys, heard[known])]
+        level = np.clip(previous, rising, falling)
+
+        # A new pair starts at its level silently, LINK_UP carries its strength
+        changed = np.flatnonzero(level != previous)
+        changed_tx, changed_rx = decode_pairs(heard[changed])
+        for index, tx, rx in zip(changed.tolist(), changed_tx.tolist(), changed_rx.tolist()):
+            old, new = int(previous[index]), int(level[index])
+            if new > old:
+                for threshold in thresholds[old:new].tolist():
+                    events.append(Event(tick, STRENGTH_ABOVE, rx, tx, threshold))
+            else:
+                for threshold in thresholds[new:old][::-1].tolist():
+                    events.append(Event(tick, STRENGTH_BELOW, rx, tx, threshold))
+
+        # Merge the new levels into the sorted state
+        keys = np.union1d(self.keys, heard)
+        levels = np.zeros(len(keys), dtype=np.int64)
+        levels[np.searchsorted(keys, self.keys)] = self.levels
+        levels[np.searchsorted(keys, heard)] = level
+        self.keys, self.levels = keys, levels
+        return events
@@ -1,6 +1,10 @@
 import math
 from utils.geometry import distance_between_points, check_line_of_sight
 import threading
+import numpy as np
+
+# Keys of a sensor configuration: beam distance in meters, angles in degrees
+SENSOR_CONFIG_KEYS = ('beam_angle', 'beam_distance', 'beam_offset', 'viewing_angle')
 
 class IRSensor:
     """Base class for IR sensor types"""
@@ -10,27 +14,18 @@ class IRSensor:
         self.position_index = position_index
         self.rel_x = rel_x
         self.rel_y = rel_y
+        # Position in the robot frame in half robot sizes, on the edge of its side
+        # (a SensorLayout sets it directly)
+        self.local_x = (rel_x, 1.0, rel_x, -1.0)[side]
+        self.local_y = (-1.0, rel_y, 1.0, rel_y)[side]
     
     def get_position(self, robot_x, robot_y, robot_size, robot_orientation):
         """Calculate sensor position based on robot information"""
         half_size = robot_size / 2
-        
-        # Relative position based on side and position_index
-        if self.side == 0:  # top
-            rel_x = self.rel_x * half_size
-            rel_y = -half_size
-        elif self.side == 1:  # right
-            rel_x = half_size
-            rel_y = self.rel_y * half_size
-        elif self.side == 2:  # bottom
-            rel_x = self.rel_x * half_size
-            rel_y = half_size
-        else:  # left
-            rel_x = -half_size
-            rel_y = self.rel_y * half_size
+        rel_x = self.local_x * half_size
+        rel_y = self.local_y * half_size
         
         # Apply rotation based on robot orientation
-        import math
         angle_rad = math.radians(robot_orientation)
         rotated_x = rel_x * math.cos(angle_rad) - rel_y * math.sin(angle_rad)
         rotated_y = rel_x * math.sin(angle_rad) + rel_y * math.cos(angle_rad)
@@ -115,6 +110,8 @@ class IRReceiver(IRSensor):
         self.real_max_distance = 0.8
         self.direction_offset = 0
         self.signals = {}
+        self.signal_ticks = {}  # Tick in which each signal was last received
+        self.filtered_signals = {}  # Strength per transmitter smoothed over the signal history
         self.signals_lock = threading.Lock()
         self.snr = 0.0  # Add variable to store SNR
     
@@ -122,11 +119,46 @@ class IRReceiver(IRSensor):
         """Clear all received signals"""
         with self.signals_lock:  # Lock while modifying
             self.signals.clear()
+            self.signal_ticks.clear()
+            self.filtered_signals.clear()
     
-    def add_signal(self, transmitter_id, strength):
-        """Add signal from a transmitter"""
+    def add_signal(self, transmitter_id, strength, tick=None, filtered=None):
+        """Add signal from a transmitter, received in the given simulation tick
+
+        filtered is the strength smoothed over the signal history, if kept
+        """
         with self.signals_lock:  # Lock while modifying
             self.signals[transmitter_id] = strength
+            self.signal_ticks[transmitter_id] = tick
+            self.filtered_signals[transmitter_id] = strength if filtered is None else filtered
+
+    def get_filtered_signal(self, transmitter_id):
+        """Smoothed strength of a transmitter's signal, None if not received"""
+        with self.signals_lock:
+            return self.filtered_signals.get(transmitter_id, self.signals.get(transmitter_id))
+
+    def expire_signals(self, tick, max_age):
+        """Drop signals not received again within max_age ticks before tick
+
+        Returns:
+            list: Transmitter ids whose signal was dropped
+        """
+        with self.signals_lock:
+            stale = [tx_id for tx_id, received in self.signal_ticks.items()
+                     if received is None or tick - received >= max_age]
+            for tx_id in stale:
+                del self.signals[tx_id]
+                del self.signal_ticks[tx_id]
+                self.filtered_signals.pop(tx_id, None)
+                if hasattr(self, 'estimated_distances'):
+                    self.estimated_distances.pop(tx_id, None)
+            return stale
+
+    def get_signal_age(self, transmitter_id, tick):
+        """Ticks since the signal of a transmitter was received, None if not held"""
+        with self.signals_lock:
+            received = self.signal_ticks.get(transmitter_id)
+            return None if received is None else tick - received
     
     def get_total_signal(self):
         """Calculate total signal strength"""
@@ -248,13 +280,64 @@ class IRReceiver(IRSensor):
         
         return estimated_distance
 
+def apply_sensor_config(robots, config, scale):
+    """Set the sensor parameters of many robots at once
+
+    Args:
+        robots: Robots to configure
+        config: Dict with any of SENSOR_CONFIG_KEYS, each a single value or one value per robot
+        scale: Pixels per meter of the simulation
+    """
+    unknown = set(config) - set(SENSOR_CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sensor parameters: {sorted(unknown)}")
+    robots = list(robots)
+    if not robots:
+        return
+    count = len(robots)
+    values = {key: np.broadcast_to(np.asarray(value, dtype=np.float64), (count,))
+              for key, value in config.items() if value is not None}
+
+    if 'beam_distance' in values:
+        real_distance = np.round(values['beam_distance'], 2)
+        pixel_distance = np.round(real_distance * scale, 2).tolist()
+        real_distance = real_distance.tolist()
+        for i, robot in enumerate(robots):
+            for transmitter in robot.transmitters:
+                transmitter.beam_distance = pixel_distance[i]
+                transmitter.real_beam_distance = real_distance[i]
+            for receiver in robot.receivers:
+                receiver.max_distance = pixel_distance[i]
+                receiver.real_max_distance = real_distance[i]
+    if 'beam_angle' in values:
+        beam_angle = values['beam_angle'].tolist()
+        for i, robot in enumerate(robots):
+            for transmitter in robot.transmitters:
+                transmitter.beam_angle = beam_angle[i]
+    if 'viewing_angle' in values:
+        viewing_angle = values['viewing_angle'].tolist()
+        for i, robot in enumerate(robots):
+            for receiver in robot.receivers:
+                receiver.viewing_angle = viewing_angle[i]
+    if 'beam_offset' in values:
+        # Transmitters turn away from the middle of their side, in the sign given by the robot's layout
+        beam_offset = values['beam_offset'].tolist()
+        for i, robot in enumerate(robots):
+            for transmitter, outward in zip(robot.transmitters, robot.layout.tx_outward_list):
+                transmitter.beam_direction_offset = outward * beam_offset[i]
+
 # Add to IR signal transmission and reception processing section
 from utils.ir_physics import distance_to_signal_strength, signal_strength_to_distance
 
-def can_receive_signal(transmitter, receiver, robot_positions, obstacles=None, debug=False):
+def can_receive_signal(transmitter, receiver, robot_positions, obstacles=None, debug=False,
+                       static_obstacles=None, scale=250):
     """
     Check and calculate signal from transmitter to receiver
     using Rician model with uniform attenuation
+
+    obstacles are the robot outlines of this tick, static_obstacles an
+    optional list of static maps (StaticObstacleMap, OccupancyGrid),
+    queried with scale pixels per meter
     """
     # Get position and orientation from robot_positions (keep unchanged)
     tx_robot = robot_positions[transmitter.robot_id]
@@ -318,6 +401,8 @@ def can_receive_signal(transmitter, receiver, robot_positions, obstacles=None, d
     has_los = True
     if obstacles:
         has_los = check_line_of_sight(tx_pos, rx_pos, obstacles)
+    if has_los and static_obstacles:
+        has_los = all(static_map.line_of_sight(tx_pos, rx_pos, scale) for static_map in static_obstacles)
     
     # Use new function to calculate signal strength - DO NOT use pathloss
     from utils.ir_physics import distance_to_signal_strength_rician
@@ -0,0 +1,666 @@
+"""Vectorized evaluation of all IR links of a simulation tick
+
+LinkEngine computes every transmitter -> receiver link in a few numpy
+passes instead of calling can_receive_signal for each sensor pair:
+candidate robot pairs by distance, beam and viewing cones, occlusion, then
+the Rician signal strength and distance estimate of utils.ir_physics.
+
+Walls of the static obstacle map also reflect signals. Reflected paths use
+the image-source method: a wall mirrors the transmitter into an image
+source and the reflected ray is the straight line from the image to the
+receiver; n bounces use images of images. Wall normals and offsets are
+computed once per map version. Paths with up to reflection_order bounces
+are evaluated in the same pass as the direct paths, each bounce costs
+reflection_coefficient of the strength, and a link keeps its strongest path.
+"""
+from operator import attrgetter
+import numpy as np
+from utils.ir_physics import (distance_to_signal_strength_rician_array,
+                              signal_strength_to_distance_rician_array)
+
+MIN_SIGNAL_STRENGTH = 1.5   # Same threshold as can_receive_signal
+MAX_REFLECTION_ORDER = 3
+
+# Base direction of sensors on each side (top, right, bottom, left)
+_SIDE_DIRECTION = np.array([270.0, 0.0, 90.0, 180.0])
+
+_PAIR_CHUNK = 256           # Robots per block of the pairwise distance search
+_LEG_SHRINK = 1e-6          # Leg ends are pulled off the reflecting wall by this fraction
+_TOUCH_TOLERANCE = 1e-9     # Fraction of a segment inside a robot that still counts as touching
+
+
+class LinkTable:
+    """Links of one tick, one row per (transmitter, receiver) pair with a signal
+
+    Columns are numpy arrays of equal length:
+        tx_robot, rx_robot: Robot ids
+        tx_index, rx_index: Sensor index in robot.transmitters / robot.receivers
+        strength: Signal strength (0-100)
+        estimated_distance: Distance estimated from the strength (m)
+        distance: Length of the signal path (m)
+        has_los: Whether the path is unobstructed (always False for reflections)
+        order: Number of wall reflections of the path, 0 for the direct path
+        tx_x, tx_y, rx_x, rx_y: Sensor positions (pixels)
+        bounces: (N, max_order, 2) reflection points (pixels), NaN when unused
+    """
+
+    COLUMNS = ('tx_robot', 'tx_index', 'rx_robot', 'rx_index', 'strength',
+               'estimated_distance', 'distance', 'has_los', 'order',
+               'tx_x', 'tx_y', 'rx_x', 'rx_y', 'bounces')
+
+    def __init__(self, **columns):
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.strength)
+
+    def select(self, mask):
+        """New table with the rows selected by a boolean mask or index array"""
+        return LinkTable(**{name: getattr(self, name)[mask] for name in self.COLUMNS})
+
+
+class LinkEngine:
+    """Computes the link table of a simulation"""
+
+    def __init__(self, simulation, reflection_order=1, reflection_coefficient=0.35):
+        """
+        Args:
+            simulation: Simulation providing robots, scale and static maps
+            reflection_order: Maximum number of wall bounces (0 disables reflections)
+            reflection_coefficient: Fraction of the strength kept per bounce
+        """
+        self.simulation = simulation
+        self.reflection_order = 0
+        self.set_reflection_order(reflection_order)
+        self.reflection_coefficient = float(reflection_coefficient)
+        self._walls = None
+        self._wall_state = None
+
+    def set_reflection_order(self, order):
+        """Set the maximum number of wall bounces of reflected paths"""
+        order = int(order)
+        if not 0 <= order <= MAX_REFLECTION_ORDER:
+            raise ValueError(f"Reflection order must be between 0 and {MAX_REFLECTION_ORDER}")
+        self.reflection_order = order
+
+    def compute(self, robots=None, schedule=None, tick=0):
+        """Evaluate all links between robots (default: all robots of the simulation)
+
+        Args:
+            robots: Robots to evaluate, default all robots of the simulation
+            schedule: Optional transmission schedule (models.tx_schedule),
+                      only the transmitters it selects for this tick fire
+            tick: Tick number passed to the schedule
+
+        Returns:
+            LinkTable
+        """
+        simulation = self.simulation
+        robots = list(simulation.robots) if robots is None else list(robots)
+        # Robots of one sensor layout form one contiguous batch
+        robots = group_by_layout(robots)
+        scale = simulation.scale
+        max_order = self.reflection_order
+
+        poses = np.array([(robot.x, robot.y, robot.size, robot.orientation) for robot in robots],
+                         dtype=np.float64).reshape(-1, 4)
+        tx, rx = gather_sensors(robots, poses)
+        robot_ids = np.array([robot.id for robot in robots], dtype=np.int64)
+        if schedule is not None and len(tx['x']):
+            firing = schedule.firing(tick, robot_ids[tx['robot']], tx['index'], tx['count'])
+            tx = {name: values[firing] for name, values in tx.items()}
+        if not len(tx['x']) or not len(rx['x']):
+            return _empty_table(max_order)
+
+        # Robot pairs close enough for any transmitter to reach the other robot
+        max_size = poses[:, 2].max()
+        reach = tx['range'].max() + 1.5 * max_size
+        pair_tx, pair_rx = _robot_pairs(poses[:, 0], poses[:, 1], reach)
+        neighbors = _csr(pair_tx, pair_rx, len(robots))
+
+        # Sensor pairs of those robots within transmitter range
+        a, b = _expand_pairs(pair_tx, pair_rx, _csr_index(tx['robot'], len(robots)),
+                             _csr_index(rx['robot'], len(robots)))
+        dx = rx['x'][b] - tx['x'][a]
+        dy = rx['y'][b] - tx['y'][a]
+        dist = np.hypot(dx, dy)
+        in_range = dist <= tx['range'][a]
+        a, b, dx, dy, dist = a[in_range], b[in_range], dx[in_range], dy[in_range], dist[in_range]
+
+        paths = [self._direct_paths(a, b, dx, dy, dist, tx, rx, poses, neighbors, scale, max_order)]
+        walls = self._wall_geometry(scale) if max_order else None
+        if walls is not None:
+            paths.append(self._reflected_paths(a, b, tx, rx, poses, neighbors, walls, scale, max_order))
+
+        # Strongest path of every sensor pair
+        link_tx = np.concatenate([path['tx'] for path in paths])
+        link_rx = np.concatenate([path['rx'] for path in paths])
+        strength = np.concatenate([path['strength'] for path in paths])
+        order = np.lexsort((-strength, link_rx, link_tx))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (link_tx[order][1:] != link_tx[order][:-1]) | (link_rx[order][1:] != link_rx[order][:-1])
+        chosen = order[first]
+
+        def column(name):
+            return np.concatenate([path[name] for path in paths])[chosen]
+
+        link_tx, link_rx = link_tx[chosen], link_rx[chosen]
+        return LinkTable(
+            tx_robot=robot_ids[tx['robot'][link_tx]], tx_index=tx['index'][link_tx],
+            rx_robot=robot_ids[rx['robot'][link_rx]], rx_index=rx['index'][link_rx],
+            strength=strength[chosen], estimated_distance=column('estimated_distance'),
+            distance=column('distance'), has_los=column('has_los'), order=column('order'),
+            tx_x=tx['x'][link_tx], tx_y=tx['y'][link_tx], rx_x=rx['x'][link_rx], rx_y=rx['y'][link_rx],
+            bounces=column('bounces'))
+
+    def apply(self, links, robots=None, tick=None):
+        """Store the links in the receivers (signals and estimated_distances)
+
+        A receiver keeps the strongest signal per transmitting robot, stamped
+        with the tick it was received in. With a signal history on the
+        simulation, the sample is also appended to it and the filtered value
+        stored next to the raw one.
+        """
+        robots = self.simulation.robots if robots is None else robots
+        if not len(links):
+            return
+        by_id = {robot.id: robot for robot in robots}
+
+        # Strongest link per (receiver, transmitting robot)
+        order = np.lexsort((-links.strength, links.tx_robot, links.rx_index, links.rx_robot))
+        keys = np.column_stack((links.rx_robot, links.rx_index, links.tx_robot))[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+        chosen = order[first]
+
+        rx_robots = links.rx_robot[chosen].tolist()
+        rx_indices = links.rx_index[chosen].tolist()
+        tx_robots = links.tx_robot[chosen].tolist()
+        strengths = links.strength[chosen].tolist()
+        history = getattr(self.simulation, 'signal_history', None)
+        if history is not None:
+            filtered = history.push(list(zip(rx_robots, rx_indices, tx_robots)), strengths).tolist()
+        else:
+            filtered = strengths
+
+        for rx_robot, rx_index, tx_robot, strength, smoothed, distance in zip(
+                rx_robots, rx_indices, tx_robots, strengths, filtered,
+                links.estimated_distance[chosen].tolist()):
+            robot = by_id.get(rx_robot)
+            if robot is None:
+                continue
+            receiver = robot.receivers[rx_index]
+            receiver.add_signal(tx_robot, strength, tick, smoothed)
+            if not hasattr(receiver, 'estimated_distances'):
+                receiver.estimated_distances = {}
+            receiver.estimated_distances[tx_robot] = distance
+
+    def _direct_paths(self, a, b, dx, dy, dist, tx, rx, poses, neighbors, scale, max_order):
+        """Direct paths of the in-range sensor pairs (a, b)"""
+        tx_diff, rx_diff = _cone_angles(tx['direction'][a], rx['direction'][b], dx, dy)
+        visible = (tx_diff <= tx['half_angle'][a]) & (rx_diff <= rx['half_angle'][b])
+        a, b, dist = a[visible], b[visible], dist[visible]
+        tx_diff, rx_diff = tx_diff[visible], rx_diff[visible]
+
+        x1, y1, x2, y2 = tx['x'][a], tx['y'][a], rx['x'][b], rx['y'][b]
+        has_los = ~_robots_block(x1, y1, x2, y2, tx['robot'][a], rx['robot'][b], poses, neighbors)
+        static_maps = self.simulation.los_maps()
+        if static_maps:
+            for i in np.flatnonzero(has_los).tolist():
+                p1, p2 = (x1[i], y1[i]), (x2[i], y2[i])
+                has_los[i] = all(static_map.line_of_sight(p1, p2, scale) for static_map in static_maps)
+
+        return _path_signals(a, b, dist, tx_diff, rx_diff, has_los, 1.0, 0,
+                             np.full((len(a), max_order, 2), np.nan), tx, rx, scale)
+
+    def _reflected_paths(self, a, b, tx, rx, poses, neighbors, walls, scale, max_order):
+        """Paths from the sensor pairs (a, b) with 1 to max_order wall bounces"""
+        start_x, start_y, normal_x, normal_y, offset, dir_x, dir_y, length = walls
+        static_maps = self.simulation.los_maps()
+
+        # Walls within reach of each transmitting robot
+        reach = tx['range'].max() + poses[:, 2].max()
+        robot_walls = _walls_near(poses[:, 0], poses[:, 1], reach, walls)
+        tx_robot = tx['robot'][a]
+
+        # Chains of walls: link index, walls so far and the image of the transmitter
+        link = np.repeat(np.arange(len(a)), robot_walls[2][tx_robot])
+        chain = [robot_walls[0][_csr_positions(robot_walls, tx_robot)]]
+        image_x, image_y = _mirror(tx['x'][a][link], tx['y'][a][link], chain[0], walls)
+        images = [(tx['x'][a][link], tx['y'][a][link]), (image_x, image_y)]
+
+        results = []
+        for order in range(1, max_order + 1):
+            if order > 1:
+                # Extend every chain by another nearby wall, never the same wall twice in a row
+                parents = np.repeat(np.arange(len(link)), robot_walls[2][tx_robot[link]])
+                next_wall = robot_walls[0][_csr_positions(robot_walls, tx_robot[link])]
+                keep = next_wall != chain[-1][parents]
+                parents, next_wall = parents[keep], next_wall[keep]
+                link = link[parents]
+                chain = [wall[parents] for wall in chain] + [next_wall]
+                images = [(x[parents], y[parents]) for x, y in images]
+                images.append(_mirror(images[-1][0], images[-1][1], next_wall, walls))
+            if not len(link):
+                break
+
+            # Path length is the distance from the last image to the receiver
+            la, lb = a[link], b[link]
+            end_x, end_y = rx['x'][lb], rx['y'][lb]
+            path_length = np.hypot(end_x - images[-1][0], end_y - images[-1][1])
+            valid = path_length <= tx['range'][la]
+
+            # Unfold from the receiver back to the transmitter, one wall at a time
+            bounces = [None] * order
+            point_x, point_y = end_x, end_y
+            for m in range(order - 1, -1, -1):
+                wall = chain[m]
+                image_side = images[m + 1][0] * normal_x[wall] + images[m + 1][1] * normal_y[wall] - offset[wall]
+                point_side = point_x * normal_x[wall] + point_y * normal_y[wall] - offset[wall]
+                valid &= image_side * point_side < 0
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    t = image_side / (image_side - point_side)
+                hit_x = images[m + 1][0] + t * (point_x - images[m + 1][0])
+                hit_y = images[m + 1][1] + t * (point_y - images[m + 1][1])
+                along = (hit_x - start_x[wall]) * dir_x[wall] + (hit_y - start_y[wall]) * dir_y[wall]
+                valid &= (along >= 0) & (along <= length[wall])
+                bounces[m] = (hit_x, hit_y)
+                point_x, point_y = hit_x, hit_y
+
+            # Leave towards the first bounce, arrive from the last one
+            tx_x, tx_y = tx['x'][la], tx['y'][la]
+            tx_diff, _ = _cone_angles(tx['direction'][la], rx['direction'][lb],
+                                      bounces[0][0] - tx_x, bounces[0][1] - tx_y)
+            _, rx_diff = _cone_angles(tx['direction'][la], rx['direction'][lb],
+                                      end_x - bounces[-1][0], end_y - bounces[-1][1])
+            valid &= (tx_diff <= tx['half_angle'][la]) & (rx_diff <= rx['half_angle'][lb])
+
+            rows = np.flatnonzero(valid)
+            points = [(tx_x, tx_y)] + bounces + [(end_x, end_y)]
+            if len(rows):
+                rows = rows[~_legs_blocked_by_robots(points, rows, tx['robot'][la], rx['robot'][lb],
+                                                      poses, neighbors)]
+            if static_maps and len(rows):
+                rows = np.array([i for i in rows.tolist() if _legs_clear(points, i, static_maps, scale)],
+                                dtype=np.int64)
+
+            bounce_points = np.full((len(rows), max_order, 2), np.nan)
+            for m, (hit_x, hit_y) in enumerate(bounces):
+                bounce_points[:, m, 0] = hit_x[rows]
+                bounce_points[:, m, 1] = hit_y[rows]
+            results.append(_path_signals(la[rows], lb[rows], path_length[rows], tx_diff[rows], rx_diff[rows],
+                                         np.zeros(len(rows), dtype=bool), self.reflection_coefficient ** order,
+                                         order, bounce_points, tx, rx, scale))
+
+        if not results:
+            return _path_signals(a[:0], b[:0], np.empty(0), np.empty(0), np.empty(0),
+                                 np.zeros(0, dtype=bool), 1.0, 1, np.empty((0, max_order, 2)), tx, rx, scale)
+        return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+    def _wall_geometry(self, scale):
+        """Wall segments of the obstacle map in pixels, None without walls
+
+        Normals, directions and lengths only change with the map and are
+        cached per map version; panning and zooming only move the offsets.
+        """
+        obstacle_map = self.simulation.obstacles
+        if not obstacle_map.segment_count:
+            return None
+        state = (id(obstacle_map), obstacle_map.version)
+        if state != self._wall_state:
+            segments = obstacle_map.segments()
+            vector = segments[:, 2:] - segments[:, :2]
+            length = np.hypot(vector[:, 0], vector[:, 1])
+            keep = length > 0
+            segments, vector, length = segments[keep], vector[keep], length[keep]
+            direction = vector / length[:, None]
+            self._walls = (segments[:, :2], direction, length)
+            self._wall_state = state
+
+        start, direction, length = self._walls
+        start_x = (start[:, 0] + obstacle_map.origin_x) * scale
+        start_y = (start[:, 1] + obstacle_map.origin_y) * scale
+        normal_x, normal_y = -direction[:, 1], direction[:, 0]
+        offset = start_x * normal_x + start_y * normal_y
+        return (start_x, start_y, normal_x, normal_y, offset,
+                direction[:, 0], direction[:, 1], length * scale)
+
+
+def group_by_layout(robots):
+    """Robots reordered so robots sharing a SensorLayout are contiguous
+
+    Layouts keep the order of their first robot and robots keep their order
+    within a layout, so a fleet of one type is returned unchanged.
+    """
+    groups = {}
+    for robot in robots:
+        groups.setdefault(id(robot.layout), []).append(robot)
+    return [robot for group in groups.values() for robot in group]
+
+
+def gather_sensors(robots, poses):
+    """Arrays describing all active transmitters and all receivers
+
+    The sensor geometry comes from the compiled layout arrays, only the
+    parameters that can change per robot are read from the sensor objects.
+    Each run of consecutive robots sharing a layout is one batch.
+
+    Args:
+        robots: Robots, grouping them with group_by_layout makes fewer batches
+        poses: (N, 4) array of (x, y, size, orientation) per robot, pixels/degrees
+
+    Returns:
+        (tx, rx): dicts of equal length arrays, rows sorted by robot. Both have
+        'robot' (index into robots), 'index' (in robot.transmitters /
+        robot.receivers), 'x', 'y', 'direction' (degrees) and 'half_angle';
+        tx adds 'range' (pixels), 'strength' and 'count' (transmitters of its
+        robot), rx adds 'sensitivity'.
+    """
+    tx_parts = []
+    rx_parts = []
+    start = 0
+    while start < len(robots):
+        layout = robots[start].layout
+        stop = start + 1
+        while stop < len(robots) and robots[stop].layout is layout:
+            stop += 1
+        batch = robots[start:stop]
+        tx = _batch_rows(batch, start, layout.tx_position, layout.tx_side,
+                         [sensor for robot in batch for sensor in robot.transmitters], 'tx')
+        tx = tx[tx[:, -1] != 0]  # Active transmitters only
+        tx[:, -1] = len(layout.tx_side)  # Transmitter count of the robot, for schedules
+        tx_parts.append(tx)
+        rx_parts.append(_batch_rows(batch, start, layout.rx_position, layout.rx_side,
+                                    [sensor for robot in batch for sensor in robot.receivers], 'rx'))
+        start = stop
+
+    tx = _place_sensors(np.concatenate(tx_parts) if tx_parts else np.empty((0, 10)), poses)
+    tx['range'], tx['strength'], tx['count'] = tx.pop('extra').T
+    tx['count'] = tx['count'].astype(np.int64)
+    rx = _place_sensors(np.concatenate(rx_parts) if rx_parts else np.empty((0, 8)), poses)
+    rx['sensitivity'] = rx.pop('extra')[:, 0]
+    return tx, rx
+
+
+# Per robot sensor parameters: direction offset, cone angle, then the columns after half_angle
+_PARAM_NAMES = {
+    'tx': ('beam_direction_offset', 'beam_angle', 'beam_distance', 'strength', 'active'),
+    'rx': ('direction_offset', 'viewing_angle', 'sensitivity'),
+}
+_PARAM_GETTERS = {kind: attrgetter(*names) for kind, names in _PARAM_NAMES.items()}
+
+
+def _batch_rows(batch, start, position, side, sensors, kind):
+    """Rows (robot, index, side, local_x, local_y, offset, half angle, ...) of a batch of one layout"""
+    per_robot = len(side)
+    if len(sensors) != per_robot * len(batch):
+        raise ValueError("Robot sensors do not match the robot's sensor layout")
+    rows = np.empty((len(sensors), 5 + len(_PARAM_NAMES[kind])))
+    if not sensors:
+        return rows
+    rows[:, 0] = np.repeat(np.arange(start, start + len(batch)), per_robot)
+    rows[:, 1] = np.tile(np.arange(per_robot), len(batch))
+    rows[:, 2] = np.tile(side, len(batch))
+    rows[:, 3:5] = np.tile(position, (len(batch), 1))
+    rows[:, 5:] = np.array(list(map(_PARAM_GETTERS[kind], sensors)), dtype=np.float64)
+    rows[:, 6] /= 2
+    return rows
+
+
+def _place_sensors(rows, poses):
+    """Positions and directions of sensors, same geometry as IRSensor.get_position"""
+    robot = rows[:, 0].astype(np.int64)
+    side = rows[:, 2].astype(np.int64)
+    x, y, size, orientation = (poses[robot, k] for k in range(4))
+    half = size / 2
+    local_x, local_y = rows[:, 3] * half, rows[:, 4] * half
+    angle = np.radians(orientation)
+    cos, sin = np.cos(angle), np.sin(angle)
+    return {
+        'robot': robot,
+        'index': rows[:, 1].astype(np.int64),
+        'x': x + local_x * cos - local_y * sin,
+        'y': y + local_x * sin + local_y * cos,
+        'direction': (_SIDE_DIRECTION[side] + orientation + rows[:, 5]) % 360,
+        'half_angle': rows[:, 6],
+        'extra': rows[:, 7:],
+    }
+
+
+def _robot_pairs(x, y, radius):
+    """Ordered pairs (i, j), i != j, of robots closer than radius"""
+    count = len(x)
+    radius_sq = radius * radius
+    first, second = [], []
+    for start in range(0, count, _PAIR_CHUNK):
+        stop = min(count, start + _PAIR_CHUNK)
+        close = ((x[start:stop, None] - x[None, :]) ** 2 +
+                 (y[start:stop, None] - y[None, :]) ** 2) <= radius_sq
+        close[np.arange(stop - start), np.arange(start, stop)] = False
+        i, j = np.nonzero(close)
+        first.append(i + start)
+        second.append(j)
+    if not first:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _csr(keys, values, count):
+    """(values sorted by key, start per key, count per key)"""
+    order = np.argsort(keys, kind='stable')
+    counts = np.bincount(keys, minlength=count)
+    return values[order], np.cumsum(counts) - counts, counts
+
+
+def _csr_index(keys, count):
+    """(start, count) per key of an array sorted by key"""
+    counts = np.bincount(keys, minlength=count)
+    return np.cumsum(counts) - counts, counts
+
+
+def _csr_positions(csr, keys):
+    """Positions in csr values of all entries of keys, key by key"""
+    _, starts, counts = csr
+    sizes = counts[keys]
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.repeat(starts[keys], sizes) + offsets
+
+
+def _expand_pairs(pair_a, pair_b, index_a, index_b):
+    """All (sensor of robot a, sensor of robot b) combinations of the robot pairs"""
+    start_a, count_a = index_a
+    start_b, count_b = index_b
+    n_a, n_b = count_a[pair_a], count_b[pair_b]
+    sizes = n_a * n_b
+    pair = np.repeat(np.arange(len(pair_a)), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    n_b = n_b[pair]
+    return start_a[pair_a][pair] + offsets // n_b, start_b[pair_b][pair] + offsets % n_b
+
+
+def _cone_angles(tx_direction, rx_direction, dx, dy):
+    """Angle between each beam/viewing direction and the ray (dx, dy) from transmitter to receiver"""
+    angle_to_receiver = np.degrees(np.arctan2(dy, dx)) % 360
+    angle_to_transmitter = np.degrees(np.arctan2(-dy, -dx)) % 360
+    tx_diff = np.abs((tx_direction - angle_to_receiver + 180) % 360 - 180)
+    rx_diff = np.abs((rx_direction - angle_to_transmitter + 180) % 360 - 180)
+    return tx_diff, rx_diff
+
+
+def _segments_hit_boxes(x1, y1, x2, y2, cx, cy, half, orientation):
+    """Whether each segment passes through the inside of the rotated square around (cx, cy)
+
+    The segment is clipped against both slabs of the square in its frame
+    (Liang-Barsky). Merely touching the outline does not count.
+    """
+    angle = np.radians(orientation)
+    cos, sin = np.cos(angle), np.sin(angle)
+    # Segment start and direction in the frame of the square
+    px, py = x1 - cx, y1 - cy
+    dx, dy = x2 - x1, y2 - y1
+    start = (px * cos + py * sin, -px * sin + py * cos)
+    direction = (dx * cos + dy * sin, -dx * sin + dy * cos)
+
+    enter = np.zeros(len(x1))
+    leave = np.ones(len(x1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for s, d in zip(start, direction):
+            t_low = (-half - s) / d
+            t_high = (half - s) / d
+            parallel = d == 0
+            enter = np.maximum(enter, np.where(parallel, np.where(np.abs(s) < half, 0.0, np.inf),
+                                               np.minimum(t_low, t_high)))
+            leave = np.minimum(leave, np.where(parallel, np.inf, np.maximum(t_low, t_high)))
+    return leave - enter > _TOUCH_TOLERANCE
+
+
+def _robots_block(x1, y1, x2, y2, tx_robot, rx_robot, poses, neighbors, direct=True):
+    """Whether the body of another robot blocks each segment
+
+    Robots are their rotated squares. The transmitting and receiving robots
+    are left out: their sensors sit on their own outline and the cones
+    already point away from their bodies. Other robots are rejected by
+    their bounding circles before the exact test, first per robot pair
+    (every direct segment of a pair lies within the bounding circles of its
+    two robots) and then per segment. Legs of reflected paths (direct=False)
+    leave that capsule, so they skip the pair rejection; the whole path is
+    within range of the transmitter, so its neighbors are still all candidates.
+    """
+    blocked = np.zeros(len(x1), dtype=bool)
+    if not len(x1):
+        return blocked
+    cx, cy, half, orientation = poses[:, 0], poses[:, 1], poses[:, 2] / 2, poses[:, 3]
+    radius = half * np.sqrt(2)
+
+    if direct:
+        link, other = _pair_candidates(tx_robot, rx_robot, cx, cy, radius, neighbors)
+    else:
+        link = np.repeat(np.arange(len(x1)), neighbors[2][tx_robot])
+        other = neighbors[0][_csr_positions(neighbors, tx_robot)]
+        keep = (other != rx_robot[link]) & (other != tx_robot[link])
+        link, other = link[keep], other[keep]
+    near = _point_segment_distance_sq(cx[other], cy[other], x1[link], y1[link],
+                                      x2[link], y2[link]) < radius[other] ** 2
+    link, other = link[near], other[near]
+
+    hit = _segments_hit_boxes(x1[link], y1[link], x2[link], y2[link],
+                              cx[other], cy[other], half[other], orientation[other])
+    blocked[link[hit]] = True
+    return blocked
+
+
+def _pair_candidates(tx_robot, rx_robot, cx, cy, radius, neighbors):
+    """(segment, robot) candidates of direct segments, rejected per robot pair"""
+    count_robots = len(cx)
+    # Robots near the transmitting robot whose circle reaches the capsule around the pair's centers
+    pair_keys, pair_of_link = np.unique(tx_robot * count_robots + rx_robot, return_inverse=True)
+    pair_tx, pair_rx = np.divmod(pair_keys, count_robots)
+    pair = np.repeat(np.arange(len(pair_keys)), neighbors[2][pair_tx])
+    other = neighbors[0][_csr_positions(neighbors, pair_tx)]
+    keep = other != pair_rx[pair]
+    pair, other = pair[keep], other[keep]
+    reach = radius[other] + np.maximum(radius[pair_tx[pair]], radius[pair_rx[pair]])
+    near = _point_segment_distance_sq(cx[other], cy[other], cx[pair_tx[pair]], cy[pair_tx[pair]],
+                                      cx[pair_rx[pair]], cy[pair_rx[pair]]) < reach * reach
+    pair, other = pair[near], other[near]
+
+    # Candidates of each segment are the candidates of its pair
+    start, count = _csr_index(pair, len(pair_keys))
+    link = np.repeat(np.arange(len(tx_robot)), count[pair_of_link])
+    offsets = np.arange(len(link)) - np.repeat(np.cumsum(count[pair_of_link]) - count[pair_of_link],
+                                               count[pair_of_link])
+    return link, other[start[pair_of_link][link] + offsets]
+
+
+def _point_segment_distance_sq(px, py, x1, y1, x2, y2):
+    """Squared distance of points to segments"""
+    sx, sy = x2 - x1, y2 - y1
+    ox, oy = px - x1, py - y1
+    length_sq = sx * sx + sy * sy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        along = np.clip(np.where(length_sq > 0, (ox * sx + oy * sy) / length_sq, 0.0), 0, 1)
+    gap_x, gap_y = ox - along * sx, oy - along * sy
+    return gap_x * gap_x + gap_y * gap_y
+
+
+def _walls_near(x, y, radius, walls):
+    """CSR (walls, start, count) of the walls within radius of each robot center"""
+    start_x, start_y, _, _, _, dir_x, dir_y, length = walls
+    robots, found = [], []
+    for first in range(0, len(x), _PAIR_CHUNK):
+        px = x[first:first + _PAIR_CHUNK, None]
+        py = y[first:first + _PAIR_CHUNK, None]
+        along = np.clip((px - start_x) * dir_x + (py - start_y) * dir_y, 0, length)
+        close = np.hypot(px - start_x - along * dir_x, py - start_y - along * dir_y) <= radius
+        i, j = np.nonzero(close)
+        robots.append(i + first)
+        found.append(j)
+    robots = np.concatenate(robots) if robots else np.empty(0, dtype=np.int64)
+    found = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    return _csr(robots, found, len(x))
+
+
+def _mirror(px, py, wall, walls):
+    """Image of points reflected across the lines of walls"""
+    _, _, normal_x, normal_y, offset, _, _, _ = walls
+    side = px * normal_x[wall] + py * normal_y[wall] - offset[wall]
+    return px - 2 * side * normal_x[wall], py - 2 * side * normal_y[wall]
+
+
+def _legs_blocked_by_robots(points, rows, tx_robot, rx_robot, poses, neighbors):
+    """Whether a robot body blocks any leg (tx -> bounce ... -> rx) of each reflected path in rows"""
+    legs = len(points) - 1
+    x1 = np.concatenate([points[k][0][rows] for k in range(legs)])
+    y1 = np.concatenate([points[k][1][rows] for k in range(legs)])
+    x2 = np.concatenate([points[k + 1][0][rows] for k in range(legs)])
+    y2 = np.concatenate([points[k + 1][1][rows] for k in range(legs)])
+    blocked = _robots_block(x1, y1, x2, y2, np.tile(tx_robot[rows], legs), np.tile(rx_robot[rows], legs),
+                            poses, neighbors, direct=False)
+    return blocked.reshape(legs, len(rows)).any(axis=0)
+
+
+def _legs_clear(points, i, static_maps, scale):
+    """Whether every leg of reflected path i is free of static obstacles
+
+    Leg ends on a wall are pulled back slightly so the reflecting wall
+    itself does not count as an obstacle.
+    """
+    last = len(points) - 1
+    for k in range(last):
+        x1, y1 = points[k][0][i], points[k][1][i]
+        x2, y2 = points[k + 1][0][i], points[k + 1][1][i]
+        dx, dy = (x2 - x1) * _LEG_SHRINK, (y2 - y1) * _LEG_SHRINK
+        p1 = (x1 + dx, y1 + dy) if k > 0 else (x1, y1)
+        p2 = (x2 - dx, y2 - dy) if k + 1 < last else (x2, y2)
+        if not all(static_map.line_of_sight(p1, p2, scale) for static_map in static_maps):
+            return False
+    return True
+
+
+def _path_signals(a, b, path_length, tx_diff, rx_diff, has_los, gain, order, bounces, tx, rx, scale):
+    """Signal strength and distance estimate of paths, dropping those below the threshold"""
+    angle_factor = np.cos(np.radians(tx_diff)) ** 2 * np.cos(np.radians(rx_diff)) ** 2
+    distance = path_length / scale
+    beam_distance = tx['range'][a] / scale
+    strength = distance_to_signal_strength_rician_array(
+        distance, beam_distance, tx['strength'][a], rx['sensitivity'][b], angle_factor, has_los) * gain
+    keep = strength >= MIN_SIGNAL_STRENGTH
+    estimated = signal_strength_to_distance_rician_array(
+        strength[keep], beam_distance[keep], tx['strength'][a][keep], rx['sensitivity'][b][keep],
+        angle_factor[keep], has_los[keep])
+    return {
+        'tx': a[keep], 'rx': b[keep], 'strength': strength[keep], 'estimated_distance': estimated,
+        'distance': distance[keep], 'has_los': has_los[keep],
+        'order': np.full(int(keep.sum()), order, dtype=np.int64), 'bounces': bounces[keep],
+    }
+
+
+def _empty_table(max_order):
+    empty_int = np.empty(0, dtype=np.int64)
+    empty = np.empty(0)
+    return LinkTable(tx_robot=empty_int, tx_index=empty_int, rx_robot=empty_int, rx_index=empty_int,
+                     strength=empty, estimated_distance=empty, distance=empty,
+                     has_los=np.zeros(0, dtype=bool), order=empty_int,
+                     tx_x=empty, tx_y=empty, rx_x=empty, rx_y=empty,
+                     bounces=np.empty((0, max_order, 2)))
@@ -0,0 +1,493 @@
+"""Multi-hop message passing over the IR links of each tick
+
+Robots exchange messages over the links the link engine finds. Every
+robot has a bounded outbox and inbox. In each tick a robot whose
+transmitters fire sends the messages at the head of its outbox to every
+robot that hears it (IR is a broadcast medium). Each copy arrives with a
+probability derived from the signal-to-interference-and-noise ratio at the
+best receiver, with every other transmitter firing in the same tick as
+interference. A router decides which received messages are accepted and
+forwarded again:
+
+    'flooding' - forward every new message once
+    'gossip'   - forward every new message with a probability
+    'tree'     - only accept from and forward along a spanning tree of the links
+
+All deliveries of a tick are processed together with NumPy arrays.
+
+Reception state lives in (robot, message) tables whose columns only hold
+messages that are still queued in some outbox. Once no outbox holds a
+message (its copies are all sent, its TTL ran out or it was dropped) it
+cannot spread any further: its column is freed for the next message and
+its reception ticks move to a bounded history, so coverage() and
+latency() still answer for recent messages while memory stays flat.
+
+    network = simulation.enable_messaging(GossipRouter(probability=0.6))
+    message_id = network.send(robot.id, payload="hello")
+    ...
+    network.latency(message_id, fraction=0.9)   # Ticks until 90% of robots have it
+"""
+import math
+from collections import deque, OrderedDict
+import numpy as np
+
+ROUTERS = ('flooding', 'gossip', 'tree')
+
+
+class FloodingRouter:
+    """Accept from every neighbour and forward every new message once"""
+
+    name = 'flooding'
+
+    def observe(self, network, tx_rows, rx_rows, strength, tick):
+        """Called every tick with the links of all firing transmitters (robot rows)"""
+
+    def accept(self, network, tx_rows, rx_rows):
+        """Boolean mask of the received copies the receivers accept"""
+        return np.ones(len(tx_rows), dtype=bool)
+
+    def forward(self, network, tx_rows, rx_rows, messages):
+        """Boolean mask of the newly received messages (table columns) the receivers send on"""
+        return np.ones(len(tx_rows), dtype=bool)
+
+
+class GossipRouter(FloodingRouter):
+    """Forward every new message with the given probability"""
+
+    name = 'gossip'
+
+    def __init__(self, probability=0.6, seed=None):
+        if not 0 < probability <= 1:
+            raise ValueError("Gossip probability must be in (0, 1]")
+        self.probability = float(probability)
+        self.rng = np.random.default_rng(seed)
+
+    def forward(self, network, tx_rows, rx_rows, messages):
+        return self.rng.random(len(tx_rows)) < self.probability
+
+
+class TreeRouter(FloodingRouter):
+    """Broadcast along a breadth-first spanning tree of the links
+
+    The tree is rebuilt every rebuild_interval ticks from the robot pairs
+    that heard each other in both directions since the last rebuild. Copies
+    from robots that are not tree neighbours are ignored and leaves do not
+    forward. Tree broadcasts have no redundancy, use repeats > 1 on lossy links.
+    """
+
+    name = 'tree'
+
+    def __init__(self, root=None, rebuild_interval=10, min_strength=40.0):
+        """
+        Args:
+            root: Robot id at the root of the tree, default the lowest id
+            rebuild_interval: Ticks between rebuilds
+            min_strength: Signal strength from which a link counts as tree edge
+        """
+        self.root = root
+        self.rebuild_interval = max(1, int(rebuild_interval))
+        self.min_strength = float(min_strength)
+        self.parent = np.empty(0, dtype=np.int64)  # Parent row per robot row, -1 for root/unreached
+        self.degree = np.empty(0, dtype=np.int64)  # Tree neighbours per robot row
+        self._edges = []                           # Arrays of (tx row, rx row) heard since the last rebuild
+        self._built = None
+
+    def observe(self, network, tx_rows, rx_rows, strength, tick):
+        good = (strength >= self.min_strength) & (tx_rows != rx_rows)
+        self._edges.append(np.column_stack((tx_rows[good], rx_rows[good])))
+        if self._built is None or tick - self._built >= self.rebuild_interval:
+            self._rebuild(network)
+            self._built = tick
+
+    def accept(self, network, tx_rows, rx_rows):
+        parent = self._parents(len(network.ids))
+        return (parent[rx_rows] == tx_rows) | (parent[tx_rows] == rx_rows)
+
+    def forward(self, network, tx_rows, rx_rows, messages):
+        self._parents(len(network.ids))
+        return self.degree[rx_rows] > 1
+
+    def _parents(self, count):
+        """Parent array padded to count rows (robots added after the last rebuild are unreached)"""
+        if len(self.parent) < count:
+            extra = count - len(self.parent)
+            self.parent = np.concatenate((self.parent, np.full(extra, -1, dtype=np.int64)))
+            self.degree = np.concatenate((self.degree, np.zeros(extra, dtype=np.int64)))
+        return self.parent
+
+    def _rebuild(self, network):
+        count = len(network.ids)
+        heard = np.concatenate(self._edges) if self._edges else np.empty((0, 2), dtype=np.int64)
+        self._edges = []
+        keys = np.unique(heard[:, 0] * count + heard[:, 1])
+        first, second = keys // count, keys % count
+        both = (first < second) & np.isin(second * count + first, keys)
+        neighbours = {}
+        for a, b in zip(first[both].tolist(), second[both].tolist()):
+            neighbours.setdefault(a, []).append(b)
+            neighbours.setdefault(b, []).append(a)
+
+        parent = np.full(count, -1, dtype=np.int64)
+        root = network.rows.get(self.root) if self.root is not None else None
+        if root is None and neighbours:
+            root = min(neighbours, key=lambda row: network.ids[row])
+        if root is not None:
+            visited = {root}
+            queue = deque([root])
+            while queue:
+                row = queue.popleft()
+                for other in neighbours.get(row, ()):
+                    if other not in visited:
+                        visited.add(other)
+                        parent[other] = row
+                        queue.append(other)
+        degree = np.bincount(parent[parent >= 0], minlength=count) + (parent >= 0)
+        self.parent, self.degree = parent, degree
+
+
+def make_router(name, **kwargs):
+    """Create a router by name, see ROUTERS"""
+    classes = {router.name: router for router in (FloodingRouter, GossipRouter, TreeRouter)}
+    if name not in classes:
+        raise ValueError(f"Unknown router '{name}', expected one of {', '.join(ROUTERS)}")
+    return classes[name](**kwargs)
+
+
+class MessageNetwork:
+    """Bounded per-robot queues and bulk per-tick delivery over the link table"""
+
+    def __init__(self, router=None, outbox_size=16, inbox_size=64, per_tick=1, ttl=64, repeats=1,
+                 transmit_probability=1.0, snr_threshold=1.5, snr_width=1.0, noise_floor=1.0, seed=None,
+                 history_size=256):
+        """
+        Args:
+            router: Router object or name from ROUTERS, default flooding
+            outbox_size: Messages a robot can have waiting to be sent
+            inbox_size: Received messages kept until the robot reads them
+            per_tick: Messages a robot sends in a tick in which its transmitters fire
+            ttl: Default hop limit of messages
+            repeats: Transmissions of every message a robot sends or forwards (blind retransmission)
+            transmit_probability: Chance that a robot with queued messages sends in a tick,
+                                  below 1 neighbours stop colliding in lockstep (random backoff)
+            snr_threshold: SINR (linear) with 50% delivery probability, as in IRReceiver.process_signals
+            snr_width: Width of the transition from loss to delivery (dB)
+            noise_floor: Noise added to the interference, same scale as signal strengths
+            seed: Seed of the random generator that draws losses
+            history_size: Retired messages whose coverage and latency can still be queried
+        """
+        if outbox_size < 1 or inbox_size < 1 or per_tick < 1 or repeats < 1:
+            raise ValueError("Queue sizes, messages per tick and repeats must be at least 1")
+        if not 0 < transmit_probability <= 1:
+            raise ValueError("Transmit probability must be in (0, 1]")
+        self.router = make_router(router) if isinstance(router, str) else (router or FloodingRouter())
+        self.outbox_size = int(outbox_size)
+        self.inbox_size = int(inbox_size)
+        self.per_tick = int(per_tick)
+        self.ttl = int(ttl)
+        self.repeats = int(repeats)
+        self.transmit_probability = float(transmit_probability)
+        self.snr_threshold_db = 10 * math.log10(snr_threshold)
+        self.snr_width = float(snr_width)
+        self.noise_floor = float(noise_floor)
+        self.history_size = int(history_size)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        """Drop all messages, queues and statistics"""
+        self.ids = []            # Robot id per row
+        self.rows = {}           # robot_id -> row
+        self.outboxes = []       # deque of message columns per row
+        self.inboxes = []        # deque of (message_id, source_id, sender_id, payload, tick) per row
+        self.tick = 0
+        self.message_count = 0   # Message ids handed out so far
+        self.columns = {}        # message_id -> column of a message that is still queued
+        self.free = []           # Free columns
+        self.message_ids = np.empty(0, dtype=np.int64)    # Message id per column, -1 when free
+        self.queued = np.empty(0, dtype=np.int64)         # Outbox entries per column
+        self.sources = np.empty(0, dtype=np.int64)        # Source robot id per column
+        self.destinations = np.empty(0, dtype=np.int64)   # Destination robot id per column, -1 broadcast
+        self.created = np.empty(0, dtype=np.int64)        # Tick the message was sent in
+        self.ttls = np.empty(0, dtype=np.int64)
+        self.payloads = []
+        self.received = np.full((0, 0), -1, dtype=np.int64)  # (robot row, column) -> first reception tick
+        self.hops = np.zeros((0, 0), dtype=np.int64)         # (robot row, column) -> hops of that copy
+        self.history = OrderedDict()  # Retired message_id -> (created tick, first reception tick per row)
+        self.stats = dict.fromkeys(('sent', 'transmissions', 'delivered', 'lost', 'rejected', 'duplicates',
+                                    'dropped_outbox', 'dropped_inbox', 'retired'), 0)
+
+    def forget(self, robot_id):
+        """Clear the queues of a removed robot"""
+        row = self.rows.get(robot_id)
+        if row is not None:
+            np.subtract.at(self.queued, np.array(self.outboxes[row], dtype=np.int64), 1)
+            self.outboxes[row].clear()
+            self.inboxes[row].clear()
+            self._retire()
+
+    def send(self, robot_id, payload=None, destination=None, ttl=None):
+        """Queue a new message at a robot, returns its message id or None if the outbox is full
+
+        Args:
+            robot_id: Sending robot
+            payload: Any object carried by the message
+            destination: Robot id for unicast, None to broadcast to all robots
+            ttl: Hop limit, default the network's ttl
+        """
+        row = self._row(robot_id)
+        if len(self.outboxes[row]) + self.repeats > self.outbox_size:
+            self.stats['dropped_outbox'] += 1
+            return None
+        column = self._add_message(robot_id, -1 if destination is None else destination,
+                                   self.ttl if ttl is None else ttl, payload)
+        self.received[row, column] = self.tick
+        self._enqueue(row, column)
+        self.stats['sent'] += 1
+        return int(self.message_ids[column])
+
+    def receive(self, robot_id):
+        """Take all messages from a robot's inbox as (message_id, source_id, sender_id, payload, tick)"""
+        row = self.rows.get(robot_id)
+        if row is None:
+            return []
+        inbox = self.inboxes[row]
+        messages = list(inbox)
+        inbox.clear()
+        return messages
+
+    def pending(self, robot_id):
+        """Messages waiting in a robot's outbox"""
+        row = self.rows.get(robot_id)
+        return 0 if row is None else len(self.outboxes[row])
+
+    def coverage(self, message_id, robot_ids=None):
+        """Fraction of the robots (default all known robots) that have received a message"""
+        rows = self._rows_of(robot_ids)
+        if not len(rows):
+            return 0.0
+        received, _ = self._reception(message_id)
+        return float((received[rows] >= 0).mean())
+
+    def latency(self, message_id, fraction=1.0, robot_ids=None):
+        """Ticks from sending until the given fraction of the robots had the message, None if not yet"""
+        rows = self._rows_of(robot_ids)
+        needed = max(1, int(math.ceil(fraction * len(rows))))
+        received, created = self._reception(message_id)
+        ticks = np.sort(received[rows])
+        ticks = ticks[ticks >= 0]
+        if len(ticks) < needed:
+            return None
+        return int(ticks[needed - 1] - created)
+
+    def step(self, links, tick=None):
+        """Deliver the messages sent in one tick over its link table"""
+        self.tick = self.tick + 1 if tick is None else tick
+        if links is None or not len(links):
+            return
+        tx_rows = self._rows_array(links.tx_robot)
+        rx_rows = self._rows_array(links.rx_robot)
+        self.router.observe(self, tx_rows, rx_rows, links.strength, self.tick)
+
+        # Messages leaving the outboxes of robots whose transmitters fire (and that do not back off)
+        firing = np.zeros(len(self.ids), dtype=bool)
+        firing[tx_rows] = True
+        if self.transmit_probability < 1:
+            firing &= self.rng.random(len(firing)) < self.transmit_probability
+        sender_rows, messages = [], []
+        for row, outbox in enumerate(self.outboxes):
+            if outbox and firing[row]:
+                for _ in range(min(self.per_tick, len(outbox))):
+                    sender_rows.append(row)
+                    messages.append(outbox.popleft())
+        if not messages:
+            return
+        np.subtract.at(self.queued, np.array(messages, dtype=np.int64), 1)
+        self.stats['transmissions'] += len(messages)
+
+        # Only robots sending in this tick interfere with each other
+        sending = np.zeros(len(self.ids), dtype=bool)
+        sending[sender_rows] = True
+        on_air = sending[tx_rows]
+        pair_tx, pair_rx, probability = self._pair_probability(
+            tx_rows[on_air], rx_rows[on_air], links.rx_index[on_air], links.strength[on_air])
+
+        # Every transmitted message reaches every robot that hears its sender, with loss
+        starts = np.searchsorted(pair_tx, sender_rows)
+        counts = np.searchsorted(pair_tx, sender_rows, side='right') - starts
+        copy = np.repeat(np.arange(len(messages)), counts)
+        pair = np.repeat(starts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tx, rx = pair_tx[pair], pair_rx[pair]
+        message = np.array(messages, dtype=np.int64)[copy]
+
+        arrived = self.rng.random(len(pair)) < probability[pair]
+        self.stats['lost'] += int((~arrived).sum())
+        accepted = self.router.accept(self, tx, rx)
+        self.stats['rejected'] += int((arrived & ~accepted).sum())
+        tx, rx, message = tx[arrived & accepted], rx[arrived & accepted], message[arrived & accepted]
+
+        # First copy of each message per robot
+        new = self.received[rx, message] < 0
+        _, first = np.unique(rx * self.received.shape[1] + message, return_index=True)
+        unique = np.zeros(len(rx), dtype=bool)
+        unique[first] = True
+        self.stats['duplicates'] += int((~(new & unique)).sum())
+        keep = new & unique
+        tx, rx, message = tx[keep], rx[keep], message[keep]
+        self.received[rx, message] = self.tick
+        self.hops[rx, message] = self.hops[tx, message] + 1
+        self.stats['delivered'] += len(rx)
+
+        ids = np.array(self.ids, dtype=np.int64)
+        destinations, rx_ids = self.destinations[message], ids[rx]
+        for_me = (destinations < 0) | (destinations == rx_ids)
+        for row, column, sender in zip(rx[for_me].tolist(), message[for_me].tolist(),
+                                        ids[tx[for_me]].tolist()):
+            inbox = self.inboxes[row]
+            if len(inbox) >= self.inbox_size:
+                self.stats['dropped_inbox'] += 1
+            else:
+                inbox.append((int(self.message_ids[column]), int(self.sources[column]), sender,
+                              self.payloads[column], self.tick))
+
+        # Forwarding, decided by the router
+        candidates = (destinations != rx_ids) & (self.hops[rx, message] < self.ttls[message])
+        tx, rx, message = tx[candidates], rx[candidates], message[candidates]
+        forward = self.router.forward(self, tx, rx, message)
+        for row, column in zip(rx[forward].tolist(), message[forward].tolist()):
+            self._enqueue(row, column)
+        self._retire()
+
+    def _enqueue(self, row, column):
+        """Put the copies of a message into an outbox, dropped if they do not all fit"""
+        outbox = self.outboxes[row]
+        if len(outbox) + self.repeats > self.outbox_size:
+            self.stats['dropped_outbox'] += 1
+            return False
+        outbox.extend([column] * self.repeats)
+        self.queued[column] += self.repeats
+        return True
+
+    def _retire(self):
+        """Free the columns of messages no outbox holds any more, they cannot spread further"""
+        done = np.flatnonzero((self.message_ids >= 0) & (self.queued <= 0))
+        if not len(done):
+            return
+        rows = len(self.ids)
+        for column in done.tolist():
+            message_id = int(self.message_ids[column])
+            del self.columns[message_id]
+            self.history[message_id] = (int(self.created[column]), self.received[:rows, column].copy())
+            self.payloads[column] = None
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+        self.received[:, done] = -1
+        self.hops[:, done] = 0
+        self.message_ids[done] = -1
+        self.free.extend(done[::-1].tolist())
+        self.stats['retired'] += len(done)
+
+    def _reception(self, message_id):
+        """(first reception tick per robot row, creation tick) of a queued or retired message"""
+        column = self.columns.get(message_id)
+        if column is not None:
+            return self.received[:len(self.ids), column], int(self.created[column])
+        if message_id not in self.history:
+            raise ValueError(f"Message {message_id} is unknown or no longer in the history")
+        created, received = self.history[message_id]
+        missing = len(self.ids) - len(received)
+        if missing > 0:
+            # Robots that joined after the message was retired never received it
+            received = np.concatenate((received, np.full(missing, -1, dtype=np.int64)))
+        return received, created
+
+    def _pair_probability(self, tx_rows, rx_rows, rx_index, strength):
+        """Delivery probability of every (transmitting robot, receiving robot) pair in the links
+
+        The signal of a robot at a receiver is the sum of its links to that
+        receiver, the interference the sum of all other links. Each pair uses
+        the receiver with the best SINR. Pairs are returned sorted by transmitter.
+        """
+        width = int(rx_index.max()) + 1
+        receiver = rx_rows * width + rx_index
+        receivers, receiver_index = np.unique(receiver, return_inverse=True)
+        total = np.bincount(receiver_index, strength)
+
+        key = receiver_index.astype(np.int64) * len(self.ids) + tx_rows
+        keys, key_index = np.unique(key, return_inverse=True)
+        signal = np.bincount(key_index, strength)
+        receiver_of_key = keys // len(self.ids)
+        interference = total[receiver_of_key] - signal
+        snr = signal / (interference + self.noise_floor)
+        snr_db = 10 * np.log10(np.maximum(snr, 1e-12))
+        probability = 1.0 / (1.0 + np.exp(-(snr_db - self.snr_threshold_db) / self.snr_width))
+
+        key_tx = keys % len(self.ids)
+        key_rx = receivers[receiver_of_key] // width
+        pair = key_tx * len(self.ids) + key_rx
+        pairs, pair_index = np.unique(pair, return_inverse=True)
+        best = np.zeros(len(pairs))
+        np.maximum.at(best, pair_index, probability)
+        pair_tx, pair_rx = pairs // len(self.ids), pairs % len(self.ids)
+        own = pair_tx == pair_rx
+        return pair_tx[~own], pair_rx[~own], best[~own]
+
+    def _row(self, robot_id):
+        row = self.rows.get(robot_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(robot_id)
+            self.rows[robot_id] = row
+            self.outboxes.append(deque())
+            self.inboxes.append(deque())
+            if row >= self.received.shape[0]:
+                self._grow(rows=max(16, 2 * self.received.shape[0]))
+        return row
+
+    def _rows_array(self, robot_ids):
+        """Rows of an array of robot ids, adding robots seen for the first time"""
+        unique, inverse = np.unique(robot_ids, return_inverse=True)
+        return np.array([self._row(robot_id) for robot_id in unique.tolist()], dtype=np.int64)[inverse]
+
+    def _rows_of(self, robot_ids):
+        if robot_ids is None:
+            return np.arange(len(self.ids))
+        return np.array([self.rows[robot_id] for robot_id in robot_ids if robot_id in self.rows], dtype=np.int64)
+
+    def _add_message(self, source, destination, ttl, payload):
+        """Give a new message an id and a free column, returns the column"""
+        if not self.free:
+            old = len(self.sources)
+            capacity = max(16, 2 * old)
+            extra = capacity - old
+            self.message_ids = np.concatenate((self.message_ids, np.full(extra, -1, dtype=np.int64)))
+            self.queued = np.concatenate((self.queued, np.zeros(extra, dtype=np.int64)))
+            self.sources = np.concatenate((self.sources, np.zeros(extra, dtype=np.int64)))
+            self.destinations = np.concatenate((self.destinations, np.zeros(extra, dtype=np.int64)))
+            self.created = np.concatenate((self.created, np.zeros(extra, dtype=np.int64)))
+            self.ttls = np.concatenate((self.ttls, np.zeros(extra, dtype=np.int64)))
+            self.payloads.extend([None] * extra)
+            self.free.extend(range(capacity - 1, old - 1, -1))
+            self._grow(messages=capacity)
+        column = self.free.pop()
+        message_id = self.message_count
+        self.message_count += 1
+        self.columns[message_id] = column
+        self.message_ids[column] = message_id
+        self.queued[column] = 0
+        self.sources[column] = source
+        self.destinations[column] = destination
+        self.created[column] = self.tick
+        self.ttls[column] = ttl
+        self.payloads[column] = payload
+        return column
+
+    def _grow(self, rows=None, messages=None):
+        """Enlarge the (robot, column) tables"""
+        old_rows, old_messages = self.received.shape
+        rows = old_rows if rows is None else rows
+        messages = old_messages if messages is None else messages
+        received = np.full((rows, messages), -1, dtype=np.int64)
+        hops = np.zeros((rows, messages), dtype=np.int64)
+        received[:old_rows, :old_messages] = self.received
+        hops[:old_rows, :old_messages] = self.hops
+        self.received, self.hops = received, hops
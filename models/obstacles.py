@@ -0,0 +1,327 @@
+"""Static obstacles (walls, boxes, polygons) with a bounding-volume hierarchy
+
+All shapes are broken into line segments, stored in meters and indexed by
+a BVH that is built once, on the first query after the map changed. Line of
+sight and collision queries walk the tree, so their cost grows with the
+log of the number of segments instead of linearly.
+
+Robots are dynamic and are not part of the map; they are tested
+separately by the simulation.
+"""
+import numpy as np
+
+SHAPE_TYPES = ('wall', 'box', 'polygon')
+
+
+class StaticObstacleMap:
+    """Static obstacle geometry in meters
+
+    Queries take points in simulation units together with the scale
+    (units per meter), so pixel coordinates can be passed directly.
+    Panning the view only changes the map origin, the tree is not rebuilt.
+    """
+
+    LEAF_SIZE = 4  # Maximum segments per BVH leaf
+
+    def __init__(self):
+        self.shapes = []        # (type, points) of every added shape, for drawing and saving
+        self.origin_x = 0.0     # Offset of the map in the simulation frame (m)
+        self.origin_y = 0.0
+        self._segments = []     # (x1, y1, x2, y2) in map coordinates (m)
+        self._bvh = None
+        self.version = 0        # Incremented whenever the geometry changes
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __bool__(self):
+        return bool(self.shapes)
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def clear(self):
+        """Remove all obstacles"""
+        self.shapes.clear()
+        self._segments.clear()
+        self.origin_x = 0.0
+        self.origin_y = 0.0
+        self._bvh = None
+        self.version += 1
+
+    def add_wall(self, x1, y1, x2, y2):
+        """Add a wall segment from (x1, y1) to (x2, y2) in meters"""
+        self._add_shape('wall', [(x1, y1), (x2, y2)], closed=False)
+
+    def add_box(self, x, y, width, height):
+        """Add an axis-aligned box with top-left corner (x, y) in meters"""
+        if width <= 0 or height <= 0:
+            raise ValueError("Box width and height must be positive")
+        points = [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+        self._add_shape('box', points, closed=True)
+
+    def add_polygon(self, points):
+        """Add a closed polygon given by its corners in meters"""
+        if len(points) < 3:
+            raise ValueError("A polygon needs at least 3 points")
+        self._add_shape('polygon', points, closed=True)
+
+    def add_shape(self, shape):
+        """Add a shape from its dict form, see to_list()"""
+        kind = shape.get('type')
+        if kind == 'wall':
+            (x1, y1), (x2, y2) = shape['points']
+            self.add_wall(x1, y1, x2, y2)
+        elif kind == 'box':
+            self.add_box(shape['x'], shape['y'], shape['width'], shape['height'])
+        elif kind == 'polygon':
+            self.add_polygon(shape['points'])
+        else:
+            raise ValueError(f"Unknown obstacle type '{kind}', expected one of {', '.join(SHAPE_TYPES)}")
+
+    def to_list(self):
+        """Convert shapes to JSON-serializable dicts (simulation frame, meters)"""
+        result = []
+        for kind, points in self.shape_points():
+            if kind == 'box':
+                (x0, y0), _, (x1, y1), _ = points
+                result.append({'type': 'box', 'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0})
+            else:
+                result.append({'type': kind, 'points': [list(point) for point in points]})
+        return result
+
+    def translate(self, dx, dy):
+        """Move the whole map by (dx, dy) meters"""
+        self.origin_x += dx
+        self.origin_y += dy
+
+    def shape_points(self, scale=1.0):
+        """Yield (type, points) of every shape in simulation units"""
+        ox, oy = self.origin_x, self.origin_y
+        for kind, points in self.shapes:
+            yield kind, [((x + ox) * scale, (y + oy) * scale) for x, y in points]
+
+    def build(self):
+        """Build the BVH over all segments (done automatically when needed)"""
+        self._bvh = _BVH(self._segments, self.LEAF_SIZE)
+        return self._bvh
+
+    def line_of_sight(self, p1, p2, scale=1.0):
+        """Check that the segment p1-p2 does not cross any obstacle
+
+        Args:
+            p1, p2: End points in simulation units
+            scale: Simulation units per meter (the simulation scale for pixels)
+        """
+        if not self._segments:
+            return True
+        x1, y1 = self._to_map(p1, scale)
+        x2, y2 = self._to_map(p2, scale)
+        return not self._tree().segment_hits(x1, y1, x2, y2)
+
+    def collides_polygon(self, points, scale=1.0):
+        """Check whether a convex polygon (e.g. a robot outline) touches any obstacle"""
+        if not self._segments:
+            return False
+        polygon = [self._to_map(point, scale) for point in points]
+        return self._tree().polygon_hits(polygon)
+
+    def segments_near(self, x_min, y_min, x_max, y_max, scale=1.0):
+        """Indices of segments whose bounds overlap the given box (simulation units)"""
+        if not self._segments:
+            return []
+        x0, y0 = self._to_map((x_min, y_min), scale)
+        x1, y1 = self._to_map((x_max, y_max), scale)
+        return self._tree().query_box(x0, y0, x1, y1)
+
+    def segments(self):
+        """(N, 4) array of segments (x1, y1, x2, y2) in map coordinates"""
+        return np.array(self._segments, dtype=np.float64).reshape(-1, 4)
+
+    def _add_shape(self, kind, points, closed):
+        points = [(float(x), float(y)) for x, y in points]
+        self.shapes.append((kind, points))
+        count = len(points) if closed else len(points) - 1
+        for i in range(count):
+            (ax, ay), (bx, by) = points[i], points[(i + 1) % len(points)]
+            self._segments.append((ax, ay, bx, by))
+        self._bvh = None
+        self.version += 1
+
+    def _to_map(self, point, scale):
+        return point[0] / scale - self.origin_x, point[1] / scale - self.origin_y
+
+    def _tree(self):
+        if self._bvh is None:
+            self.build()
+        return self._bvh
+
+
+class _BVH:
+    """Binary AABB tree over line segments, stored in flat lists
+
+    Nodes are split at the median of the longest axis of their segment
+    centers. Leaves hold up to leaf_size consecutive segments of the
+    reordered segment list.
+    """
+
+    def __init__(self, segments, leaf_size):
+        self.segments = []
+        self.bounds = []   # (x_min, y_min, x_max, y_max) per node
+        self.left = []     # Child node indices, -1 for leaves
+        self.right = []
+        self.start = []    # First segment of a leaf
+        self.count = []    # Number of segments of a leaf
+
+        if not segments:
+            return
+        data = np.asarray(segments, dtype=np.float64)
+        self._data = data
+        self._centers = np.column_stack(((data[:, 0] + data[:, 2]) / 2, (data[:, 1] + data[:, 3]) / 2))
+        order = []
+        self._build(np.arange(len(data)), leaf_size, order)
+        self.segments = [tuple(row) for row in data[order].tolist()]
+        del self._data, self._centers
+
+    def _build(self, indices, leaf_size, order):
+        """Create the node for `indices`, returns its index"""
+        data = self._data[indices]
+        node = len(self.bounds)
+        self.bounds.append((float(np.minimum(data[:, 0], data[:, 2]).min()),
+                            float(np.minimum(data[:, 1], data[:, 3]).min()),
+                            float(np.maximum(data[:, 0], data[:, 2]).max()),
+                            float(np.maximum(data[:, 1], data[:, 3]).max())))
+        self.left.append(-1)
+        self.right.append(-1)
+        self.start.append(len(order))
+        self.count.append(0)
+
+        if len(indices) <= leaf_size:
+            order.extend(indices.tolist())
+            self.count[node] = len(indices)
+            return node
+
+        centers = self._centers[indices]
+        extent = centers.max(axis=0) - centers.min(axis=0)
+        axis = 0 if extent[0] >= extent[1] else 1
+        sorted_indices = indices[np.argsort(centers[:, axis], kind='stable')]
+        half = len(sorted_indices) // 2
+
+        self.left[node] = self._build(sorted_indices[:half], leaf_size, order)
+        self.right[node] = self._build(sorted_indices[half:], leaf_size, order)
+        return node
+
+    def segment_hits(self, x1, y1, x2, y2):
+        """Whether the segment crosses any stored segment"""
+        if not self.bounds:
+            return False
+        seg_min_x, seg_max_x = min(x1, x2), max(x1, x2)
+        seg_min_y, seg_max_y = min(y1, y2), max(y1, y2)
+        dx, dy = x2 - x1, y2 - y1
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            bx0, by0, bx1, by1 = self.bounds[node]
+            if bx0 > seg_max_x or bx1 < seg_min_x or by0 > seg_max_y or by1 < seg_min_y:
+                continue
+            if not _segment_overlaps_box(x1, y1, dx, dy, bx0, by0, bx1, by1):
+                continue
+            if self.left[node] >= 0:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+                continue
+            start = self.start[node]
+            for sx1, sy1, sx2, sy2 in self.segments[start:start + self.count[node]]:
+                if _segments_intersect(x1, y1, x2, y2, sx1, sy1, sx2, sy2):
+                    return True
+        return False
+
+    def query_box(self, x_min, y_min, x_max, y_max):
+        """Indices (into self.segments) of segments whose bounds overlap a box"""
+        found = []
+        if not self.bounds:
+            return found
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            bx0, by0, bx1, by1 = self.bounds[node]
+            if bx0 > x_max or bx1 < x_min or by0 > y_max or by1 < y_min:
+                continue
+            if self.left[node] >= 0:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+                continue
+            start = self.start[node]
+            for i in range(start, start + self.count[node]):
+                sx1, sy1, sx2, sy2 = self.segments[i]
+                if (min(sx1, sx2) <= x_max and max(sx1, sx2) >= x_min and
+                        min(sy1, sy2) <= y_max and max(sy1, sy2) >= y_min):
+                    found.append(i)
+        return found
+
+    def polygon_hits(self, polygon):
+        """Whether a convex polygon overlaps any stored segment"""
+        xs = [x for x, _ in polygon]
+        ys = [y for _, y in polygon]
+        candidates = self.query_box(min(xs), min(ys), max(xs), max(ys))
+        if not candidates:
+            return False
+
+        edges = [(polygon[i], polygon[(i + 1) % len(polygon)]) for i in range(len(polygon))]
+        for i in candidates:
+            sx1, sy1, sx2, sy2 = self.segments[i]
+            # Segment end inside the polygon, or crossing one of its edges
+            if _point_in_convex_polygon(sx1, sy1, polygon):
+                return True
+            for (ax, ay), (bx, by) in edges:
+                if _segments_intersect(sx1, sy1, sx2, sy2, ax, ay, bx, by):
+                    return True
+        return False
+
+
+def _segment_overlaps_box(x1, y1, dx, dy, bx0, by0, bx1, by1):
+    """Slab test of segment (x1, y1) + t * (dx, dy), t in [0, 1], against a box"""
+    t_min, t_max = 0.0, 1.0
+    for origin, direction, low, high in ((x1, dx, bx0, bx1), (y1, dy, by0, by1)):
+        if abs(direction) < 1e-12:
+            if origin < low or origin > high:
+                return False
+            continue
+        t1 = (low - origin) / direction
+        t2 = (high - origin) / direction
+        if t1 > t2:
+            t1, t2 = t2, t1
+        t_min = max(t_min, t1)
+        t_max = min(t_max, t2)
+        if t_min > t_max:
+            return False
+    return True
+
+
+def _segments_intersect(x1, y1, x2, y2, x3, y3, x4, y4):
+    """Same test as utils.geometry.line_intersects_line, on plain floats"""
+    denominator = (y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1)
+    if denominator == 0:
+        return False
+    ua = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / denominator
+    ub = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / denominator
+    return 0 <= ua <= 1 and 0 <= ub <= 1
+
+
+def _point_in_convex_polygon(px, py, polygon):
+    """Whether a point lies inside a convex polygon (either winding)"""
+    sign = 0
+    count = len(polygon)
+    for i in range(count):
+        ax, ay = polygon[i]
+        bx, by = polygon[(i + 1) % count]
+        cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+        if cross != 0:
+            if sign == 0:
+                sign = 1 if cross > 0 else -1
+            elif (cross > 0) != (sign > 0):
+                return False
+    return True
+
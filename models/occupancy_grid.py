@@ -0,0 +1,209 @@
+"""Binary occupancy grid maps loaded from floor-plan images
+
+A floor plan (PNG, BMP, ...) is converted to a grid of occupied/free cells
+at a chosen size in meters per cell: dark pixels are walls, light pixels
+free space. Line of sight is checked with a DDA ray march over the cells
+the segment passes through, so its cost depends on the segment length in
+cells and not on how many walls the plan contains.
+
+Pillow is only needed to read images; grids can also be built from arrays.
+"""
+import math
+import numpy as np
+
+
+class OccupancyGrid:
+    """Occupied/free cells covering the arena
+
+    Cell (row, col) spans x in [col, col + 1) * resolution and y in
+    [row, row + 1) * resolution relative to the grid origin, with y pointing
+    down like the canvas. Queries take points in simulation units together
+    with the scale (units per meter), same as StaticObstacleMap.
+    """
+
+    def __init__(self, occupied, resolution, origin=(0.0, 0.0)):
+        occupied = np.asarray(occupied, dtype=bool)
+        if occupied.ndim != 2:
+            raise ValueError("Occupancy grid must be a 2D array")
+        if resolution <= 0:
+            raise ValueError("Resolution (meters per cell) must be positive")
+        self.occupied = occupied
+        self.resolution = float(resolution)
+        self.origin_x, self.origin_y = (float(v) for v in origin)
+        self.source = None  # Image file the grid was loaded from, if any
+        self.threshold = None
+        self.invert = False
+        self._rows = occupied.tolist()  # Nested lists are faster to index from Python
+        self._has_walls = bool(occupied.any())
+        self.version = 0  # Incremented whenever the cells change
+
+    @classmethod
+    def from_image(cls, filename, resolution, threshold=128, invert=False, origin=(0.0, 0.0)):
+        """Load a floor plan image
+
+        Args:
+            filename: Image file readable by Pillow (PNG, BMP, ...)
+            resolution: Meters per pixel/cell
+            threshold: Gray level (0-255) below which a pixel is occupied
+            invert: Treat light pixels as occupied instead of dark ones
+            origin: Position of the top-left corner of the image (m)
+        """
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ValueError("Loading map images requires the 'Pillow' package")
+
+        with Image.open(filename) as image:
+            # Transparent pixels count as free space
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGBA', image.size, (255, 255, 255, 255))
+                image = Image.alpha_composite(background, image)
+            gray = np.asarray(image.convert('L'))
+
+        occupied = gray >= threshold if invert else gray < threshold
+        grid = cls(occupied, resolution, origin)
+        grid.source = filename
+        grid.threshold = threshold
+        grid.invert = invert
+        return grid
+
+    def __bool__(self):
+        return self._has_walls
+
+    @property
+    def shape(self):
+        return self.occupied.shape
+
+    @property
+    def width(self):
+        """Width of the grid (m)"""
+        return self.occupied.shape[1] * self.resolution
+
+    @property
+    def height(self):
+        """Height of the grid (m)"""
+        return self.occupied.shape[0] * self.resolution
+
+    def clear(self):
+        """Mark every cell free"""
+        self.occupied[:] = False
+        self._rows = self.occupied.tolist()
+        self._has_walls = False
+        self.version += 1
+
+    def translate(self, dx, dy):
+        """Move the grid by (dx, dy) meters"""
+        self.origin_x += dx
+        self.origin_y += dy
+
+    def cell_of(self, x, y, scale=1.0):
+        """(row, col) of the cell containing a point in simulation units"""
+        gx, gy = self._to_grid(x, y, scale)
+        return int(math.floor(gy)), int(math.floor(gx))
+
+    def is_occupied(self, x, y, scale=1.0):
+        """Whether the point lies in an occupied cell (outside the grid is free)"""
+        row, col = self.cell_of(x, y, scale)
+        return self._cell(row, col)
+
+    def line_of_sight(self, p1, p2, scale=1.0):
+        """Check that no occupied cell lies on the segment p1-p2"""
+        x1, y1 = self._to_grid(p1[0], p1[1], scale)
+        x2, y2 = self._to_grid(p2[0], p2[1], scale)
+        return not self._ray_hits(x1, y1, x2, y2)
+
+    def collides_polygon(self, points, scale=1.0):
+        """Check whether a convex polygon (e.g. a robot outline) touches an occupied cell
+
+        Marches along every edge, then looks for occupied cells enclosed by
+        polygons that span more than a few cells.
+        """
+        grid_points = [self._to_grid(x, y, scale) for x, y in points]
+        gx, gy = grid_points[0]
+        if self._cell(int(math.floor(gy)), int(math.floor(gx))):
+            return True
+        count = len(grid_points)
+        for i in range(count):
+            ax, ay = grid_points[i]
+            bx, by = grid_points[(i + 1) % count]
+            if self._ray_hits(ax, ay, bx, by):
+                return True
+
+        # Occupied cells fully inside a polygon larger than a few cells
+        xs = [x for x, _ in grid_points]
+        ys = [y for _, y in grid_points]
+        rows, cols = self.occupied.shape
+        row0, row1 = max(0, int(math.floor(min(ys)))), min(rows, int(math.ceil(max(ys))))
+        col0, col1 = max(0, int(math.floor(min(xs)))), min(cols, int(math.ceil(max(xs))))
+        if row1 - row0 <= 2 or col1 - col0 <= 2:
+            return False
+        cells_y, cells_x = np.nonzero(self.occupied[row0:row1, col0:col1])
+        if not len(cells_x):
+            return False
+        centers_x = cells_x + col0 + 0.5
+        centers_y = cells_y + row0 + 0.5
+
+        # Same side of every edge as the polygon winding (sign of its area)
+        area = sum(grid_points[i][0] * grid_points[(i + 1) % count][1] -
+                   grid_points[(i + 1) % count][0] * grid_points[i][1] for i in range(count))
+        winding = 1.0 if area > 0 else -1.0
+        inside = np.ones(len(centers_x), dtype=bool)
+        for i in range(count):
+            ax, ay = grid_points[i]
+            bx, by = grid_points[(i + 1) % count]
+            inside &= ((bx - ax) * (centers_y - ay) - (by - ay) * (centers_x - ax)) * winding >= 0
+        return bool(inside.any())
+
+    def to_rgba(self, color=(90, 90, 90, 255)):
+        """(rows, cols, 4) uint8 image of the occupied cells, free cells transparent"""
+        image = np.zeros(self.occupied.shape + (4,), dtype=np.uint8)
+        image[self.occupied] = color
+        return image
+
+    def _to_grid(self, x, y, scale):
+        """Simulation units to fractional cell coordinates"""
+        return ((x / scale - self.origin_x) / self.resolution,
+                (y / scale - self.origin_y) / self.resolution)
+
+    def _cell(self, row, col):
+        if 0 <= row < len(self._rows) and 0 <= col < len(self._rows[0]):
+            return self._rows[row][col]
+        return False
+
+    def _ray_hits(self, x1, y1, x2, y2):
+        """DDA march (Amanatides & Woo) from (x1, y1) to (x2, y2) in cell units"""
+        rows = len(self._rows)
+        cols = len(self._rows[0]) if rows else 0
+        col, row = int(math.floor(x1)), int(math.floor(y1))
+        end_col, end_row = int(math.floor(x2)), int(math.floor(y2))
+        dx, dy = x2 - x1, y2 - y1
+
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Parameter t (0..1 along the segment) at the next vertical/horizontal cell border
+        if dx != 0:
+            next_x = col + 1 if dx > 0 else col
+            t_max_x = (next_x - x1) / dx
+            t_delta_x = abs(1 / dx)
+        else:
+            t_max_x = t_delta_x = math.inf
+        if dy != 0:
+            next_y = row + 1 if dy > 0 else row
+            t_max_y = (next_y - y1) / dy
+            t_delta_y = abs(1 / dy)
+        else:
+            t_max_y = t_delta_y = math.inf
+
+        grid = self._rows
+        steps = abs(end_col - col) + abs(end_row - row)
+        for _ in range(steps + 1):
+            if 0 <= row < rows and 0 <= col < cols and grid[row][col]:
+                return True
+            if t_max_x < t_max_y:
+                col += step_x
+                t_max_x += t_delta_x
+            else:
+                row += step_y
+                t_max_y += t_delta_y
+        return False
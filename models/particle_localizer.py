@@ -0,0 +1,282 @@
+"""Particle-filter localization of robots from their IR links
+
+Every localized robot keeps a cloud of pose hypotheses (x, y in simulation
+units, orientation in degrees). Each step the particles are moved with the
+robot's odometry plus noise, then weighted by how well the strengths they
+would receive from the anchors (robots or beacons whose pose is known)
+match the strengths actually received in that tick. The expected strengths
+come from the same Rician channel model as the link engine, evaluated for
+all links and particles at once.
+
+Particles of all robots are stored in one (robots, particles, 3) array and
+their weights in a (robots, particles) array.
+
+    simulation.localizer.track(robot.id)            # Global localization
+    simulation.localizer.track(robot.id, pose=...)  # Known start pose
+    x, y, orientation, spread = simulation.localizer.estimate(robot.id)
+"""
+import math
+import numpy as np
+from models.link_engine import gather_sensors
+from utils.ir_physics import distance_to_signal_strength_rician_array
+
+# Links evaluated against all particles in one pass, bounds the temporary arrays
+_LINK_CHUNK = 16
+
+
+class ParticleLocalizer:
+    """Pose estimates of robots from IR link strengths to anchors"""
+
+    def __init__(self, simulation, particles=2000, strength_noise=5.0, outlier_probability=0.05,
+                 motion_noise=0.005, odometry_noise=0.1, turn_noise=2.0, resample_threshold=0.5,
+                 seed=None):
+        """
+        Args:
+            simulation: Simulation whose robots are localized
+            particles: Particles per robot
+            strength_noise: Standard deviation of received strengths around the model (0-100 scale)
+            outlier_probability: Chance that a link does not follow the model (reflections, occlusion)
+            motion_noise: Standard deviation of the position drift per step (m)
+            odometry_noise: Extra position standard deviation per meter traveled
+            turn_noise: Standard deviation of the heading drift per step (degrees)
+            resample_threshold: Resample when the effective sample size drops below this fraction
+            seed: Seed of the random generator
+        """
+        if particles < 1:
+            raise ValueError("Particle filter needs at least one particle")
+        if not 0 <= outlier_probability < 1:
+            raise ValueError("Outlier probability must be in [0, 1)")
+        self.simulation = simulation
+        self.particle_count = int(particles)
+        self.strength_noise = float(strength_noise)
+        self.outlier_probability = float(outlier_probability)
+        self.motion_noise = float(motion_noise)
+        self.odometry_noise = float(odometry_noise)
+        self.turn_noise = float(turn_noise)
+        self.resample_threshold = float(resample_threshold)
+        self.rng = np.random.default_rng(seed)
+        self.anchors = None  # Robot ids with known pose, None: every robot that is not localized
+        self.reset()
+
+    def reset(self):
+        """Stop localizing all robots"""
+        self.ids = []                  # Localized robot id per row
+        self.index = {}                # robot_id -> row
+        self.particles = np.zeros((0, self.particle_count, 3))
+        self.weights = np.zeros((0, self.particle_count))
+        self.odometry_pose = np.zeros((0, 3))  # Pose at the last step, odometry is measured from it
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_anchors(self, robot_ids=None):
+        """Robots whose links are used as measurements, None for every robot not being localized"""
+        self.anchors = None if robot_ids is None else set(robot_ids)
+
+    def track(self, robot_id, pose=None, spread=(0.05, 10.0), bounds=None):
+        """Start localizing a robot
+
+        Args:
+            robot_id: Robot to localize
+            pose: Known start pose (x, y, orientation), None for global localization
+            spread: Standard deviation around pose (m, degrees)
+            bounds: (min_x, min_y, max_x, max_y) sampled without a pose, default the arena
+        """
+        robot = self.simulation.get_robot_by_id(robot_id)
+        if robot is None:
+            raise ValueError(f"No robot with id {robot_id}")
+        count = self.particle_count
+        if pose is not None:
+            sigma = spread[0] * self.simulation.scale
+            particles = np.column_stack((self.rng.normal(pose[0], sigma, count),
+                                         self.rng.normal(pose[1], sigma, count),
+                                         self.rng.normal(pose[2], spread[1], count) % 360))
+        else:
+            min_x, min_y, max_x, max_y = bounds or (0, 0, self.simulation.max_x, self.simulation.max_y)
+            particles = np.column_stack((self.rng.uniform(min_x, max_x, count),
+                                         self.rng.uniform(min_y, max_y, count),
+                                         self.rng.uniform(0, 360, count)))
+
+        row = self.index.get(robot_id)
+        if row is None:
+            row = len(self.ids)
+            self.ids.append(robot_id)
+            self.index[robot_id] = row
+            self.particles = np.concatenate((self.particles, np.zeros((1, count, 3))))
+            self.weights = np.concatenate((self.weights, np.zeros((1, count))))
+            self.odometry_pose = np.concatenate((self.odometry_pose, np.zeros((1, 3))))
+        self.particles[row] = particles
+        self.weights[row] = 1.0 / count
+        self.odometry_pose[row] = (robot.x, robot.y, robot.orientation)
+
+    def forget(self, robot_id):
+        """Stop localizing a robot"""
+        row = self.index.get(robot_id)
+        if row is None:
+            return
+        keep = np.arange(len(self.ids)) != row
+        self.particles, self.weights = self.particles[keep], self.weights[keep]
+        self.odometry_pose = self.odometry_pose[keep]
+        self.ids.pop(row)
+        self.index = {robot_id: row for row, robot_id in enumerate(self.ids)}
+
+    def estimate(self, robot_id):
+        """(x, y, orientation, spread) of a localized robot, None if it is not localized
+
+        spread is the standard deviation of the particle positions, in
+        simulation units like x and y.
+        """
+        row = self.index.get(robot_id)
+        if row is None:
+            return None
+        weights, particles = self.weights[row], self.particles[row]
+        x = float(weights @ particles[:, 0])
+        y = float(weights @ particles[:, 1])
+        angle = np.radians(particles[:, 2])
+        orientation = math.degrees(math.atan2(weights @ np.sin(angle), weights @ np.cos(angle))) % 360
+        spread = math.sqrt(weights @ ((particles[:, 0] - x) ** 2 + (particles[:, 1] - y) ** 2))
+        return x, y, orientation, spread
+
+    def step(self, links=None):
+        """Move the particles with the odometry and weight them with the links of this tick
+
+        Args:
+            links: LinkTable received in this tick, default simulation.links
+        """
+        robots = {robot.id: robot for robot in self.simulation.robots}
+        for robot_id in [robot_id for robot_id in self.ids if robot_id not in robots]:
+            self.forget(robot_id)
+        if not self.ids:
+            return
+        tracked = [robots[robot_id] for robot_id in self.ids]
+        self._predict(tracked)
+
+        links = self.simulation.links if links is None else links
+        if links is None or not len(links):
+            return
+        anchors = self.anchors if self.anchors is not None else set(robots) - set(self.ids)
+        anchor_ids = np.array(sorted(anchor_id for anchor_id in anchors if anchor_id in robots), dtype=np.int64)
+        tracked_ids = np.array(self.ids, dtype=np.int64)
+        used = np.isin(links.rx_robot, tracked_ids) & np.isin(links.tx_robot, anchor_ids)
+        if not used.any():
+            return
+        links = links.select(used)
+
+        log_likelihood = self._log_likelihood(links, tracked, [robots[i] for i in anchor_ids.tolist()], anchor_ids)
+        rows = np.flatnonzero(log_likelihood.any(axis=1))
+        log_weights = np.log(np.maximum(self.weights[rows], 1e-300)) + log_likelihood[rows]
+        log_weights -= log_weights.max(axis=1, keepdims=True)
+        weights = np.exp(log_weights)
+        self.weights[rows] = weights / weights.sum(axis=1, keepdims=True)
+
+        effective = 1.0 / (self.weights[rows] ** 2).sum(axis=1)
+        self._resample(rows[effective < self.resample_threshold * self.particle_count])
+
+    def _predict(self, tracked):
+        """Apply each robot's displacement since the last step, in its own frame, to its particles"""
+        poses = np.array([(robot.x, robot.y, robot.orientation) for robot in tracked], dtype=np.float64)
+        dx, dy = (poses[:, :2] - self.odometry_pose[:, :2]).T
+        turn = (poses[:, 2] - self.odometry_pose[:, 2] + 180) % 360 - 180
+        heading = np.radians(self.odometry_pose[:, 2])
+        forward = dx * np.cos(heading) + dy * np.sin(heading)
+        lateral = -dx * np.sin(heading) + dy * np.cos(heading)
+        self.odometry_pose = poses
+
+        shape = self.weights.shape
+        sigma = (self.motion_noise * self.simulation.scale + self.odometry_noise * np.hypot(dx, dy))[:, None]
+        angle = np.radians(self.particles[:, :, 2])
+        cos, sin = np.cos(angle), np.sin(angle)
+        self.particles[:, :, 0] += (forward[:, None] * cos - lateral[:, None] * sin +
+                                    self.rng.standard_normal(shape) * sigma)
+        self.particles[:, :, 1] += (forward[:, None] * sin + lateral[:, None] * cos +
+                                    self.rng.standard_normal(shape) * sigma)
+        self.particles[:, :, 2] = (self.particles[:, :, 2] + turn[:, None] +
+                                   self.rng.standard_normal(shape) * self.turn_noise) % 360
+
+    def _log_likelihood(self, links, tracked, anchors, anchor_ids):
+        """(robots, particles) log likelihood of the received strengths for every particle"""
+        scale = self.simulation.scale
+
+        # Transmitters of the anchors in their true pose
+        anchor_poses = np.array([(robot.x, robot.y, robot.size, robot.orientation) for robot in anchors],
+                                dtype=np.float64).reshape(-1, 4)
+        tx, _ = gather_sensors(anchors, anchor_poses)
+        tx_row = _sensor_rows(tx, len(anchors), np.searchsorted(anchor_ids, links.tx_robot), links.tx_index)
+
+        # Receivers of the localized robots relative to their center, at orientation 0
+        local_poses = np.array([(0.0, 0.0, robot.size, 0.0) for robot in tracked], dtype=np.float64)
+        _, rx = gather_sensors(tracked, local_poses)
+        robot_row = np.array([self.index[robot_id] for robot_id in links.rx_robot.tolist()], dtype=np.int64)
+        rx_row = _sensor_rows(rx, len(tracked), robot_row, links.rx_index)
+
+        valid = (tx_row >= 0) & (rx_row >= 0)
+        tx_row, rx_row, robot_row = tx_row[valid], rx_row[valid], robot_row[valid]
+        observed = links.strength[valid]
+
+        # Beam and viewing directions as unit vectors, cone tests become dot products
+        tx_angle = np.radians(tx['direction'])
+        tx_dir_x, tx_dir_y = np.cos(tx_angle), np.sin(tx_angle)
+        rx_angle = np.radians(rx['direction'])
+        rx_dir_x, rx_dir_y = np.cos(rx_angle), np.sin(rx_angle)
+        tx_cos_half = np.cos(np.radians(tx['half_angle']))
+        rx_cos_half = np.cos(np.radians(rx['half_angle']))
+        heading = np.radians(self.particles[:, :, 2])
+        heading_cos, heading_sin = np.cos(heading), np.sin(heading)
+
+        sigma = self.strength_noise
+        inlier = (1 - self.outlier_probability) / (sigma * math.sqrt(2 * math.pi))
+        outlier = self.outlier_probability / 100.0
+        log_likelihood = np.zeros(self.weights.shape)
+        for start in range(0, len(observed), _LINK_CHUNK):
+            part = slice(start, start + _LINK_CHUNK)
+            a, b, rows = tx_row[part], rx_row[part], robot_row[part]
+            cos, sin = heading_cos[rows], heading_sin[rows]
+            local_x, local_y = rx['x'][b][:, None], rx['y'][b][:, None]
+            dx = self.particles[rows, :, 0] + local_x * cos - local_y * sin - tx['x'][a][:, None]
+            dy = self.particles[rows, :, 1] + local_x * sin + local_y * cos - tx['y'][a][:, None]
+            distance = np.maximum(np.hypot(dx, dy), 1e-9)
+
+            # Cosine of the angle between the beam and the ray, and between the receiver and the reverse ray
+            tx_cos = (tx_dir_x[a][:, None] * dx + tx_dir_y[a][:, None] * dy) / distance
+            view_x = rx_dir_x[b][:, None] * cos - rx_dir_y[b][:, None] * sin
+            view_y = rx_dir_x[b][:, None] * sin + rx_dir_y[b][:, None] * cos
+            rx_cos = -(view_x * dx + view_y * dy) / distance
+            visible = ((tx_cos >= tx_cos_half[a][:, None]) & (rx_cos >= rx_cos_half[b][:, None]) &
+                       (distance <= tx['range'][a][:, None]))
+            angle_factor = tx_cos ** 2 * rx_cos ** 2
+            expected = distance_to_signal_strength_rician_array(
+                distance / scale, tx['range'][a][:, None] / scale, tx['strength'][a][:, None],
+                rx['sensitivity'][b][:, None], angle_factor, True, noise=False)
+            expected = np.where(visible, expected, 0.0)
+
+            residual = (observed[part][:, None] - expected) / sigma
+            np.add.at(log_likelihood, rows, np.log(inlier * np.exp(-0.5 * residual ** 2) + outlier))
+        return log_likelihood
+
+    def _resample(self, rows):
+        """Systematic resampling of the given rows, all in one sorted search"""
+        if not len(rows):
+            return
+        count = self.particle_count
+        cumulative = np.cumsum(self.weights[rows], axis=1)
+        cumulative[:, -1] = 1.0
+        positions = (np.arange(count)[None, :] + self.rng.random((len(rows), 1))) / count
+
+        # Shift each row by 2 so that one search over the flattened rows stays within its row
+        offset = 2.0 * np.arange(len(rows))[:, None]
+        chosen = np.searchsorted((cumulative + offset).ravel(), (positions + offset).ravel())
+        chosen = np.minimum(chosen.reshape(len(rows), count) - np.arange(len(rows))[:, None] * count, count - 1)
+        self.particles[rows] = np.take_along_axis(self.particles[rows], chosen[:, :, None], axis=1)
+        self.weights[rows] = 1.0 / count
+
+
+def _sensor_rows(sensors, robot_count, robots, indices):
+    """Rows of the sensor arrays for (robot, sensor index) pairs, -1 for sensors that are missing
+
+    Sensors can change between computing the links and localizing (e.g. a
+    transmitter switched off from the UI), such links are skipped.
+    """
+    width = int(sensors['index'].max()) + 1 if len(sensors['index']) else 1
+    lookup = np.full((robot_count, width + 1), -1, dtype=np.int64)
+    lookup[sensors['robot'], sensors['index']] = np.arange(len(sensors['index']))
+    return lookup[robots, np.minimum(indices, width)]
@@ -0,0 +1,327 @@
+"""Relative map of the whole swarm from pairwise IR distance estimates
+
+Every tick the receivers hold estimated distances to the robots they hear
+(receiver.estimated_distances). The solver turns them into one sparse
+distance graph, one edge per pair of robots that hear each other, and
+finds 2D positions (m) whose distances match the graph:
+
+    1. Robots without a position from the previous tick are placed next to
+       placed neighbours. Groups of robots that have none are placed with
+       classical MDS on their shortest-path distances (cold start).
+    2. All positions are refined together with a Levenberg-Marquardt
+       least-squares solve. The normal equations are solved with conjugate
+       gradients over the edge list, so the cost grows with the number of
+       edges and not with the square of the robot count.
+
+The map is relative: each connected group of robots is only defined up to
+a rotation, reflection and translation. accuracy() aligns every group
+with the true positions before measuring the errors.
+"""
+import math
+import numpy as np
+
+# Candidate directions tried when a new robot is placed next to a neighbour
+_PLACEMENT_ANGLES = 16
+
+
+class RelativeMapSolver:
+    """Positions of all robots (m) from the estimated distances between them"""
+
+    def __init__(self, iterations=10, cold_iterations=50, damping=1e-2, huber=0.1,
+                 cg_iterations=50, tolerance=1e-4, seed=None):
+        """
+        Args:
+            iterations: Maximum least-squares iterations per warm-started solve
+            cold_iterations: Maximum least-squares iterations after an MDS initialization
+            damping: Initial Levenberg-Marquardt damping
+            huber: Residual (m) above which edges are down-weighted, None for plain least squares
+            cg_iterations: Maximum conjugate-gradient iterations per least-squares step
+            tolerance: Stop when the cost improves by less than this fraction
+            seed: Seed of the random generator used for placements
+        """
+        self.iterations = int(iterations)
+        self.cold_iterations = int(cold_iterations)
+        self.damping = float(damping)
+        self.huber = huber
+        self.cg_iterations = int(cg_iterations)
+        self.tolerance = float(tolerance)
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        """Forget the previous solution, the next solve starts cold"""
+        self.ids = np.empty(0, dtype=np.int64)     # Robot id per row, sorted
+        self.positions = np.empty((0, 2))          # Map position per row (m)
+        self.labels = np.empty(0, dtype=np.int64)  # Connected component per row
+        self.edges = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+        self.cold_starts = 0
+        self.residual_rms = 0.0                    # Distance residual of the last solve (m)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, robot_id):
+        """(x, y) of a robot in the map frame (m), None if it is not in the map"""
+        row = np.searchsorted(self.ids, robot_id)
+        if row < len(self.ids) and self.ids[row] == robot_id:
+            x, y = self.positions[row]
+            return float(x), float(y)
+        return None
+
+    def update(self, simulation):
+        """Rebuild the distance graph from the robots' receivers and solve it"""
+        self.solve(*collect_distances(simulation))
+
+    def solve(self, first_ids, second_ids, distances):
+        """Solve the map for the edges (first_ids[k], second_ids[k], distances[k] in m)"""
+        first_ids = np.asarray(first_ids, dtype=np.int64)
+        second_ids = np.asarray(second_ids, dtype=np.int64)
+        distances = np.asarray(distances, dtype=np.float64)
+        ids = np.unique(np.concatenate((first_ids, second_ids)))
+        first = np.searchsorted(ids, first_ids)
+        second = np.searchsorted(ids, second_ids)
+
+        # Warm start from the previous solution
+        positions = np.full((len(ids), 2), np.nan)
+        if len(self.ids):
+            rows = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+            known = self.ids[rows] == ids
+            positions[known] = self.positions[rows[known]]
+        labels = _components(len(ids), first, second)
+
+        iterations = self.iterations
+        missing = np.isnan(positions[:, 0])
+        if missing.any():
+            self._place_near_neighbors(positions, first, second, distances)
+            missing = np.isnan(positions[:, 0])
+        if missing.any():
+            self._place_mds(positions, missing, labels, first, second, distances)
+            self.cold_starts += 1
+            iterations = self.cold_iterations
+
+        self.ids, self.labels = ids, labels
+        self.edges = (first, second, distances)
+        self.positions = self._refine(positions, first, second, distances, iterations)
+
+    def accuracy(self, simulation):
+        """Errors of the map against the true robot positions
+
+        Each connected group is aligned to the truth with the rotation,
+        reflection and translation that fit it best (Procrustes).
+
+        Returns:
+            dict with robots, components, edges, rmse, mean_error and
+            max_error (m) and residual_rms, the distance residual (m)
+        """
+        metrics = {'robots': len(self.ids), 'components': len(np.unique(self.labels)),
+                   'edges': len(self.edges[0]), 'rmse': 0.0, 'mean_error': 0.0, 'max_error': 0.0,
+                   'residual_rms': self.residual_rms}
+        if not len(self.ids):
+            return metrics
+
+        truth = np.full((len(self.ids), 2), np.nan)
+        for row, robot_id in enumerate(self.ids.tolist()):
+            robot = simulation.get_robot_by_id(robot_id)
+            if robot is not None:
+                truth[row] = (robot.x / simulation.scale, robot.y / simulation.scale)
+
+        errors = []
+        for label in np.unique(self.labels):
+            rows = np.flatnonzero((self.labels == label) & ~np.isnan(truth[:, 0]))
+            if len(rows):
+                errors.append(np.hypot(*(_align(self.positions[rows], truth[rows]) - truth[rows]).T))
+        errors = np.concatenate(errors) if errors else np.zeros(0)
+        if len(errors):
+            metrics.update(rmse=float(np.sqrt(np.mean(errors ** 2))), mean_error=float(errors.mean()),
+                           max_error=float(errors.max()))
+        return metrics
+
+    def _place_near_neighbors(self, positions, first, second, distances):
+        """Place robots with placed neighbours where they fit the distances to those best"""
+        for _ in range(len(positions)):
+            missing = np.isnan(positions[:, 0])
+            # Edges from a robot without position to a robot with one, in both directions
+            rows = np.concatenate((first, second))
+            others = np.concatenate((second, first))
+            edge_distances = np.concatenate((distances, distances))
+            usable = missing[rows] & ~missing[others]
+            if not usable.any():
+                return
+            rows, others, edge_distances = rows[usable], others[usable], edge_distances[usable]
+
+            angles = np.linspace(0, 2 * math.pi, _PLACEMENT_ANGLES, endpoint=False) + self.rng.uniform(0, 2 * math.pi)
+            circle = np.column_stack((np.cos(angles), np.sin(angles)))
+            for row in np.unique(rows).tolist():
+                mine = rows == row
+                anchor = positions[others[mine][0]]
+                candidates = anchor + circle * edge_distances[mine][0]
+                # Stress of each candidate against all placed neighbours
+                gaps = np.linalg.norm(candidates[:, None, :] - positions[others[mine]][None, :, :], axis=2)
+                stress = ((gaps - edge_distances[mine][None, :]) ** 2).sum(axis=1)
+                positions[row] = candidates[np.argmin(stress)]
+
+    def _place_mds(self, positions, missing, labels, first, second, distances):
+        """Classical MDS for every group of robots without positions, side by side right of the map"""
+        placed = ~np.isnan(positions[:, 0])
+        offset_x = positions[placed, 0].max() + 1.0 if placed.any() else 0.0
+        for label in np.unique(labels[missing]).tolist():
+            rows = np.flatnonzero(labels == label)
+            local = np.full(len(positions), -1, dtype=np.int64)
+            local[rows] = np.arange(len(rows))
+            inside = (local[first] >= 0) & (local[second] >= 0)
+            coordinates = _classical_mds(_shortest_paths(len(rows), local[first[inside]],
+                                                         local[second[inside]], distances[inside]))
+            coordinates -= coordinates.min(axis=0)
+            coordinates[:, 0] += offset_x
+            positions[rows] = coordinates
+            offset_x = coordinates[:, 0].max() + 1.0
+
+    def _refine(self, positions, first, second, distances, iterations):
+        """Levenberg-Marquardt on sum of (|p_i - p_j| - d_ij)^2 over the edges"""
+        if not len(first):
+            self.residual_rms = 0.0
+            return positions
+        damping = self.damping
+        residual, unit = _residuals(positions, first, second, distances)
+        cost = self._cost(residual)
+        for _ in range(iterations):
+            weights = self._weights(residual)
+            gradient = _transpose_product(unit * (weights * residual)[:, None], first, second, len(positions))
+            step = _conjugate_gradient(unit, weights, first, second, damping, -gradient, self.cg_iterations)
+
+            candidate = positions + step
+            new_residual, new_unit = _residuals(candidate, first, second, distances)
+            new_cost = self._cost(new_residual)
+            if new_cost < cost:
+                improvement = (cost - new_cost) / max(cost, 1e-12)
+                positions, residual, unit, cost = candidate, new_residual, new_unit, new_cost
+                damping = max(damping / 10, 1e-9)
+                if improvement < self.tolerance:
+                    break
+            else:
+                damping *= 10
+        self.residual_rms = float(np.sqrt(np.mean(residual ** 2)))
+        return positions
+
+    def _weights(self, residual):
+        """Huber weights, 1 for small residuals"""
+        if self.huber is None:
+            return np.ones(len(residual))
+        return np.minimum(1.0, self.huber / np.maximum(np.abs(residual), 1e-12))
+
+    def _cost(self, residual):
+        """Huber cost of the residuals"""
+        if self.huber is None:
+            return float((residual ** 2).sum())
+        absolute = np.abs(residual)
+        return float(np.where(absolute <= self.huber, residual ** 2,
+                              2 * self.huber * absolute - self.huber ** 2).sum())
+
+
+def collect_distances(simulation):
+    """Edges (first_ids, second_ids, distances in m) between robots that hear each other
+
+    A robot's range to another robot is the center distance from
+    Robot.estimate_range_to. When both robots hear each other, the two
+    ranges are averaged.
+    """
+    ranges = {}
+    for robot in simulation.robots:
+        emitters = set()
+        for receiver in robot.receivers:
+            emitters.update(getattr(receiver, 'estimated_distances', {}))
+        for emitter_id in emitters:
+            if emitter_id == robot.id:
+                continue
+            distance = robot.estimate_range_to(emitter_id)
+            if distance is not None:
+                ranges.setdefault((min(robot.id, emitter_id), max(robot.id, emitter_id)), []).append(distance)
+    first = np.array([key[0] for key in ranges], dtype=np.int64)
+    second = np.array([key[1] for key in ranges], dtype=np.int64)
+    distances = np.array([sum(values) / len(values) for values in ranges.values()], dtype=np.float64)
+    return first, second, distances
+
+
+def _residuals(positions, first, second, distances):
+    """Distance residual and unit vector from second to first of every edge"""
+    delta = positions[first] - positions[second]
+    length = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 1e-9)
+    return length - distances, delta / length[:, None]
+
+
+def _transpose_product(edge_values, first, second, count):
+    """J^T v: (count, 2) sums of per-edge 2D values, added at first and subtracted at second"""
+    result = np.zeros((count, 2))
+    for k in range(2):
+        result[:, k] = (np.bincount(first, edge_values[:, k], minlength=count) -
+                        np.bincount(second, edge_values[:, k], minlength=count))
+    return result
+
+
+def _conjugate_gradient(unit, weights, first, second, damping, rhs, max_iterations):
+    """Solve (J^T W J + damping I) x = rhs without forming the matrix"""
+    count = len(rhs)
+
+    def product(vector):
+        edge = weights * np.einsum('ij,ij->i', unit, vector[first] - vector[second])
+        return _transpose_product(unit * edge[:, None], first, second, count) + damping * vector
+
+    x = np.zeros_like(rhs)
+    r = rhs.copy()
+    p = r.copy()
+    norm = float((r * r).sum())
+    target = 1e-12 * max(norm, 1e-30)
+    for _ in range(max_iterations):
+        if norm <= target:
+            break
+        q = product(p)
+        alpha = norm / float((p * q).sum())
+        x += alpha * p
+        r -= alpha * q
+        new_norm = float((r * r).sum())
+        p = r + (new_norm / norm) * p
+        norm = new_norm
+    return x
+
+
+def _components(count, first, second):
+    """Connected component label of every node (smallest node index in it)"""
+    labels = np.arange(count)
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, first, labels[second])
+        np.minimum.at(new, second, labels[first])
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def _shortest_paths(count, first, second, distances):
+    """(count, count) shortest-path distances over the edges (Floyd-Warshall)"""
+    paths = np.full((count, count), np.inf)
+    np.fill_diagonal(paths, 0.0)
+    paths[first, second] = np.minimum(paths[first, second], distances)
+    paths[second, first] = paths[first, second]
+    for k in range(count):
+        np.minimum(paths, paths[:, k, None] + paths[None, k, :], out=paths)
+    return paths
+
+
+def _classical_mds(distances):
+    """(count, 2) coordinates whose distances best match a full distance matrix"""
+    count = len(distances)
+    if count == 1:
+        return np.zeros((1, 2))
+    squared = distances ** 2
+    centered = squared - squared.mean(axis=0) - squared.mean(axis=1)[:, None] + squared.mean()
+    values, vectors = np.linalg.eigh(-0.5 * centered)
+    top = np.argsort(values)[::-1][:2]
+    return vectors[:, top] * np.sqrt(np.maximum(values[top], 0.0))
+
+
+def _align(points, target):
+    """Points moved by the rotation/reflection and translation that fit them to target best"""
+    points_mean, target_mean = points.mean(axis=0), target.mean(axis=0)
+    u, _, vt = np.linalg.svd((points - points_mean).T @ (target - target_mean))
+    return (points - points_mean) @ (u @ vt) + target_mean
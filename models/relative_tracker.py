@@ -0,0 +1,167 @@
+"""Extended Kalman filter tracking of the robot ahead of each follower
+
+Every follower tracks the position of the robot it follows relative to
+itself, in meters along the global axes (the follower knows its own
+heading and odometry, not its absolute position). Measurements are the
+range and bearing from its IR receivers: range from the Rician distance
+estimate, bearing from RPA. Their noise grows as RPA confidence drops.
+
+All tracks are predicted and updated together with batched NumPy
+arrays, one row per (follower, target) pair.
+"""
+import math
+import numpy as np
+
+# Innovations with a Mahalanobis distance above this (chi-square, 2 dof, 99.9%) are rejected
+GATE_THRESHOLD = 13.8
+
+
+class RelativeTracker:
+    """Batched EKF over the relative positions (m) of followed robots"""
+
+    def __init__(self, process_noise=0.02, range_noise=0.05, range_noise_ratio=0.1,
+                 bearing_noise=10.0, min_confidence=0.05, max_missed=20):
+        """
+        Args:
+            process_noise: Standard deviation of the unknown target motion per step (m)
+            range_noise: Base standard deviation of range measurements (m)
+            range_noise_ratio: Extra range standard deviation per meter of range
+            bearing_noise: Standard deviation of bearing measurements (degrees)
+            min_confidence: Lower bound of the RPA confidence used to scale the noise
+            max_missed: Steps without a measurement after which a track is dropped
+        """
+        self.process_noise = float(process_noise)
+        self.range_noise = float(range_noise)
+        self.range_noise_ratio = float(range_noise_ratio)
+        self.bearing_noise = math.radians(bearing_noise)
+        self.min_confidence = float(min_confidence)
+        self.max_missed = int(max_missed)
+        self.reset()
+
+    def reset(self):
+        """Drop all tracks"""
+        self.keys = []                 # (follower_id, target_id) per row
+        self.index = {}                # (follower_id, target_id) -> row
+        self.state = np.zeros((0, 2))
+        self.cov = np.zeros((0, 2, 2))
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.rejected = 0              # Measurements rejected by the gate
+
+    def __len__(self):
+        return len(self.keys)
+
+    def step(self, keys, odometry, ranges, bearings, confidence):
+        """Predict all given tracks with the follower motion and update them
+
+        Args:
+            keys: (follower_id, target_id) per track
+            odometry: (N, 2) displacement of each follower since the last step (m)
+            ranges: (N,) measured center distances (m), NaN without a measurement
+            bearings: (N,) measured bearings in global axes (degrees), NaN without a measurement
+            confidence: (N,) RPA confidence of each measurement (0-1)
+        """
+        odometry = np.asarray(odometry, dtype=np.float64).reshape(-1, 2)
+        ranges = np.asarray(ranges, dtype=np.float64)
+        bearings = np.radians(np.asarray(bearings, dtype=np.float64))
+        confidence = np.maximum(np.asarray(confidence, dtype=np.float64), self.min_confidence)
+        measured = ~(np.isnan(ranges) | np.isnan(bearings))
+
+        # Start tracks at their first measurement
+        rows = np.array([self.index.get(key, -1) for key in keys], dtype=np.int64)
+        new = (rows < 0) & measured
+        if new.any():
+            rows[new] = self._add(ranges[new], bearings[new], confidence[new], [keys[i] for i in np.flatnonzero(new)])
+            # Already initialized with this step's measurement
+            odometry = odometry.copy()
+            odometry[new] = 0.0
+            measured &= ~new
+        active = rows >= 0
+        rows, odometry = rows[active], odometry[active]
+        ranges, bearings = ranges[active], bearings[active]
+        confidence, measured = confidence[active], measured[active]
+
+        # Predict: the target stays put, up to process noise, while the follower moves
+        self.state[rows] -= odometry
+        self.cov[rows] += np.eye(2) * self.process_noise ** 2
+        self.missed += 1  # Tracks not stepped at all also age
+
+        update = rows[measured]
+        if len(update):
+            self._update(update, ranges[measured], bearings[measured], confidence[measured])
+        self._drop_lost()
+
+    def estimate(self, follower_id, target_id):
+        """(dx, dy, covariance) of the target relative to the follower (m), None if not tracked"""
+        row = self.index.get((follower_id, target_id))
+        if row is None:
+            return None
+        dx, dy = self.state[row]
+        return float(dx), float(dy), self.cov[row].copy()
+
+    def _noise(self, ranges, confidence):
+        """(N, 2, 2) measurement covariance, inflated for low confidence"""
+        noise = np.zeros((len(ranges), 2, 2))
+        noise[:, 0, 0] = (self.range_noise + self.range_noise_ratio * ranges) ** 2
+        noise[:, 1, 1] = self.bearing_noise ** 2
+        return noise / confidence[:, None, None]
+
+    def _add(self, ranges, bearings, confidence, keys):
+        """Append tracks initialized from polar measurements, returns their rows"""
+        first = len(self.keys)
+        state = np.column_stack((ranges * np.cos(bearings), ranges * np.sin(bearings)))
+
+        # Polar noise mapped to Cartesian with the Jacobian of the conversion
+        jacobian = np.zeros((len(ranges), 2, 2))
+        jacobian[:, 0, 0] = np.cos(bearings)
+        jacobian[:, 0, 1] = -ranges * np.sin(bearings)
+        jacobian[:, 1, 0] = np.sin(bearings)
+        jacobian[:, 1, 1] = ranges * np.cos(bearings)
+        cov = jacobian @ self._noise(ranges, confidence) @ jacobian.transpose(0, 2, 1)
+        cov += np.eye(2) * self.process_noise ** 2
+
+        self.state = np.concatenate((self.state, state))
+        self.cov = np.concatenate((self.cov, cov))
+        self.missed = np.concatenate((self.missed, np.zeros(len(keys), dtype=np.int64)))
+        for offset, key in enumerate(keys):
+            self.index[key] = first + offset
+            self.keys.append(key)
+        return np.arange(first, first + len(keys))
+
+    def _update(self, rows, ranges, bearings, confidence):
+        """EKF update with (range, bearing) measurements"""
+        state = self.state[rows]
+        cov = self.cov[rows]
+        px, py = state[:, 0], state[:, 1]
+        predicted_range = np.maximum(np.hypot(px, py), 1e-6)
+
+        innovation = np.column_stack((ranges - predicted_range,
+                                      np.angle(np.exp(1j * (bearings - np.arctan2(py, px))))))
+        jacobian = np.zeros((len(rows), 2, 2))
+        jacobian[:, 0, 0] = px / predicted_range
+        jacobian[:, 0, 1] = py / predicted_range
+        jacobian[:, 1, 0] = -py / predicted_range ** 2
+        jacobian[:, 1, 1] = px / predicted_range ** 2
+
+        innovation_cov = jacobian @ cov @ jacobian.transpose(0, 2, 1) + self._noise(ranges, confidence)
+        inverse = np.linalg.inv(innovation_cov)
+        distance = np.einsum('ni,nij,nj->n', innovation, inverse, innovation)
+        accepted = distance <= GATE_THRESHOLD
+        self.rejected += int((~accepted).sum())
+
+        gain = cov @ jacobian.transpose(0, 2, 1) @ inverse
+        correction = np.einsum('nij,nj->ni', gain, innovation)
+        new_cov = (np.eye(2) - gain @ jacobian) @ cov
+
+        rows, accepted_rows = rows[accepted], np.flatnonzero(accepted)
+        self.state[rows] = state[accepted_rows] + correction[accepted_rows]
+        self.cov[rows] = new_cov[accepted_rows]
+        self.missed[rows] = 0
+
+    def _drop_lost(self):
+        """Remove tracks that went max_missed steps without an accepted measurement"""
+        keep = self.missed <= self.max_missed
+        if keep.all():
+            return
+        self.state, self.cov, self.missed = self.state[keep], self.cov[keep], self.missed[keep]
+        self.keys = [key for key, kept in zip(self.keys, keep.tolist()) if kept]
+        self.index = {key: row for row, key in enumerate(self.keys)}
@@ -1,8 +1,8 @@
-from models.ir_sensor import IRTransmitter, IRReceiver
+from models.robot_type import STANDARD_TYPE
 import math
 
 class Robot:
-    def __init__(self, robot_id, x=0, y=0, orientation=0):
+    def __init__(self, robot_id, x=0, y=0, orientation=0, robot_type=None):
         self.id = robot_id
         self.x = x
         self.y = y
@@ -10,132 +10,40 @@ class Robot:
         self.size = 50
         self.simulation = None  # Will be set when robot is added to simulation
         
+        # Size, motion limits and the compiled SensorLayout are shared by all robots of a type
+        self.robot_type = STANDARD_TYPE if robot_type is None else robot_type
+        self.layout = self.robot_type.layout
+        
         # Initialize sensor list with robot ID
         self.transmitters = []
         self.receivers = []
         self._setup_sensors()
     
     def _setup_sensors(self):
-        """Set up IR transmitter and receiver sensors for robot"""
-        sides = [0, 1, 2, 3]  # (top, right, bottom, left)
-        
-        # === CHANGE: Initialize transmitters ===
-        self.transmitters = []
-        
-        # Set offset from edge for both transmitter and receiver
-        sensor_offset_from_edge = 0.2  # 2cm from edge
-        
-        # Relative positions of 3 IR receivers (keep unchanged)
-        receiver_positions = [-0.578, 0.0, 0.578]
-        
-        # === NEW: Relative positions of 2 IR transmitters interleaved ===
-        # Calculate to place between IR receivers
-        transmitter_positions = [-0.289, 0.289]  # Interleaved between receivers
-        
-        # === NEW: Angle offset for IR transmitters ===
-        outward_offset_angle = 15  # Outward angle 15°
-        
-        # --- Set up transmitters first ---
-        for side in sides:
-            if side == 0:  # top
-                for i, pos in enumerate(transmitter_positions):
-                    rel_x = pos
-                    rel_y = -1 + sensor_offset_from_edge
-                    tx = IRTransmitter(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Set outward angle offset
-                    if i == 0:  # Left transmitter
-                        tx.beam_direction_offset = -outward_offset_angle  # Negative
-                    else:  # Right transmitter
-                        tx.beam_direction_offset = +outward_offset_angle  # Positive
-                    self.transmitters.append(tx)
-            elif side == 1:  # right
-                for i, pos in enumerate(transmitter_positions):
-                    rel_x = 1 - sensor_offset_from_edge
-                    rel_y = pos
-                    tx = IRTransmitter(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Set outward angle offset
-                    if i == 0:  # Top transmitter
-                        tx.beam_direction_offset = +outward_offset_angle
-                    else:  # Bottom transmitter
-                        tx.beam_direction_offset = -outward_offset_angle
-                    self.transmitters.append(tx)
-            elif side == 2:  # bottom
-                for i, pos in enumerate(transmitter_positions):
-                    rel_x = pos
-                    rel_y = 1 - sensor_offset_from_edge
-                    tx = IRTransmitter(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Set outward angle offset
-                    if i == 0:  # Left transmitter
-                        tx.beam_direction_offset = outward_offset_angle
-                    else:  # Right transmitter
-                        tx.beam_direction_offset = -outward_offset_angle
-                    self.transmitters.append(tx)
-            else:  # left
-                for i, pos in enumerate(transmitter_positions):
-                    rel_x = -1 + sensor_offset_from_edge
-                    rel_y = pos
-                    tx = IRTransmitter(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Set outward angle offset
-                    if i == 0:  # Top transmitter
-                        tx.beam_direction_offset = -outward_offset_angle
-                    else:  # Bottom transmitter
-                        tx.beam_direction_offset = outward_offset_angle
-                    self.transmitters.append(tx)
-        
-        # --- Set up receivers after ---
-        self.receivers = []
-        rx_outward_offset_angle = 30  # Outward angle for receiver
-        # [Receiver setup code section remains unchanged]
-        for side in sides:
-            if side == 0:  # top
-                for i, pos in enumerate(receiver_positions):
-                    rel_x = pos
-                    rel_y = -1 + sensor_offset_from_edge
-                    rx = IRReceiver(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Apply angle offset for outer receivers
-                    if i == 0:  # Left receiver
-                        rx.direction_offset = -rx_outward_offset_angle
-                    elif i == 2:  # Right receiver
-                        rx.direction_offset = rx_outward_offset_angle
-                    self.receivers.append(rx)
-            elif side == 1:  # right
-                for i, pos in enumerate(receiver_positions):
-                    rel_x = 1 - sensor_offset_from_edge
-                    rel_y = pos
-                    rx = IRReceiver(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Apply angle offset for outer receivers
-                    if i == 0:  # Top receiver
-                        rx.direction_offset = -rx_outward_offset_angle
-                    elif i == 2:  # Bottom receiver
-                        rx.direction_offset = rx_outward_offset_angle
-                    self.receivers.append(rx)
-            elif side == 2:  # bottom
-                for i, pos in enumerate(receiver_positions):
-                    rel_x = pos
-                    rel_y = 1 - sensor_offset_from_edge
-                    rx = IRReceiver(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Apply angle offset for outer receivers
-                    if i == 0:  # Left receiver
-                        rx.direction_offset = rx_outward_offset_angle
-                    elif i == 2:  # Right receiver
-                        rx.direction_offset = -rx_outward_offset_angle
-                    self.receivers.append(rx)
-            else:  # left
-                for i, pos in enumerate(receiver_positions):
-                    rel_x = -1 + sensor_offset_from_edge
-                    rel_y = pos
-                    rx = IRReceiver(self.id, side, i, rel_x=rel_x, rel_y=rel_y)
-                    # Apply angle offset for outer receivers
-                    if i == 0:  # Top receiver
-                        rx.direction_offset = rx_outward_offset_angle
-                    elif i == 2:  # Bottom receiver
-                        rx.direction_offset = -rx_outward_offset_angle
-                    self.receivers.append(rx)
+        """Set up IR transmitter and receiver sensors from the robot's sensor layout"""
+        self.transmitters, self.receivers = self.layout.create_sensors(self.id)
 
     def move(self, dx, dy):
-        """Move robot by an amount (dx, dy)"""
+        """Move robot by an amount (dx, dy), returns False if a static obstacle blocks it"""
+        simulation = getattr(self, 'simulation', None)
+        if simulation is not None and simulation.robot_collides(self, dx, dy):
+            return False
         self.x += dx
         self.y += dy
+        return True
+    
+    def drive(self, dx, dy):
+        """Controller move by (dx, dy) pixels, shortened to the max_step of its type
+
+        move() stays unlimited for dragging and collision resolution.
+        """
+        if self.robot_type.max_step is not None:
+            scale = self.simulation.scale if self.simulation else 250  # Default 250px/m
+            length = math.hypot(dx, dy)
+            limit = self.robot_type.limit_step(length / scale) * scale
+            if length > limit:
+                dx, dy = dx * limit / length, dy * limit / length
+        return self.move(dx, dy)
     
     def set_position(self, x, y):
         """Set new position for robot"""
@@ -143,7 +51,8 @@ class Robot:
         self.y = y
     
     def rotate(self, angle):
-        """Rotate robot by an angle (degrees)"""
+        """Rotate robot by an angle (degrees), at most the max_turn of its type"""
+        angle = self.robot_type.limit_turn(angle)
         self.orientation = (self.orientation + angle) % 360
     
     def set_orientation(self, angle):
@@ -178,14 +87,15 @@ class Robot:
         return rotated_corners
     
     def contains_point(self, px, py):
-        """Check if a point is inside the robot"""
-        # Simple method: check distance from center to point
-        # (this is approximate since when robot rotates, shape is no longer square relative to coordinate system)
+        """Check if a point is inside the robot (its rotated square)"""
         dx = px - self.x
         dy = py - self.y
-        distance = math.sqrt(dx*dx + dy*dy)
-        
-        return distance <= self.size / 2
+        angle_rad = math.radians(self.orientation)
+        # Point in the robot frame
+        along = dx * math.cos(angle_rad) + dy * math.sin(angle_rad)
+        across = -dx * math.sin(angle_rad) + dy * math.cos(angle_rad)
+        half_size = self.size / 2
+        return abs(along) <= half_size and abs(across) <= half_size
     
     def calculate_relative_position(self, other_robot):
         """Calculate relative position of another robot"""
@@ -201,97 +111,39 @@ class Robot:
         
         return distance, relative_angle
     
-    def triangulate_position(self, bearing_measurements):
-        """Estimate position based on bearing angle measurements
-        
-        bearing_measurements is a list of tuples (robot_id, bearing_angle)
-        """
-        if len(bearing_measurements) < 2:
-            return None  # Need at least 2 bearing angles to triangulate
-        
-        # Simple triangulation method
-        # (In practice, would need more complex algorithm)
-        estimated_positions = []
-        for robot_id, bearing in bearing_measurements:
-            # Find target robot
-            target_robot = None
-            for robot in self.simulation.robots:
-                if robot.id == robot_id:
-                    target_robot = robot
-                    break
-            
-            if target_robot:
-                # From bearing and target robot position, calculate possible position
-                bearing_rad = math.radians(bearing)
-                dx = math.cos(bearing_rad)
-                dy = math.sin(bearing_rad)
-                estimated_positions.append((target_robot.x + dx, target_robot.y + dy))
-        
-        # Calculate average position
-        if estimated_positions:
-            avg_x = sum(pos[0] for pos in estimated_positions) / len(estimated_positions)
-            avg_y = sum(pos[1] for pos in estimated_positions) / len(estimated_positions)
-            return avg_x, avg_y
-        
-        return None
-    
     def estimate_position_from_ir(self):
-        """Estimate position based on received IR signals with Rician model"""
-        position_estimates = []
-        
-        # Find position based on IR signals
-        for i, receiver in enumerate(self.receivers):
-            processed_signal = receiver.process_signals()
-            if processed_signal:
-                sender_id, strength, snr = processed_signal
-                
-                # Determine if LOS exists based on SNR
-                has_los = snr > 2.5  # High SNR usually corresponds to good LOS
-                
-                # CHANGE: Use new method instead of old method
-                # estimated_distance = receiver.estimate_distance_rician(strength, has_los) 
-                estimated_distance = receiver.estimate_distance_pathloss_rician(strength, has_los)
-                
-                # Add to estimation list
-                position_estimates.append((sender_id, estimated_distance, i))
-        
-        # NEW ADDITION: Use physical position when no IR signal available
-        if not position_estimates and self.simulation:
-            for robot in self.simulation.robots:
-                if robot.id != self.id:
-                    # Calculate physical distance
-                    dx = robot.x - self.x
-                    dy = robot.y - self.y
-                    distance_pixel = math.sqrt(dx*dx + dy*dy)
-                    distance_m = self.simulation.pixel_distance_to_real(distance_pixel)
-                    
-                    # Only consider robots within reasonable range (3m)
-                    if distance_m < 3.0:
-                        # Use code -1 to indicate this is estimation based on physical distance
-                        position_estimates.append((robot.id, distance_m, -1))
-        
-        return position_estimates
+        """Pose (x, y, orientation) estimated by the simulation's particle localizer
+
+        The robot has to be registered with simulation.localizer.track(robot.id),
+        the estimate then only uses its odometry and received IR signals.
+        Returns None while the robot is not localized.
+        """
+        if not self.simulation:
+            return None
+        estimate = self.simulation.localizer.estimate(self.id)
+        if estimate is None:
+            return None
+        x, y, orientation, _ = estimate
+        return x, y, orientation
     
     def update_sensor_positions(self):
         """Update positions of all sensors"""
         # This method is no longer needed since sensors will calculate position when needed
         pass
     
+    def get_sensor_positions(self):
+        """World positions ((T, 2), (R, 2) arrays) of all transmitters and receivers"""
+        return self.layout.sensor_positions(self.x, self.y, self.size, self.orientation)
+
     def get_transmitter_positions(self):
         """Get positions of all transmitters"""
-        positions = []
-        for tx in self.transmitters:
-            pos = tx.get_position(self.x, self.y, self.size, self.orientation)
-            positions.append((tx, pos))
-        return positions
+        positions = self.get_sensor_positions()[0].tolist()
+        return [(tx, tuple(pos)) for tx, pos in zip(self.transmitters, positions)]
     
     def get_receiver_positions(self):
         """Get positions of all receivers"""
-        positions = []
-        for rx in self.receivers:
-            pos = rx.get_position(self.x, self.y, self.size, self.orientation)
-            positions.append((rx, pos))
-        return positions
+        positions = self.get_sensor_positions()[1].tolist()
+        return [(rx, tuple(pos)) for rx, pos in zip(self.receivers, positions)]
 
     def get_physical_distance_to(self, other_robot):
         """Calculate physical distance to another robot in meters"""
@@ -317,6 +169,26 @@ class Robot:
         relative_angle = (absolute_angle - self.orientation) % 360
         return relative_angle
 
+    def estimate_range_to(self, emitter_robot_id):
+        """Center distance (m) to a robot estimated from its IR signal, None if not received
+
+        Uses the distance estimate of the receiver with the strongest
+        filtered signal. That estimate is between the two sensors, which sit
+        on the edges of the robots, so one robot size is added.
+        """
+        best_strength, best_distance = None, None
+        for receiver in self.receivers:
+            strength = receiver.get_filtered_signal(emitter_robot_id)
+            distance = getattr(receiver, 'estimated_distances', {}).get(emitter_robot_id)
+            if strength is None or distance is None:
+                continue
+            if best_strength is None or strength > best_strength:
+                best_strength, best_distance = strength, distance
+        if best_distance is None:
+            return None
+        robot_size = self.simulation.pixel_distance_to_real(self.size) if self.simulation else 0.1
+        return best_distance + robot_size
+
     def calculate_relative_position_rpa(self, emitter_robot_id):
         """Calculate relative position of signal-emitting robot using RPA algorithm
         
@@ -331,22 +203,16 @@ class Robot:
         """
         import math
         
-        # Default angle table for each side and position
-        # Format: {side: {position_index: angle}}
-        DEFAULT_ANGLES = {
-            0: {0: 240, 1: 270, 2: 300},  # top
-            1: {0: 330, 1: 0, 2: 30},     # right
-            2: {0: 120, 1: 90, 2: 60},    # bottom
-            3: {0: 210, 1: 180, 2: 150}   # left
-        }
-        
-        # Collect all signals from all receivers
+        # Collect all signals from all receivers, each at the viewing direction
+        # of its receiver in the robot frame (heading of the sensor layout)
         all_signals = []
+        headings = self.layout.rx_heading.tolist()
         
-        for receiver in self.receivers:
-            if emitter_robot_id in receiver.signals:
-                signal_strength = receiver.signals[emitter_robot_id]
-                angle = DEFAULT_ANGLES[receiver.side][receiver.position_index]
+        for k, receiver in enumerate(self.receivers):
+            # Filtered over the recent history to smooth out the channel noise
+            signal_strength = receiver.get_filtered_signal(emitter_robot_id)
+            if signal_strength is not None:
+                angle = headings[k]
                 all_signals.append((receiver.side, receiver.position_index, signal_strength, angle, receiver))
         
         # If no signals
@@ -394,7 +260,7 @@ class Robot:
         elif total_signals == 2:
             # Find position of strongest signal in sorted list
             strongest_index = next(i for i, signal in enumerate(all_signals) 
-                                 if signal[0] == strongest_side and signal[1] == strongest_pos)
+                                 if signal is strongest_signal)
             
             # Get the remaining signal (will be left or right)
             other_index = 1 - strongest_index
@@ -469,7 +335,7 @@ class Robot:
         else:
             # Find position of strongest signal in sorted list
             strongest_index = next(i for i, signal in enumerate(all_signals) 
-                                 if signal[0] == strongest_side and signal[1] == strongest_pos)
+                                 if signal is strongest_signal)
             
             # Get left and right signals
             left_index = (strongest_index - 1) % total_signals
@@ -565,7 +431,8 @@ class Robot:
         return (rel_x, rel_y)
 
     def move_forward(self, distance=0.02):
-        """Move robot forward"""
+        """Move robot forward, at most the max_step of its type"""
+        distance = self.robot_type.limit_step(distance)
         if self.simulation:
             px_distance = self.simulation.real_distance_to_pixel(distance)
         else:
@@ -577,7 +444,8 @@ class Robot:
         self.move(dx, dy)
     
     def move_backward(self, distance=0.02):
-        """Move robot backward"""
+        """Move robot backward, at most the max_step of its type"""
+        distance = self.robot_type.limit_step(distance)
         if self.simulation:
             px_distance = self.simulation.real_distance_to_pixel(distance)
         else:
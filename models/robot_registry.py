@@ -0,0 +1,101 @@
+"""Robots of a simulation stored in dense slots with O(1) lookup by id
+
+The robots live in one list without holes (simulation.robots is that
+list). A NumPy table indexed by robot id gives the slot of every robot, so
+get() is one array read and slots() maps a whole id column (e.g. of a
+link table) at once. Removing a robot moves the robot of the last slot
+into the freed one, so removals are O(1), the freed slot is reused right
+away and arrays kept per slot stay dense.
+
+Robot ids are never reused, only slots are. Code that keeps per-slot
+arrays must therefore look slots up again after a removal.
+"""
+import numpy as np
+
+
+class RobotRegistry:
+    """Id -> slot map of the robots of a simulation"""
+
+    def __init__(self, capacity=64):
+        self.robots = []
+        self._slot = np.full(capacity, -1, dtype=np.int64)  # robot id -> slot, -1 when absent
+
+    def __len__(self):
+        return len(self.robots)
+
+    def __contains__(self, robot_id):
+        return self.slot(robot_id) >= 0
+
+    def slot(self, robot_id):
+        """Slot (index in robots) of a robot, -1 when it is not registered"""
+        try:
+            robot_id = int(robot_id)
+        except (TypeError, ValueError):
+            return -1
+        if 0 <= robot_id < len(self._slot):
+            return int(self._slot[robot_id])
+        return -1
+
+    def slots(self, robot_ids):
+        """Slots of an array of robot ids, -1 for unknown ids"""
+        robot_ids = np.asarray(robot_ids, dtype=np.int64)
+        valid = (robot_ids >= 0) & (robot_ids < len(self._slot))
+        slots = np.full(robot_ids.shape, -1, dtype=np.int64)
+        slots[valid] = self._slot[robot_ids[valid]]
+        return slots
+
+    def get(self, robot_id):
+        """Robot with an id, None when it is not registered"""
+        slot = self.slot(robot_id)
+        return self.robots[slot] if slot >= 0 else None
+
+    def add(self, robot):
+        """Append a robot to the next slot"""
+        if robot.id in self:
+            raise ValueError(f"Robot ID {robot.id} is already registered")
+        self._reserve(robot.id)
+        self._slot[robot.id] = len(self.robots)
+        self.robots.append(robot)
+
+    def extend(self, robots):
+        """Append many robots, in order"""
+        robots = list(robots)
+        if not robots:
+            return
+        ids = np.array([robot.id for robot in robots], dtype=np.int64)
+        if len(set(ids.tolist())) != len(ids) or np.any(self.slots(ids) >= 0):
+            raise ValueError("Robot IDs must be new and unique")
+        self._reserve(int(ids.max()))
+        self._slot[ids] = np.arange(len(self.robots), len(self.robots) + len(robots))
+        self.robots.extend(robots)
+
+    def remove(self, robot_id):
+        """Remove a robot, the robot of the last slot takes its slot
+
+        Returns:
+            The removed robot, None when it is not registered
+        """
+        slot = self.slot(robot_id)
+        if slot < 0:
+            return None
+        robot = self.robots[slot]
+        last = self.robots.pop()
+        if last is not robot:
+            self.robots[slot] = last
+            self._slot[last.id] = slot
+        self._slot[robot.id] = -1
+        return robot
+
+    def clear(self):
+        """Remove all robots (the robots list object is kept)"""
+        self.robots.clear()
+        self._slot[:] = -1
+
+    def _reserve(self, robot_id):
+        if robot_id < 0:
+            raise ValueError("Robot IDs must not be negative")
+        if robot_id >= len(self._slot):
+            size = max(robot_id + 1, 2 * len(self._slot))
+            grown = np.full(size, -1, dtype=np.int64)
+            grown[:len(self._slot)] = self._slot
+            self._slot = grown
@@ -0,0 +1,75 @@
+"""Robot types: size, sensor layout and motion limits shared by a group of robots
+
+All robots of a type reference the type's compiled SensorLayout. The link
+engine orders the robots by layout, so each type is gathered and placed as
+one contiguous batch and a mixed fleet keeps the batched evaluation.
+"""
+from models.sensor_layout import DEFAULT_LAYOUT, SensorLayout
+
+
+class RobotType:
+    """Shared description of a kind of robot"""
+
+    def __init__(self, name, size=None, layout=None, max_step=None, max_turn=None, sensor_config=None):
+        """
+        Args:
+            name: Type name, unique within a simulation
+            size: Side length (m), default the simulation's real_robot_size
+            layout: SensorLayout or layout spec dict, default sensor_layout.DEFAULT_LAYOUT
+            max_step: Longest move_forward/move_backward step (m), None for no limit
+            max_turn: Largest rotate() angle per call (degrees), None for no limit
+            sensor_config: Sensor parameters (ir_sensor.SENSOR_CONFIG_KEYS) applied to new robots
+        """
+        if size is not None and size <= 0:
+            raise ValueError("Robot size must be positive")
+        if max_step is not None and max_step < 0:
+            raise ValueError("max_step must not be negative")
+        if max_turn is not None and max_turn < 0:
+            raise ValueError("max_turn must not be negative")
+        self.name = name
+        self.size = size
+        if layout is None:
+            layout = DEFAULT_LAYOUT
+        elif isinstance(layout, dict):
+            layout = SensorLayout.from_spec(layout)
+        self.layout = layout
+        self.max_step = max_step
+        self.max_turn = max_turn
+        self.sensor_config = dict(sensor_config or {})
+
+    def __repr__(self):
+        return f"RobotType({self.name!r})"
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Type from a dict with 'name' and any of size, layout, max_step, max_turn, sensor_config"""
+        return cls(spec['name'], size=spec.get('size'), layout=spec.get('layout'),
+                   max_step=spec.get('max_step'), max_turn=spec.get('max_turn'),
+                   sensor_config=spec.get('sensor_config'))
+
+    def to_spec(self):
+        """JSON-serializable dict, leaving out unset values and the default layout"""
+        spec = {'name': self.name}
+        for key in ('size', 'max_step', 'max_turn'):
+            if getattr(self, key) is not None:
+                spec[key] = getattr(self, key)
+        if self.layout is not DEFAULT_LAYOUT:
+            spec['layout'] = self.layout.to_spec()
+        if self.sensor_config:
+            spec['sensor_config'] = dict(self.sensor_config)
+        return spec
+
+    def limit_step(self, distance):
+        """Distance (m) clipped to the step limit, keeping its sign"""
+        if self.max_step is None:
+            return distance
+        return max(-self.max_step, min(self.max_step, distance))
+
+    def limit_turn(self, angle):
+        """Angle (degrees) clipped to the turn limit, keeping its sign"""
+        if self.max_turn is None:
+            return angle
+        return max(-self.max_turn, min(self.max_turn, angle))
+
+
+STANDARD_TYPE = RobotType('standard')
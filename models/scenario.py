@@ -0,0 +1,388 @@
+"""Declarative scenario files: arena, robots, sensor parameters and paths
+
+A scenario is a JSON (or TOML) document, all lengths in meters:
+
+    {
+        "name": "three robots in a column",
+        "seed": 42,
+        "arena": {"width": 4.0, "height": 4.0},
+        "robot_size": 0.1,
+        "sensors": {"beam_angle": 60, "beam_distance": 0.8,
+                    "beam_offset": 15, "viewing_angle": 80},
+        "types": [
+            {"name": "big", "size": 0.3, "max_step": 0.02, "max_turn": 15,
+             "sensor_config": {"beam_distance": 1.2}, "layout": {...}}
+        ],
+        "robots": [
+            {"x": 1.0, "y": 1.0, "orientation": 0},
+            {"x": 0.6, "y": 1.0, "orientation": 0, "sensors": {"viewing_angle": 60}},
+            {"x": 0.2, "y": 1.0, "type": "big"}
+        ],
+        "obstacles": [
+            {"type": "wall", "points": [[0.0, 2.0], [1.5, 2.0]]},
+            {"type": "box", "x": 2.5, "y": 0.5, "width": 0.4, "height": 0.4},
+            {"type": "polygon", "points": [[3.0, 3.0], [3.5, 3.2], [3.2, 3.6]]}
+        ],
+        "map": {"image": "lab.png", "resolution": 0.02, "threshold": 128},
+        "waypoints": [[2.0, 1.0], [2.0, 2.5]],
+        "leader": 0,
+        "formation": {"type": "column", "order": [0, 1, 2], "spacing": 0.4}
+    }
+
+Large scenarios may give robots as columns instead of a list of objects:
+"robots": {"x": [...], "y": [...], "orientation": [...], "viewing_angle": [...]}.
+"leader" and "formation.order" are indices into the robot list. The "map"
+image (occupancy grid, dark pixels are walls) is relative to the scenario file.
+"types" holds RobotType specs (robot_type.RobotType.to_spec, "layout" is a
+SensorLayout spec). Robots without a "type" are of the standard type, and a
+type's sensor_config replaces the "sensors" defaults for its robots.
+"""
+import json
+import os
+import random
+import numpy as np
+from models.obstacles import StaticObstacleMap
+from models.robot_type import STANDARD_TYPE, RobotType
+
+# Same defaults as the sliders of the robot control panel
+SENSOR_DEFAULTS = {
+    'beam_angle': 60.0,     # Transmitter beam angle (degrees)
+    'beam_distance': 0.8,   # Transmitter and receiver range (m)
+    'beam_offset': 15.0,    # Outward angle offset of transmitters (degrees)
+    'viewing_angle': 80.0   # Receiver viewing angle (degrees)
+}
+
+FORMATION_TYPES = ('column',)
+
+
+class Scenario:
+    """Parsed scenario with robot data stored as NumPy columns"""
+
+    def __init__(self, x, y, orientation=None, sensors=None, arena_width=4.0, arena_height=4.0,
+                 robot_size=0.1, waypoints=None, leader=None, formation=None, seed=None, name="",
+                 obstacles=None, map_spec=None, robot_types=None, types=None):
+        self.name = name
+        self.seed = seed
+        self.arena_width = float(arena_width)
+        self.arena_height = float(arena_height)
+        self.robot_size = float(robot_size)
+
+        self.x = np.asarray(x, dtype=np.float64).reshape(-1)
+        self.y = np.asarray(y, dtype=np.float64).reshape(-1)
+        count = len(self.x)
+        if len(self.y) != count:
+            raise ValueError(f"Scenario has {count} x values but {len(self.y)} y values")
+        if orientation is None:
+            orientation = 0.0
+        self.orientation = np.broadcast_to(np.asarray(orientation, dtype=np.float64), (count,)) % 360
+
+        # Type name per robot, defined in the types table (RobotTypes) or the standard type
+        self.types = {}
+        for robot_type in types or []:
+            if robot_type.name in self.types:
+                raise ValueError(f"Robot type '{robot_type.name}' is defined twice")
+            self.types[robot_type.name] = robot_type
+        if robot_types is None:
+            robot_types = STANDARD_TYPE.name
+        if isinstance(robot_types, str):
+            robot_types = [robot_types] * count
+        self.robot_types = [str(name) for name in robot_types]
+        if len(self.robot_types) != count:
+            raise ValueError(f"Scenario has {count} robots but {len(self.robot_types)} robot types")
+        for name in set(self.robot_types):
+            self.robot_type(name)
+
+        # One array per sensor parameter, scalar values broadcast to every robot
+        sensors = sensors or {}
+        unknown = set(sensors) - set(SENSOR_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown sensor parameters: {', '.join(sorted(unknown))}")
+        self.sensors = {}
+        for key, default in SENSOR_DEFAULTS.items():
+            if key not in sensors:
+                default = _sensor_default(self.types, self.robot_types, key, default)
+            values = np.asarray(sensors.get(key, default), dtype=np.float64)
+            self.sensors[key] = np.broadcast_to(values, (count,)).copy()
+
+        # Static obstacles as dicts, validated by building a map once
+        self.obstacles = [dict(shape) for shape in (obstacles or [])]
+        check_map = StaticObstacleMap()
+        for shape in self.obstacles:
+            check_map.add_shape(shape)
+
+        # Occupancy grid image: {"image", "resolution", "threshold", "invert", "origin"}
+        if map_spec is not None:
+            map_spec = dict(map_spec)
+            if 'image' not in map_spec or 'resolution' not in map_spec:
+                raise ValueError("Scenario map needs an 'image' and a 'resolution'")
+        self.map_spec = map_spec
+
+        self.waypoints = np.asarray(waypoints if waypoints is not None else [],
+                                    dtype=np.float64).reshape(-1, 2)
+
+        if leader is not None and not 0 <= leader < count:
+            raise ValueError(f"Leader index {leader} is out of range for {count} robots")
+        self.leader = leader
+
+        if formation is not None:
+            formation = dict(formation)
+            formation.setdefault('type', 'column')
+            if formation['type'] not in FORMATION_TYPES:
+                raise ValueError(f"Unknown formation type '{formation['type']}'")
+            order = formation.get('order')
+            if order is not None and any(not 0 <= i < count for i in order):
+                raise ValueError("Formation order refers to a robot that does not exist")
+            if order and leader is None:
+                self.leader = order[0]  # The head of the column leads
+        self.formation = formation
+
+    def __len__(self):
+        return len(self.x)
+
+    def robot_type(self, name):
+        """RobotType of a name from the types table, or the standard type"""
+        if name in self.types:
+            return self.types[name]
+        if name == STANDARD_TYPE.name:
+            return STANDARD_TYPE
+        raise ValueError(f"Unknown robot type '{name}'")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a scenario from the parsed JSON/TOML document"""
+        arena = data.get('arena', {})
+        defaults = dict(SENSOR_DEFAULTS)
+        defaults.update(data.get('sensors', {}))
+        types = [RobotType.from_spec(spec) for spec in data.get('types', [])]
+        types_by_name = {robot_type.name: robot_type for robot_type in types}
+
+        robots = data.get('robots', [])
+        if isinstance(robots, dict):
+            # Column form: every key is a list (or a scalar shared by all robots)
+            x = robots.get('x', [])
+            y = robots.get('y', [])
+            orientation = robots.get('orientation', 0.0)
+            robot_types = robots.get('type', STANDARD_TYPE.name)
+            if isinstance(robot_types, str):
+                robot_types = [robot_types] * len(x)
+            sensors = {}
+            for key, value in defaults.items():
+                sensors[key] = robots.get(key, _sensor_default(types_by_name, robot_types, key, value))
+        else:
+            x = [robot['x'] for robot in robots]
+            y = [robot['y'] for robot in robots]
+            orientation = [robot.get('orientation', 0.0) for robot in robots]
+            robot_types = [robot.get('type', STANDARD_TYPE.name) for robot in robots]
+            sensors = {}
+            for key, value in defaults.items():
+                robot_defaults = _sensor_default(types_by_name, robot_types, key, value)
+                if not isinstance(robot_defaults, list):
+                    robot_defaults = [robot_defaults] * len(robots)
+                sensors[key] = [robot.get('sensors', {}).get(key, default)
+                                for robot, default in zip(robots, robot_defaults)]
+
+        return cls(x, y, orientation, sensors,
+                   arena_width=arena.get('width', 4.0),
+                   arena_height=arena.get('height', 4.0),
+                   robot_size=data.get('robot_size', 0.1),
+                   waypoints=data.get('waypoints'),
+                   leader=data.get('leader'),
+                   formation=data.get('formation'),
+                   seed=data.get('seed'),
+                   name=data.get('name', ""),
+                   obstacles=data.get('obstacles'),
+                   map_spec=data.get('map'),
+                   robot_types=robot_types, types=types)
+
+    def to_dict(self):
+        """Convert to a JSON-serializable document (robots in column form)"""
+        data = {
+            'name': self.name,
+            'arena': {'width': self.arena_width, 'height': self.arena_height},
+            'robot_size': self.robot_size,
+            'robots': {
+                'x': self.x.tolist(),
+                'y': self.y.tolist(),
+                'orientation': self.orientation.tolist()
+            },
+            'waypoints': self.waypoints.tolist()
+        }
+        for key, values in self.sensors.items():
+            data['robots'][key] = values.tolist()
+        if self.types:
+            data['types'] = [robot_type.to_spec() for robot_type in self.types.values()]
+            data['robots']['type'] = list(self.robot_types)
+        if self.obstacles:
+            data['obstacles'] = self.obstacles
+        if self.map_spec is not None:
+            data['map'] = self.map_spec
+        if self.seed is not None:
+            data['seed'] = self.seed
+        if self.leader is not None:
+            data['leader'] = int(self.leader)
+        if self.formation is not None:
+            data['formation'] = self.formation
+        return data
+
+    def apply(self, simulation, path_manager=None):
+        """Replace the contents of a simulation with this scenario
+
+        Robots are created with one call per run of robots of the same type
+        (one call in total for a single type), which keeps the scenario order
+        and ids. Sensor parameters are written as arrays for each run at once.
+
+        Args:
+            simulation: Simulation to load into (it is reset first)
+            path_manager: Optional PathManager that receives waypoints and leader
+
+        Returns:
+            list: The created robots, in scenario order
+        """
+        simulation.reset()
+
+        # Seed every random source used by the channel model
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed)
+
+        # Arena and robot size
+        scale = simulation.scale
+        simulation.real_width = self.arena_width
+        simulation.real_height = self.arena_height
+        simulation.max_x = self.arena_width * scale
+        simulation.max_y = self.arena_height * scale
+        simulation.real_robot_size = self.robot_size
+        for shape in self.obstacles:
+            simulation.obstacles.add_shape(shape)
+        if self.map_spec is not None:
+            spec = self.map_spec
+            simulation.load_map_image(spec['image'], spec['resolution'],
+                                      threshold=spec.get('threshold', 128),
+                                      invert=spec.get('invert', False),
+                                      origin=tuple(spec.get('origin', (0.0, 0.0))))
+
+        poses = np.column_stack((self.x * scale, self.y * scale, self.orientation))
+        robots = []
+        start = 0
+        for end in range(1, len(self) + 1):
+            if end < len(self) and self.robot_types[end] == self.robot_types[start]:
+                continue
+            sensors = {key: values[start:end] for key, values in self.sensors.items()}
+            robots.extend(simulation.add_robots(poses[start:end], sensors,
+                                                robot_type=self.robot_type(self.robot_types[start])))
+            start = end
+
+        if path_manager is not None:
+            waypoints_px = [tuple(point) for point in (self.waypoints * scale).tolist()]
+            path_manager.set_waypoints(waypoints_px)
+            if self.leader is not None:
+                path_manager.leader_id = robots[self.leader].id
+
+        return robots
+
+    def formation_robots(self, robots):
+        """Return robots in formation order (leader first), or None if not set"""
+        if not self.formation:
+            return None
+        order = self.formation.get('order')
+        if order is None:
+            return None
+        return [robots[i] for i in order]
+
+
+def scenario_from_simulation(simulation, path_manager=None, name=""):
+    """Describe the current state of a simulation as a Scenario"""
+    robots = simulation.robots
+    scale = simulation.scale
+    x = [robot.x / scale for robot in robots]
+    y = [robot.y / scale for robot in robots]
+    orientation = [robot.orientation for robot in robots]
+
+    # Types are saved by name, so two different types may not share one
+    types = {}
+    for robot in robots:
+        if types.setdefault(robot.robot_type.name, robot.robot_type) is not robot.robot_type:
+            raise ValueError(f"Two different robot types are named '{robot.robot_type.name}'")
+    robot_types = [robot.robot_type.name for robot in robots]
+    types = [robot_type for robot_type in types.values() if robot_type is not STANDARD_TYPE]
+
+    sensors = {
+        'beam_angle': [_sensor_value(robot, robot.transmitters, 'beam_angle',
+                                     lambda sensor: sensor.beam_angle) for robot in robots],
+        'beam_distance': [_sensor_value(robot, robot.transmitters, 'beam_distance',
+                                        lambda sensor: sensor.beam_distance / scale) for robot in robots],
+        'beam_offset': [_sensor_value(robot, robot.transmitters, 'beam_offset',
+                                      lambda sensor: abs(sensor.beam_direction_offset)) for robot in robots],
+        'viewing_angle': [_sensor_value(robot, robot.receivers, 'viewing_angle',
+                                        lambda sensor: sensor.viewing_angle) for robot in robots]
+    }
+
+    map_spec = None
+    grid = simulation.occupancy_grid
+    if grid is not None and grid.source:
+        map_spec = {'image': os.path.abspath(grid.source), 'resolution': grid.resolution,
+                    'threshold': grid.threshold, 'invert': grid.invert,
+                    'origin': [grid.origin_x, grid.origin_y]}
+
+    waypoints = None
+    leader = None
+    if path_manager is not None:
+        waypoints = [(wx / scale, wy / scale) for wx, wy in path_manager.waypoints]
+        ids = [robot.id for robot in robots]
+        if path_manager.leader_id in ids:
+            leader = ids.index(path_manager.leader_id)
+
+    return Scenario(x, y, orientation, sensors,
+                    arena_width=simulation.real_width,
+                    arena_height=simulation.real_height,
+                    robot_size=simulation.real_robot_size,
+                    waypoints=waypoints, leader=leader, name=name,
+                    obstacles=simulation.obstacles.to_list(), map_spec=map_spec,
+                    robot_types=robot_types, types=types)
+
+
+def _sensor_default(types, robot_types, key, default):
+    """Default of a sensor parameter: one value, or per robot where a type's sensor_config sets it"""
+    if not any(key in robot_type.sensor_config for robot_type in types.values()):
+        return default
+    return [types[name].sensor_config.get(key, default) if name in types else default
+            for name in robot_types]
+
+
+def _sensor_value(robot, sensors, key, read):
+    """Parameter read from a robot's first sensor, or its type's default if it has none"""
+    if sensors:
+        return read(sensors[0])
+    return robot.robot_type.sensor_config.get(key, SENSOR_DEFAULTS[key])
+
+
+def load_scenario(filename):
+    """Read a scenario from a .json or .toml file"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Reading TOML scenarios requires Python 3.11+ or the 'tomli' package")
+        with open(filename, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    # Map images are given relative to the scenario file
+    if isinstance(data.get('map'), dict) and 'image' in data['map']:
+        data['map'] = dict(data['map'])
+        data['map']['image'] = os.path.join(os.path.dirname(os.path.abspath(filename)), data['map']['image'])
+    return Scenario.from_dict(data)
+
+
+def save_scenario(scenario, filename):
+    """Write a scenario as JSON"""
+    if os.path.splitext(filename)[1].lower() == '.toml':
+        raise ValueError("Scenarios can only be saved as JSON")
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(scenario.to_dict(), f, indent=2)
@@ -0,0 +1,180 @@
+"""Sensor layouts described as data and compiled into arrays
+
+A layout lists the transmitters and receivers of a robot in the robot
+frame. Each sensor is a dict with:
+
+    x, y      position in half robot sizes, so (1, 0) is the middle of the
+              side the robot faces and -1..1 spans the outline. +y points
+              to the right of the heading (screen y points down)
+    heading   beam or viewing direction in degrees in the robot frame, 0 along +x
+    angle     full cone angle (beam angle / viewing angle) in degrees, optional
+    range     reach in meters, optional (applied by the simulation, which knows the scale)
+    side      0-3 (top, right, bottom, left), default the side the heading points to
+    index     position on its side for labels, default the order within the side
+    outward   sign in which a sensor config's beam offset turns a transmitter,
+              default the side of the heading the sensor sits on (0 in the middle)
+
+The layout is compiled once into arrays (tx_position, tx_heading, ...)
+that all robots built from it reference. The world positions of all
+sensors of a robot are one rotation of tx_position / rx_position.
+Alternative layouts are a different spec, e.g. loaded from JSON with
+SensorLayout.from_spec.
+"""
+import numpy as np
+
+from models.ir_sensor import IRTransmitter, IRReceiver
+
+# Heading (degrees) of the middle of each side: top, right, bottom, left
+SIDE_HEADING = np.array([270.0, 0.0, 90.0, 180.0])
+
+
+class SensorLayout:
+    """Compiled transmitter and receiver layout of a robot type"""
+
+    def __init__(self, transmitters, receivers, name=""):
+        self.name = name
+        self.transmitters = [dict(sensor) for sensor in transmitters]
+        self.receivers = [dict(sensor) for sensor in receivers]
+        (self.tx_position, self.tx_heading, self.tx_angle, self.tx_range,
+         self.tx_side, self.tx_index, self.tx_outward) = _compile(self.transmitters, 'transmitter')
+        (self.rx_position, self.rx_heading, self.rx_angle, self.rx_range,
+         self.rx_side, self.rx_index, self.rx_outward) = _compile(self.receivers, 'receiver')
+        # Per sensor (side, index, local_x, local_y, direction offset, angle) as Python
+        # values, so building the sensors of a robot does no NumPy scalar conversions
+        self._tx_args = self._sensor_args(self.tx_position, self.tx_heading, self.tx_angle,
+                                          self.tx_side, self.tx_index)
+        self._rx_args = self._sensor_args(self.rx_position, self.rx_heading, self.rx_angle,
+                                          self.rx_side, self.rx_index)
+        self.tx_outward_list = self.tx_outward.tolist()
+        self._has_ranges = bool(np.isfinite(self.tx_range).any() or np.isfinite(self.rx_range).any())
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Layout from a dict with 'transmitters', 'receivers' and optional 'name'"""
+        return cls(spec.get('transmitters', []), spec.get('receivers', []), spec.get('name', ""))
+
+    def to_spec(self):
+        return {'name': self.name, 'transmitters': [dict(sensor) for sensor in self.transmitters],
+                'receivers': [dict(sensor) for sensor in self.receivers]}
+
+    def create_sensors(self, robot_id):
+        """New (transmitters, receivers) sensor objects for a robot"""
+        transmitters = []
+        for side, index, local_x, local_y, offset, angle in self._tx_args:
+            transmitter = IRTransmitter(robot_id, side, index, local_x, local_y)
+            transmitter.local_x, transmitter.local_y = local_x, local_y
+            transmitter.beam_direction_offset = offset
+            if angle is not None:
+                transmitter.beam_angle = angle
+            transmitters.append(transmitter)
+
+        receivers = []
+        for side, index, local_x, local_y, offset, angle in self._rx_args:
+            receiver = IRReceiver(robot_id, side, index, local_x, local_y)
+            receiver.local_x, receiver.local_y = local_x, local_y
+            receiver.direction_offset = offset
+            if angle is not None:
+                receiver.viewing_angle = angle
+            receivers.append(receiver)
+        return transmitters, receivers
+
+    def apply_ranges(self, robots, scale):
+        """Set the ranges given by the layout on robots built from it"""
+        if not self._has_ranges:
+            return
+        for robot in robots:
+            for transmitter, real_range in zip(robot.transmitters, self.tx_range.tolist()):
+                if real_range == real_range:
+                    transmitter.real_beam_distance = real_range
+                    transmitter.beam_distance = round(real_range * scale, 2)
+            for receiver, real_range in zip(robot.receivers, self.rx_range.tolist()):
+                if real_range == real_range:
+                    receiver.real_max_distance = real_range
+                    receiver.max_distance = round(real_range * scale, 2)
+
+    def sensor_positions(self, x, y, size, orientation):
+        """World positions ((T, 2), (R, 2)) of the transmitters and receivers of a robot"""
+        angle = np.radians(orientation)
+        cos, sin = np.cos(angle), np.sin(angle)
+        rotation = np.array([[cos, sin], [-sin, cos]]) * (size / 2)
+        origin = np.array([x, y])
+        return self.tx_position @ rotation + origin, self.rx_position @ rotation + origin
+
+    @staticmethod
+    def _sensor_args(position, heading, angle, side, index):
+        # Sensor objects store the direction as an offset from the heading of their side
+        offsets = ((heading - SIDE_HEADING[side] + 180) % 360 - 180).tolist()
+        angles = [None if value != value else value for value in angle.tolist()]  # NaN: keep the default
+        return list(zip(side.tolist(), index.tolist(), position[:, 0].tolist(), position[:, 1].tolist(),
+                        offsets, angles))
+
+
+def _compile(sensors, kind):
+    count = len(sensors)
+    position = np.zeros((count, 2))
+    heading = np.zeros(count)
+    angle = np.full(count, np.nan)
+    real_range = np.full(count, np.nan)
+    side = np.zeros(count, dtype=np.int64)
+    index = np.zeros(count, dtype=np.int64)
+    outward = np.zeros(count)
+    per_side = [0, 0, 0, 0]
+    for k, sensor in enumerate(sensors):
+        unknown = set(sensor) - {'x', 'y', 'heading', 'angle', 'range', 'side', 'index', 'outward'}
+        if unknown:
+            raise ValueError(f"Unknown {kind} fields: {sorted(unknown)}")
+        try:
+            position[k] = float(sensor['x']), float(sensor['y'])
+            heading[k] = float(sensor['heading']) % 360
+        except KeyError as e:
+            raise ValueError(f"Every {kind} needs x, y and heading, {kind} {k} has no {e}")
+        if sensor.get('angle') is not None:
+            angle[k] = float(sensor['angle'])
+        if sensor.get('range') is not None:
+            real_range[k] = float(sensor['range'])
+        if sensor.get('side') is None:
+            # Side whose middle heading is closest
+            side[k] = int(np.argmin(np.abs((SIDE_HEADING - heading[k] + 180) % 360 - 180)))
+        else:
+            side[k] = int(sensor['side'])
+            if not 0 <= side[k] <= 3:
+                raise ValueError(f"Side of {kind} {k} must be 0-3")
+        index[k] = per_side[side[k]] if sensor.get('index') is None else int(sensor['index'])
+        per_side[side[k]] += 1
+        if sensor.get('outward') is None:
+            outward[k] = _outward(side[k], *position[k])
+        else:
+            outward[k] = float(sensor['outward'])
+    return position, heading, angle, real_range, side, index, outward
+
+
+def _outward(side, x, y):
+    """Sign of the turn away from the middle of a side (cross product of its heading and the position)"""
+    middle = np.radians(SIDE_HEADING[side])
+    return float(np.sign(round(np.cos(middle) * y - np.sin(middle) * x, 9)))
+
+
+def standard_layout(tx_positions=(-0.289, 0.289), rx_positions=(-0.578, 0.0, 0.578),
+                    tx_offset=15.0, rx_offset=30.0):
+    """Spec of the square robot with sensors on all four sides
+
+    Args:
+        tx_positions, rx_positions: Positions along each side in half sizes
+            (top/bottom: left to right, left/right: top to bottom at orientation 0)
+        tx_offset, rx_offset: Outward turn of transmitters and outer receivers (degrees)
+    """
+    def side_sensors(positions, offset):
+        sensors = []
+        for side in range(4):
+            for along in positions:
+                x, y = [(along, -1.0), (1.0, along), (along, 1.0), (-1.0, along)][side]
+                outward = _outward(side, x, y)
+                sensors.append({'x': x, 'y': y, 'side': side,
+                                'heading': float((SIDE_HEADING[side] + outward * offset) % 360)})
+        return sensors
+
+    return {'name': 'standard', 'transmitters': side_sensors(tx_positions, tx_offset),
+            'receivers': side_sensors(rx_positions, rx_offset)}
+
+
+DEFAULT_LAYOUT = SensorLayout.from_spec(standard_layout())
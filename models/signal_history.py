@@ -0,0 +1,144 @@
+"""Bounded history of received signal strengths with temporal filters
+
+Every (robot, receiver, emitter) link that currently carries a signal owns
+one row of a shared NumPy ring buffer with the last `length` samples.
+Rows are taken from a free list when a link appears and returned when its
+signal expires, so memory grows with the number of active links and not
+with the square of the robot count.
+
+Filters (FILTERS):
+    'none'   - latest sample
+    'mean'   - moving average of the samples in the ring
+    'ema'    - exponentially weighted moving average with factor alpha
+    'median' - median of the samples in the ring
+"""
+import numpy as np
+
+FILTERS = ('none', 'mean', 'ema', 'median')
+
+
+class SignalHistory:
+    """Ring buffers of signal strengths, one row per active link"""
+
+    def __init__(self, length=8, filter_name='ema', alpha=0.3, capacity=256):
+        """
+        Args:
+            length: Samples kept per link
+            filter_name: One of FILTERS
+            alpha: Weight of the newest sample for the 'ema' filter (0-1]
+            capacity: Initial number of rows, doubled when full
+        """
+        if length < 1:
+            raise ValueError("History length must be at least 1")
+        if not 0 < alpha <= 1:
+            raise ValueError("EWMA alpha must be in (0, 1]")
+        self.length = int(length)
+        self.alpha = float(alpha)
+        self.filter_name = None
+        self.set_filter(filter_name)
+
+        capacity = max(1, int(capacity))
+        self.samples = np.zeros((capacity, self.length))
+        self.head = np.zeros(capacity, dtype=np.int64)     # Next write position
+        self.count = np.zeros(capacity, dtype=np.int64)    # Valid samples
+        self.ema = np.zeros(capacity)
+        self.rows = {}                                     # (robot_id, receiver_index, emitter_id) -> row
+        self._free = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_filter(self, name):
+        """Select the filter applied by filtered()"""
+        if name not in FILTERS:
+            raise ValueError(f"Unknown filter '{name}', expected one of {', '.join(FILTERS)}")
+        self.filter_name = name
+
+    def clear(self):
+        """Forget all links"""
+        self.rows.clear()
+        self.count[:] = 0
+        self.head[:] = 0
+        self._free = list(range(len(self.count) - 1, -1, -1))
+
+    def push(self, keys, values):
+        """Append one sample per link and return the filtered values
+
+        Args:
+            keys: (robot_id, receiver_index, emitter_id) of each link, unique
+            values: Signal strength of each link
+
+        Returns:
+            numpy array of filtered strengths, in the order of keys
+        """
+        rows = np.fromiter((self._row(key) for key in keys), dtype=np.int64, count=len(keys))
+        values = np.asarray(values, dtype=np.float64)
+        if not len(rows):
+            return values
+
+        head = self.head[rows]
+        self.samples[rows, head] = values
+        self.head[rows] = (head + 1) % self.length
+        first = self.count[rows] == 0
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.length)
+        self.ema[rows] = np.where(first, values, self.alpha * values + (1 - self.alpha) * self.ema[rows])
+        return self._filtered_rows(rows, values)
+
+    def filtered(self, key):
+        """Filtered strength of one link, None if it has no samples"""
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        rows = np.array([row])
+        latest = self.samples[row, (self.head[row] - 1) % self.length]
+        return float(self._filtered_rows(rows, np.array([latest]))[0])
+
+    def release(self, key):
+        """Return the row of a link whose signal expired"""
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.count[row] = 0
+            self.head[row] = 0
+            self._free.append(row)
+
+    def release_robot(self, robot_id):
+        """Release all links received by or emitted from a robot"""
+        self.release_robots([robot_id])
+
+    def release_robots(self, robot_ids):
+        """Release all links received by or emitted from any of the robots, in one pass"""
+        robot_ids = set(robot_ids)
+        for key in [key for key in self.rows if key[0] in robot_ids or key[2] in robot_ids]:
+            self.release(key)
+
+    def _row(self, key):
+        row = self.rows.get(key)
+        if row is None:
+            if not self._free:
+                self._grow()
+            row = self._free.pop()
+            self.rows[key] = row
+        return row
+
+    def _grow(self):
+        """Double the number of rows"""
+        old = len(self.count)
+        self.samples = np.concatenate((self.samples, np.zeros((old, self.length))))
+        self.head = np.concatenate((self.head, np.zeros(old, dtype=np.int64)))
+        self.count = np.concatenate((self.count, np.zeros(old, dtype=np.int64)))
+        self.ema = np.concatenate((self.ema, np.zeros(old)))
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def _filtered_rows(self, rows, latest):
+        if self.filter_name == 'none':
+            return latest
+        if self.filter_name == 'ema':
+            return self.ema[rows].copy()
+
+        # Rings fill from position 0, so the first `count` samples are valid
+        count = self.count[rows]
+        valid = np.arange(self.length)[None, :] < count[:, None]
+        samples = self.samples[rows]
+        if self.filter_name == 'mean':
+            return (samples * valid).sum(axis=1) / count
+        return np.nanmedian(np.where(valid, samples, np.nan), axis=1)
@@ -1,13 +1,44 @@
+import gc
+import math
 import time
 import threading
+import numpy as np
 from models.robot import Robot
+from models.robot_type import STANDARD_TYPE
+from models.robot_registry import RobotRegistry
+from models.obstacles import StaticObstacleMap
+from models.link_engine import LinkEngine
+from models.tx_schedule import ContinuousSchedule, make_schedule
+from models.signal_history import SignalHistory
+from models.relative_tracker import RelativeTracker
+from models.particle_localizer import ParticleLocalizer
+from models.connectivity import ConnectivityGraph
+from models.events import EventBus
+from models.collision import CollisionSystem, RobotIndex
 from utils.ir_physics import calculate_ir_signal_strength
-from models.ir_sensor import can_receive_signal  # Add this line
+from models.ir_sensor import can_receive_signal, apply_sensor_config  # Add this line
 
 class Simulation:
     def __init__(self):
-        self.robots = []
-        self.obstacles = []
+        self.registry = RobotRegistry()  # Id -> slot of every robot
+        self.robots = self.registry.robots  # Dense list of the robots, in registry slot order
+        self.obstacles = StaticObstacleMap()  # Static walls, boxes and polygons (m)
+        self.occupancy_grid = None  # OccupancyGrid loaded from a floor plan image
+        self.visibility_cache = None  # Optional VisibilityCache for static line of sight
+        self.link_engine = LinkEngine(self)  # Direct and wall-reflected IR links
+        self.robot_index = RobotIndex()  # Sweep-and-prune index of the robot bounds, for physics
+        self.pick_index = RobotIndex()  # Separate index for picking in the canvas (UI thread)
+        self.collisions = CollisionSystem(index=self.robot_index)  # Keeps robots from passing through each other, None to disable
+        self.links = None  # LinkTable of the last update
+        self.connectivity = ConnectivityGraph()  # Which robots hear each other, updated from link diffs
+        self.events = EventBus()  # Link up/down, strength crossings and waypoints for subscribers
+        self.schedule = ContinuousSchedule()  # Which transmitters fire in each tick
+        self.tick = 0  # Number of the last update() call, signals are stamped with it
+        self.signal_history = SignalHistory()  # Recent strengths per link, filtered for RPA
+        self.relative_tracker = RelativeTracker()  # EKF of the robot ahead of each formation follower
+        self.localizer = ParticleLocalizer(self)  # Particle-filter poses of the robots registered with track()
+        self.relative_map = None  # Optional RelativeMapSolver, solved every update
+        self.messaging = None  # Optional MessageNetwork, delivers messages over the links of every update
         self.running = False
         self.simulation_thread = None
         self.next_robot_id = 1
@@ -28,28 +59,79 @@ class Simulation:
 
         self.debug_mode = False  # Changed from True to False
     
-    def add_robot(self, x=100, y=100, orientation=0):
+    def add_robot(self, x=100, y=100, orientation=0, robot_type=None):
         """Add new robot to simulation"""
-        robot = Robot(self.next_robot_id, x, y, orientation)
-        # Set robot size according to scale
-        robot.size = self.real_robot_size * self.scale
-        robot.simulation = self  # Set reference to simulation
-        self.robots.append(robot)
-        self.next_robot_id += 1
-
-        return robot
+        # Same setup as a batch: size, layout ranges and sensor config of the type
+        return self.add_robots([(x, y, orientation)], robot_type=robot_type)[0]
     
+    def add_robots(self, poses, sensor_config=None, robot_type=None):
+        """Add many robots in one call
+
+        All sensors of the new robots are configured in one pass.
+
+        Args:
+            poses: Sequence or (N, 3) array of (x, y, orientation) in pixels/degrees
+            sensor_config: Optional dict of ir_sensor.SENSOR_CONFIG_KEYS, each
+                a single value or one value per robot
+            robot_type: RobotType of the new robots (default robot_type.STANDARD_TYPE),
+                its sensor_config is applied before the given one
+
+        Returns:
+            list: The new robots, in the same order as poses
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        robot_type = STANDARD_TYPE if robot_type is None else robot_type
+        size = self.robot_size(robot_type)
+        first_id = self.next_robot_id
+        new_robots = []
+        # Tens of thousands of new sensor objects would trigger repeated full
+        # garbage collections, none of which can free anything here
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            for robot_id, (x, y, orientation) in enumerate(poses.tolist(), start=first_id):
+                robot = Robot(robot_id, x, y, orientation % 360, robot_type)
+                robot.size = size
+                robot.simulation = self
+                new_robots.append(robot)
+        finally:
+            if collecting:
+                gc.enable()
+        robot_type.layout.apply_ranges(new_robots, self.scale)
+        if robot_type.sensor_config:
+            apply_sensor_config(new_robots, robot_type.sensor_config, self.scale)
+        if sensor_config:
+            apply_sensor_config(new_robots, sensor_config, self.scale)
+
+        self.registry.extend(new_robots)
+        self.next_robot_id = first_id + len(new_robots)
+        return new_robots
+
+    def robot_size(self, robot_type):
+        """Side length (pixels) of robots of a type at the current scale"""
+        real_size = self.real_robot_size if robot_type.size is None else robot_type.size
+        return real_size * self.scale
+
     def remove_robot(self, robot_id=None):
         """Remove robot from simulation"""
-        if robot_id is None and self.robots:
-            self.robots.pop()  # Remove last robot if no ID specified
-            return True
-        
-        for i, robot in enumerate(self.robots):
-            if robot.id == robot_id:
-                self.robots.pop(i)
-                return True
-        return False
+        if robot_id is None:
+            if not self.robots:
+                return False
+            robot_id = self.robots[-1].id  # Remove last robot if no ID specified
+        return self.remove_robots([robot_id]) == 1
+
+    def remove_robots(self, robot_ids):
+        """Remove many robots in one call, returns the number removed"""
+        # The robot of the last slot moves into each freed one
+        removed = [robot_id for robot_id in robot_ids if self.registry.remove(robot_id) is not None]
+        if not removed:
+            return 0
+        self.signal_history.release_robots(removed)
+        for robot_id in removed:
+            self.localizer.forget(robot_id)
+            if self.messaging is not None:
+                self.messaging.forget(robot_id)
+        return len(removed)
     
     def start(self):
         """Start simulation"""
@@ -58,6 +140,7 @@ class Simulation:
             for robot in self.robots:
                 for receiver in robot.receivers:
                     receiver.clear_signals()
+            self.signal_history.clear()
                     
             self.running = True
             try:
@@ -81,12 +164,35 @@ class Simulation:
                 print(f"Error stopping thread: {e}")
             finally:
                 self.simulation_thread = None
+        
+        # Keep cached static visibility for the next run on the same map
+        if self.visibility_cache is not None:
+            try:
+                self.visibility_cache.save()
+            except OSError as e:
+                print(f"Error saving visibility cache: {e}")
     
     def reset(self):
         """Reset simulation"""
         self.stop()
-        self.robots.clear()
+        self.registry.clear()
         self.obstacles.clear()
+        self.occupancy_grid = None
+        self.links = None
+        self.connectivity.reset()
+        self.events.reset()
+        self.robot_index.reset()
+        self.pick_index.reset()
+        if self.collisions is not None:
+            self.collisions.reset()
+        self.tick = 0
+        self.signal_history.clear()
+        self.relative_tracker.reset()
+        self.localizer.reset()
+        if self.relative_map is not None:
+            self.relative_map.reset()
+        if self.messaging is not None:
+            self.messaging.reset()
         self.next_robot_id = 1
     
     def run_simulation(self):
@@ -98,8 +204,7 @@ class Simulation:
             while self.running and iteration_count < max_iterations:
                 try:
                     self.update()
-                    # Clear signals after each update to avoid accumulation
-                    self._clear_all_signals()
+                    # Signals stay readable until the next update expires them
                     time.sleep(0.05)  # 20 FPS simulation rate
                     iteration_count += 1
                 except Exception as e:
@@ -114,22 +219,149 @@ class Simulation:
             print(f"Critical error in simulation thread: {e}")
             self.running = False
     
-    def _clear_all_signals(self):
-        """Clear all received IR signals to avoid accumulation"""
+    def pan(self, dx, dy):
+        """Shift the view by (dx, dy) pixels: move robots and the obstacle map"""
         for robot in self.robots:
-            for receiver in robot.receivers:
-                # Ensure signals are cleared
-                receiver.clear_signals()
-                # Add this line to also clear estimated_distances if they exist
-                if hasattr(receiver, 'estimated_distances'):
-                    receiver.estimated_distances = {}
-    
+            robot.x += dx
+            robot.y += dy
+        # Only the map origins change, their BVH/grid stay valid
+        self.obstacles.translate(dx / self.scale, dy / self.scale)
+        if self.occupancy_grid is not None:
+            self.occupancy_grid.translate(dx / self.scale, dy / self.scale)
+
+    def static_maps(self):
+        """Non-empty static obstacle maps (vector obstacles and occupancy grid)"""
+        return [static_map for static_map in (self.obstacles, self.occupancy_grid) if static_map]
+
+    def set_schedule(self, schedule, **kwargs):
+        """Set the transmission schedule, by name (see models.tx_schedule.SCHEDULES) or as object"""
+        if isinstance(schedule, str):
+            schedule = make_schedule(schedule, **kwargs)
+        self.schedule = schedule
+        return schedule
+
+    def set_signal_filter(self, name, **kwargs):
+        """Select the filter of received strengths used by RPA (see models.signal_history.FILTERS)
+
+        Keyword arguments (length, alpha) start a new history with those settings.
+        """
+        if kwargs:
+            self.signal_history = SignalHistory(filter_name=name, **kwargs)
+        else:
+            self.signal_history.set_filter(name)
+        return self.signal_history
+
+    def set_reflection_order(self, order):
+        """Maximum number of wall reflections of IR paths (0 for direct paths only)"""
+        self.link_engine.set_reflection_order(order)
+
+    def los_maps(self):
+        """Static maps to test line of sight against, through the visibility cache if enabled"""
+        static_maps = self.static_maps()
+        if self.visibility_cache is None or not static_maps:
+            return static_maps
+        self.visibility_cache.attach(static_maps)
+        return [self.visibility_cache]
+
+    def enable_visibility_cache(self, enabled=True, cell_size=0.01, max_entries=500000, persist=True):
+        """Turn memoized static line of sight on or off
+
+        Args:
+            cell_size: Quantization step of sensor positions (m)
+            max_entries: LRU capacity
+            persist: Store the cache on disk between runs
+        """
+        if self.visibility_cache is not None:
+            self.visibility_cache.save()
+        if not enabled:
+            self.visibility_cache = None
+            return None
+
+        from models.visibility_cache import VisibilityCache, DEFAULT_CACHE_DIR
+        self.visibility_cache = VisibilityCache(cell_size, max_entries,
+                                                DEFAULT_CACHE_DIR if persist else None)
+        return self.visibility_cache
+
+    def enable_collisions(self, enabled=True, **kwargs):
+        """Turn robot-robot collisions (models.collision) on or off
+
+        Keyword arguments are passed to CollisionSystem (iterations, stiffness, slop).
+        """
+        if not enabled:
+            self.collisions = None
+            return None
+
+        self.collisions = CollisionSystem(index=self.robot_index, **kwargs)
+        return self.collisions
+
+    def enable_relative_map(self, enabled=True, **kwargs):
+        """Turn the swarm-wide relative map (models.relative_map) on or off
+
+        Keyword arguments are passed to RelativeMapSolver. The accuracy
+        against the true positions is returned by relative_map.accuracy(simulation).
+        """
+        if not enabled:
+            self.relative_map = None
+            return None
+
+        from models.relative_map import RelativeMapSolver
+        self.relative_map = RelativeMapSolver(**kwargs)
+        return self.relative_map
+
+    def enable_messaging(self, router='flooding', enabled=True, **kwargs):
+        """Turn multi-hop messaging (models.message_network) over the IR links on or off
+
+        Args:
+            router: Router object or one of message_network.ROUTERS
+            kwargs: Passed to MessageNetwork (queue sizes, SINR model, seed, ...)
+        """
+        if not enabled:
+            self.messaging = None
+            return None
+
+        from models.message_network import MessageNetwork
+        self.messaging = MessageNetwork(router, **kwargs)
+        return self.messaging
+
+    def load_map_image(self, filename, resolution, threshold=128, invert=False, origin=(0.0, 0.0)):
+        """Load a floor plan image as occupancy grid with resolution meters per cell"""
+        from models.occupancy_grid import OccupancyGrid
+        self.occupancy_grid = OccupancyGrid.from_image(filename, resolution, threshold, invert, origin)
+        return self.occupancy_grid
+
+    def robot_collides(self, robot, dx=0, dy=0):
+        """Check whether a robot moved by (dx, dy) pixels would touch a static obstacle"""
+        static_maps = self.static_maps()
+        if not static_maps:
+            return False
+        corners = [(x + dx, y + dy) for x, y in robot.get_corner_positions()]
+        return any(static_map.collides_polygon(corners, self.scale) for static_map in static_maps)
+
     def get_robot_at(self, x, y):
         """Get robot at position (x, y)"""
-        for robot in self.robots:
-            if robot.contains_point(x, y):
-                return robot
-        return None
+        # Refresh the picking index with the current poses, only robots near the point are tested
+        # exactly. The physics index is left to CollisionSystem.step on the simulation thread
+        index = self.pick_index
+        index.update(self.robots)
+        found = index.query_point(x, y)
+        return index.robots[found[0]] if len(found) else None
+
+    def get_sensor_at(self, x, y, radius=4):
+        """Get the (robot, sensor) of the transmitter or receiver closest to (x, y)
+
+        Only sensors within radius pixels count, None if there is none.
+        """
+        index = self.pick_index
+        index.update(self.robots)
+        best, best_distance = None, radius
+        for robot_index in index.query_box(x - radius, y - radius, x + radius, y + radius).tolist():
+            robot = index.robots[robot_index]
+            for sensor in robot.transmitters + robot.receivers:
+                sx, sy = sensor.get_position(robot.x, robot.y, robot.size, robot.orientation)
+                distance = math.hypot(sx - x, sy - y)
+                if distance <= best_distance:
+                    best, best_distance = (robot, sensor), distance
+        return best
     
     def real_to_pixel(self, real_x, real_y):
         """Convert real coordinates (m) to pixels"""
@@ -153,64 +385,50 @@ class Simulation:
 
     def get_robot_by_id(self, robot_id):
         """Get robot by ID"""
-        for robot in self.robots:
-            if robot.id == robot_id:
-                return robot
-        return None   
+        return self.registry.get(robot_id)
      
     def update(self):
-        """Update one simulation step"""
-        # Clear all signals from previous loop
-        for robot in self.robots:
-            for receiver in robot.receivers:
-                receiver.clear_signals()
+        """Update one simulation step
+
+        Returns:
+            List of the events of this step, published to simulation.events
+            (empty while nobody is subscribed)
+        """
+        self.tick += 1
+
+        # Push overlapping robots apart before their sensors are evaluated
+        if self.collisions is not None:
+            self.collisions.step(self.robots)
         
-        # Collect robot positions
-        robot_positions = {}
-        for robot in self.robots:
-            robot_positions[robot.id] = {
-                'x': robot.x,
-                'y': robot.y,
-                'size': robot.size,
-                'orientation': robot.orientation
-            }
+        # Evaluate the links of the transmitters that fire in this tick in one vectorized pass
+        links = self.link_engine.compute(schedule=self.schedule, tick=self.tick)
+        self.link_engine.apply(links, tick=self.tick)
+        self.links = links
+        added, removed = self.connectivity.update(links, self.tick, self.schedule.max_age,
+                                                  [robot.id for robot in self.robots])
+        events = []
+        if self.events.active:
+            events = self.events.link_events(self.tick, added, removed, links, self.connectivity.keys)
         
-        # Collect obstacles
-        obstacles = []
+        # Drop signals whose transmitter was not heard for a whole schedule cycle,
+        # together with their history
+        max_age = self.schedule.max_age
+        history = self.signal_history
         for robot in self.robots:
-            robot_polygon = [
-                (robot.x - robot.size/2, robot.y - robot.size/2),
-                (robot.x + robot.size/2, robot.y - robot.size/2),
-                (robot.x + robot.size/2, robot.y + robot.size/2),
-                (robot.x - robot.size/2, robot.y + robot.size/2)
-            ]
-            obstacles.append(robot_polygon)
-        
-        # Calculate signals between robots
-        from models.ir_sensor import can_receive_signal
-        
-        for tx_robot in self.robots:
-            for transmitter in tx_robot.transmitters:
-                if not transmitter.active:
-                    continue
-                    
-                for rx_robot in self.robots:
-                    if rx_robot.id == tx_robot.id:
-                        continue  # Don't calculate signal from robot to itself
-                        
-                    for receiver in rx_robot.receivers:
-                        # Use combined Pathloss-Rician model
-                        can_receive, estimated_distance, signal_strength = can_receive_signal(
-                            transmitter, receiver, robot_positions, obstacles)
-                        
-                        if can_receive:
-                            receiver.add_signal(tx_robot.id, signal_strength)
-                            # Save estimated distance if needed
-                            if not hasattr(receiver, 'estimated_distances'):
-                                receiver.estimated_distances = {}
-                            receiver.estimated_distances[tx_robot.id] = estimated_distance
-    
-        # Other simulation updates...
+            for index, receiver in enumerate(robot.receivers):
+                for tx_id in receiver.expire_signals(self.tick, max_age):
+                    history.release((robot.id, index, tx_id))
+
+        if len(self.localizer):
+            self.localizer.step(links)
+        if self.relative_map is not None:
+            self.relative_map.update(self)
+        if self.messaging is not None:
+            self.messaging.step(links, self.tick)
+
+        if events:
+            self.events.publish(events)
+        return events
 
     def update_robot_sizes(self):
         """Update size of all robots based on current scale"""
@@ -220,7 +438,7 @@ class Simulation:
         
         for robot in self.robots:
             old_size = robot.size
-            robot.size = round(self.real_robot_size * self.scale, 2)  # Round size
+            robot.size = round(self.robot_size(robot.robot_type), 2)  # Round size
             print(f"Robot {robot.id}: {old_size:.2f} -> {robot.size:.2f}")
             
             # Update transmission angle and distance of sensors
@@ -0,0 +1,301 @@
+"""Synthetic swarm scenarios for stress tests and benchmarks
+
+generate_swarm() places N robots in one of the LAYOUTS, gives them
+orientations from one of the ORIENTATIONS and optionally adds a waypoint
+path. The result is a models.scenario.Scenario, so it can be saved as a
+scenario file or applied straight to a Simulation:
+
+    scenario = generate_swarm(1000, layout='clustered', seed=1)
+    scenario.apply(simulation, path_manager)
+
+The same arguments and seed always produce the same scenario.
+"""
+import math
+import numpy as np
+from models.scenario import Scenario
+
+LAYOUTS = ('uniform', 'clustered', 'grid', 'line', 'ring')
+ORIENTATIONS = ('fixed', 'uniform', 'normal', 'inward', 'outward')
+PATHS = ('random', 'line', 'loop')
+
+# Candidates drawn per batch by the rejection sampler
+_CANDIDATE_BATCH = 1024
+
+
+def generate_swarm(count, layout='uniform', arena=None, robot_size=0.1,
+                   min_separation=None, spacing=None, clusters=4, cluster_std=None,
+                   radius=None, orientation='uniform', heading=0.0, heading_std=20.0,
+                   waypoints=0, path='random', sensors=None, formation=False,
+                   seed=None, name=None):
+    """Generate a scenario with `count` robots
+
+    Args:
+        count: Number of robots
+        layout: One of LAYOUTS
+        arena: (width, height) of the arena in meters, default 4 x 4 m or
+               larger when the robots would not fit with min_separation
+        robot_size: Robot side length (m)
+        min_separation: Smallest center distance for 'uniform' and 'clustered'
+                        layouts (m), default 1.5 robot sizes
+        spacing: Distance between neighbours for 'grid' and 'line' (m),
+                 default fits the arena
+        clusters: Number of clusters for the 'clustered' layout
+        cluster_std: Standard deviation of robot positions around a cluster
+                     center (m), default grows with the robots per cluster
+        radius: Ring radius for the 'ring' layout (m), default fits the arena
+        orientation: One of ORIENTATIONS
+        heading: Orientation for 'fixed' and mean for 'normal' (degrees)
+        heading_std: Standard deviation for 'normal' (degrees)
+        waypoints: Number of waypoints of the path (0 for no path)
+        path: One of PATHS
+        sensors: Optional sensor parameters, scalars or per-robot arrays
+        formation: Whether to add a column formation led by robot 0
+        seed: Random seed, also stored in the scenario
+        name: Scenario name
+
+    Returns:
+        Scenario
+    """
+    if count < 0:
+        raise ValueError("Robot count must not be negative")
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}', expected one of {', '.join(LAYOUTS)}")
+    if orientation not in ORIENTATIONS:
+        raise ValueError(f"Unknown orientation '{orientation}', expected one of {', '.join(ORIENTATIONS)}")
+    if waypoints and path not in PATHS:
+        raise ValueError(f"Unknown path '{path}', expected one of {', '.join(PATHS)}")
+
+    rng = np.random.default_rng(seed)
+    if min_separation is None:
+        min_separation = robot_size * 1.5
+    margin = robot_size  # Keep whole robots inside the arena
+    if arena is None:
+        arena = _default_arena(layout, count, min_separation, margin)
+    width, height = arena
+    bounds = (margin, margin, width - margin, height - margin)
+    if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+        raise ValueError("Arena is too small for the robot size")
+
+    if layout == 'uniform':
+        x, y = _uniform_positions(rng, count, bounds, min_separation)
+    elif layout == 'clustered':
+        x, y = _clustered_positions(rng, count, bounds, min_separation, clusters, cluster_std)
+    elif layout == 'grid':
+        x, y = _grid_positions(count, bounds, spacing)
+    elif layout == 'line':
+        x, y = _line_positions(count, bounds, spacing)
+    else:
+        x, y = _ring_positions(count, bounds, radius)
+
+    orientations = _orientations(rng, x, y, orientation, heading, heading_std)
+    path_points = _waypoints(rng, waypoints, path, bounds) if waypoints else None
+
+    formation_spec = None
+    if formation and count:
+        # Followers queue up by distance to the leader
+        order = np.argsort(np.hypot(x - x[0], y - y[0]), kind='stable')
+        formation_spec = {'type': 'column', 'order': order.tolist()}
+        if spacing is not None:
+            formation_spec['spacing'] = spacing
+
+    if name is None:
+        name = f"{layout} swarm of {count}"
+
+    return Scenario(x, y, orientations, sensors,
+                    arena_width=width, arena_height=height, robot_size=robot_size,
+                    waypoints=path_points, formation=formation_spec,
+                    leader=0 if formation_spec else None, seed=seed, name=name)
+
+
+def populate_simulation(simulation, count, path_manager=None, **kwargs):
+    """Generate a swarm and load it into a simulation, returns the robots"""
+    kwargs.setdefault('arena', (simulation.real_width, simulation.real_height))
+    kwargs.setdefault('robot_size', simulation.real_robot_size)
+    return generate_swarm(count, **kwargs).apply(simulation, path_manager)
+
+
+def _default_arena(layout, count, min_separation, margin):
+    """Square arena of at least 4 x 4 m in which the layout fits"""
+    if layout == 'line':
+        extent = (count - 1) * min_separation
+    elif layout == 'ring':
+        extent = count * min_separation / math.pi  # Diameter of a ring with that spacing
+    elif layout == 'grid':
+        extent = math.ceil(math.sqrt(count)) * min_separation
+    else:
+        # Random placement jams well below dense packing, keep about half of the area free
+        extent = math.sqrt(2.0 * count) * min_separation
+    side = max(4.0, extent + 2 * margin)
+    return (side, side)
+
+
+def _uniform_positions(rng, count, bounds, min_separation):
+    """Uniform random positions with a minimum separation (dart throwing)"""
+    x0, y0, x1, y1 = bounds
+
+    def candidates(size):
+        return rng.uniform(x0, x1, size), rng.uniform(y0, y1, size)
+
+    return _place_separated(candidates, count, bounds, min_separation)
+
+
+def _clustered_positions(rng, count, bounds, min_separation, clusters, cluster_std):
+    """Gaussian clusters around uniformly placed centers"""
+    x0, y0, x1, y1 = bounds
+    clusters = max(1, min(clusters, count)) if count else 1
+    if cluster_std is None:
+        # Two standard deviations around the center hold three times the area the robots need
+        cluster_std = max(min_separation, min_separation * math.sqrt(3.0 * count / clusters / math.pi) / 2)
+    centers_x = rng.uniform(x0, x1, clusters)
+    centers_y = rng.uniform(y0, y1, clusters)
+
+    def candidates(size):
+        which = rng.integers(0, clusters, size)
+        cx = centers_x[which] + rng.normal(0.0, cluster_std, size)
+        cy = centers_y[which] + rng.normal(0.0, cluster_std, size)
+        inside = (cx >= x0) & (cx <= x1) & (cy >= y0) & (cy <= y1)
+        return cx[inside], cy[inside]
+
+    return _place_separated(candidates, count, bounds, min_separation)
+
+
+def _place_separated(candidates, count, bounds, min_separation, max_batches=None):
+    """Accept candidate points that keep min_separation to all accepted ones
+
+    Accepted points are bucketed in a grid of min_separation cells, so each
+    candidate is only checked against the 3x3 neighbouring cells.
+    """
+    x0, y0, x1, y1 = bounds
+    xs = np.empty(count)
+    ys = np.empty(count)
+    if count == 0:
+        return xs, ys
+    if min_separation <= 0:
+        xs[:], ys[:] = _take(candidates, count)
+        return xs, ys
+
+    cell = min_separation
+    min_sq = min_separation * min_separation
+    buckets = {}
+    placed = 0
+    if max_batches is None:
+        max_batches = 50 + 20 * count // _CANDIDATE_BATCH
+
+    for _ in range(max_batches):
+        cx, cy = candidates(_CANDIDATE_BATCH)
+        for px, py in zip(cx.tolist(), cy.tolist()):
+            i = int((px - x0) // cell)
+            j = int((py - y0) // cell)
+            free = True
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    for k in buckets.get((i + di, j + dj), ()):
+                        dx = xs[k] - px
+                        dy = ys[k] - py
+                        if dx * dx + dy * dy < min_sq:
+                            free = False
+                            break
+                    if not free:
+                        break
+                if not free:
+                    break
+            if not free:
+                continue
+
+            xs[placed] = px
+            ys[placed] = py
+            buckets.setdefault((i, j), []).append(placed)
+            placed += 1
+            if placed == count:
+                return xs, ys
+
+    raise ValueError(f"Could only place {placed} of {count} robots with "
+                     f"{min_separation:.3f} m separation in a {x1 - x0:.2f} x {y1 - y0:.2f} m area")
+
+
+def _take(candidates, count):
+    """Draw exactly count candidate points"""
+    xs, ys = [], []
+    total = 0
+    while total < count:
+        cx, cy = candidates(max(count - total, _CANDIDATE_BATCH))
+        xs.append(cx)
+        ys.append(cy)
+        total += len(cx)
+    return np.concatenate(xs)[:count], np.concatenate(ys)[:count]
+
+
+def _grid_positions(count, bounds, spacing):
+    """Rows of robots centered in the arena"""
+    x0, y0, x1, y1 = bounds
+    width, height = x1 - x0, y1 - y0
+    if count == 0:
+        return np.empty(0), np.empty(0)
+
+    # Choose the column count that keeps the cells closest to square
+    cols = max(1, int(math.ceil(math.sqrt(count * width / height))))
+    rows = int(math.ceil(count / cols))
+    if spacing is None:
+        spacing = min(width / max(cols - 1, 1), height / max(rows - 1, 1))
+
+    index = np.arange(count)
+    x = (index % cols) * spacing
+    y = (index // cols) * spacing
+    x += x0 + (width - (cols - 1) * spacing) / 2
+    y += y0 + (height - (rows - 1) * spacing) / 2
+    return x, y
+
+
+def _line_positions(count, bounds, spacing):
+    """Horizontal line through the arena center, robot 0 at the right end"""
+    x0, y0, x1, y1 = bounds
+    if spacing is None:
+        spacing = (x1 - x0) / max(count - 1, 1)
+    offsets = np.arange(count) * spacing
+    x = (x0 + x1) / 2 + offsets[-1] / 2 - offsets if count else offsets
+    y = np.full(count, (y0 + y1) / 2)
+    return x, y
+
+
+def _ring_positions(count, bounds, radius):
+    """Robots evenly spaced on a circle around the arena center"""
+    x0, y0, x1, y1 = bounds
+    if radius is None:
+        radius = min(x1 - x0, y1 - y0) / 2
+    angles = np.arange(count) * (2 * math.pi / max(count, 1))
+    x = (x0 + x1) / 2 + radius * np.cos(angles)
+    y = (y0 + y1) / 2 + radius * np.sin(angles)
+    return x, y
+
+
+def _orientations(rng, x, y, mode, heading, heading_std):
+    """Orientation (degrees) of each robot"""
+    count = len(x)
+    if mode == 'fixed':
+        return np.full(count, heading % 360)
+    if mode == 'uniform':
+        return rng.uniform(0.0, 360.0, count)
+    if mode == 'normal':
+        return rng.normal(heading, heading_std, count) % 360
+
+    # Face towards/away from the centroid of the swarm (orientation 0 is +x, like Robot.move_forward)
+    if count == 0:
+        return np.empty(0)
+    outward = np.degrees(np.arctan2(y - y.mean(), x - x.mean())) % 360
+    return outward if mode == 'outward' else (outward + 180) % 360
+
+
+def _waypoints(rng, count, mode, bounds):
+    """Waypoint path (m) inside bounds"""
+    x0, y0, x1, y1 = bounds
+    if mode == 'random':
+        return np.column_stack((rng.uniform(x0, x1, count), rng.uniform(y0, y1, count)))
+    if mode == 'line':
+        return np.column_stack((np.linspace(x0, x1, count), np.full(count, (y0 + y1) / 2)))
+
+    # Closed loop around the arena center
+    angles = np.linspace(0.0, 2 * math.pi, count, endpoint=False)
+    radius_x = (x1 - x0) / 3
+    radius_y = (y1 - y0) / 3
+    return np.column_stack(((x0 + x1) / 2 + radius_x * np.cos(angles),
+                            (y0 + y1) / 2 + radius_y * np.sin(angles)))
@@ -0,0 +1,147 @@
+import numpy as np
+
+
+class TelemetryBuffer:
+    """Preallocated, growable column store for per-tick telemetry
+
+    Every append() writes one full row, so all columns always have the same
+    length. Storage doubles until max_rows is reached, after which the
+    overflow policy decides what happens:
+      - 'decimate': drop every other row and halve the recording rate,
+        keeping the whole run at reduced time resolution
+      - 'ring': overwrite the oldest rows, keeping the most recent window
+    """
+
+    COLUMNS = ('timestamp', 'x', 'y', 'orientation', 'target_angle',
+               'distance_to_waypoint', 'rotation', 'speed', 'deviation')
+    POLICIES = ('decimate', 'ring')
+
+    def __init__(self, columns=COLUMNS, initial_rows=256, max_rows=65536, policy='decimate'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {self.POLICIES}")
+
+        self.columns = tuple(columns)
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+        self.max_rows = max(2, int(max_rows))
+        self.policy = policy
+
+        # Column-major so that each column is a contiguous block
+        rows = max(2, min(int(initial_rows), self.max_rows))
+        self._data = np.empty((rows, len(self.columns)), dtype=np.float64, order='F')
+        self._start = 0   # Physical row of the oldest sample (ring mode only)
+        self._count = 0   # Number of valid rows
+        self._ticks = 0   # Number of append() calls, recorded or not
+        self.stride = 1   # Record one row every `stride` appends
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def capacity(self):
+        """Number of rows currently allocated"""
+        return self._data.shape[0]
+
+    def clear(self):
+        """Drop all samples but keep the allocated storage"""
+        self._start = 0
+        self._count = 0
+        self._ticks = 0
+        self.stride = 1
+
+    def append(self, **values):
+        """Record one row; columns not given are stored as NaN
+
+        Returns:
+            bool: True if the row was stored, False if skipped by downsampling
+        """
+        self._ticks += 1
+        if (self._ticks - 1) % self.stride:
+            return False
+
+        capacity = self.capacity
+        if self._count == capacity:
+            if capacity < self.max_rows:
+                self._grow(min(capacity * 2, self.max_rows))
+            elif self.policy == 'decimate':
+                self._decimate()
+            else:
+                # Ring is full - overwrite the oldest row
+                row = self._start
+                self._start = (self._start + 1) % capacity
+                self._write_row(row, values)
+                return True
+
+        row = (self._start + self._count) % self.capacity
+        self._write_row(row, values)
+        self._count += 1
+        return True
+
+    def column(self, name):
+        """Return a read-only view of one column in chronological order"""
+        self._linearize()
+        view = self._data[:self._count, self._column_index[name]]
+        view.flags.writeable = False
+        return view
+
+    def view(self):
+        """Return a read-only 2D view (rows x columns) in chronological order"""
+        self._linearize()
+        view = self._data[:self._count]
+        view.flags.writeable = False
+        return view
+
+    def columns_view(self, *names):
+        """Return views for several columns at once"""
+        return tuple(self.column(name) for name in names)
+
+    def last(self, name, default=None):
+        """Return the most recent value of a column"""
+        if not self._count:
+            return default
+        row = (self._start + self._count - 1) % self.capacity
+        return float(self._data[row, self._column_index[name]])
+
+    def snapshot(self):
+        """Return an independent copy of all columns as a dict of arrays"""
+        self._linearize()
+        data = self._data[:self._count].copy(order='F')
+        return {name: data[:, i] for i, name in enumerate(self.columns)}
+
+    def copy(self):
+        """Return an independent buffer holding the same samples"""
+        self._linearize()
+        other = TelemetryBuffer(self.columns, initial_rows=self._count,
+                                max_rows=self.max_rows, policy=self.policy)
+        other._data[:self._count] = self._data[:self._count]
+        other._count = self._count
+        other._ticks = self._ticks
+        other.stride = self.stride
+        return other
+
+    def _write_row(self, row, values):
+        data = self._data
+        data[row] = np.nan
+        index = self._column_index
+        for name, value in values.items():
+            data[row, index[name]] = value
+
+    def _grow(self, new_rows):
+        """Reallocate storage with more rows, preserving chronological order"""
+        self._linearize()
+        new_data = np.empty((new_rows, len(self.columns)), dtype=np.float64, order='F')
+        new_data[:self._count] = self._data[:self._count]
+        self._data = new_data
+
+    def _decimate(self):
+        """Keep every other row and halve the recording rate"""
+        self._linearize()
+        kept = self._data[:self._count:2].copy(order='F')
+        self._count = kept.shape[0]
+        self._data[:self._count] = kept
+        self.stride *= 2
+
+    def _linearize(self):
+        """Rotate a wrapped ring so that row 0 is the oldest sample"""
+        if self._start:
+            self._data[:] = np.roll(self._data, -self._start, axis=0)
+            self._start = 0
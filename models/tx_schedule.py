@@ -0,0 +1,109 @@
+"""Transmission schedules: which IR transmitters fire in a simulation tick
+
+Real IR swarms share the channel between transmitters instead of having
+every LED on all the time. A schedule picks the transmitters that fire in
+each tick and only those are evaluated by the link engine. Receivers keep
+the last value heard from every robot together with the tick it arrived in,
+and drop it after max_age ticks without a new reception.
+
+    simulation.set_schedule('round_robin', per_tick=2)
+    simulation.set_schedule('tdma', slots=4)
+    simulation.set_schedule('random', probability=0.25, seed=1)
+"""
+import math
+import numpy as np
+
+SCHEDULES = ('continuous', 'round_robin', 'tdma', 'random')
+
+
+class ContinuousSchedule:
+    """Every active transmitter fires in every tick (no multiplexing)"""
+
+    name = 'continuous'
+
+    @property
+    def max_age(self):
+        """Ticks after which a value that was not heard again is stale"""
+        return 1
+
+    def firing(self, tick, robot_ids, tx_index, tx_count):
+        """Boolean mask of the transmitters that fire in this tick
+
+        Args:
+            tick: Simulation tick number
+            robot_ids: Robot id of each candidate transmitter
+            tx_index: Index of the transmitter in robot.transmitters
+            tx_count: Number of transmitters of its robot
+        """
+        return np.ones(len(robot_ids), dtype=bool)
+
+
+class RoundRobinSchedule(ContinuousSchedule):
+    """Each robot cycles through its transmitters, per_tick of them at a time"""
+
+    name = 'round_robin'
+
+    def __init__(self, per_tick=1):
+        if per_tick < 1:
+            raise ValueError("Round-robin schedule needs at least one transmitter per tick")
+        self.per_tick = int(per_tick)
+        self._cycle = 8  # Largest transmitter count seen, for max_age
+
+    @property
+    def max_age(self):
+        return int(math.ceil(self._cycle / self.per_tick))
+
+    def firing(self, tick, robot_ids, tx_index, tx_count):
+        if len(tx_count):
+            self._cycle = int(tx_count.max())
+        first = (tick * self.per_tick) % np.maximum(tx_count, 1)
+        return (tx_index - first) % np.maximum(tx_count, 1) < self.per_tick
+
+
+class TDMASchedule(ContinuousSchedule):
+    """Time slots: robot id modulo slots decides when a robot transmits, all its LEDs at once"""
+
+    name = 'tdma'
+
+    def __init__(self, slots=4):
+        if slots < 1:
+            raise ValueError("TDMA schedule needs at least one slot")
+        self.slots = int(slots)
+
+    @property
+    def max_age(self):
+        return self.slots
+
+    def firing(self, tick, robot_ids, tx_index, tx_count):
+        return robot_ids % self.slots == tick % self.slots
+
+
+class RandomAccessSchedule(ContinuousSchedule):
+    """Each transmitter fires independently with the given probability (ALOHA-like)"""
+
+    name = 'random'
+
+    def __init__(self, probability=0.25, seed=None):
+        if not 0 < probability <= 1:
+            raise ValueError("Transmit probability must be in (0, 1]")
+        self.probability = float(probability)
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def max_age(self):
+        if self.probability >= 1:
+            return 1
+        # A transmitter is silent for this many ticks with less than 5% probability
+        return max(1, int(math.ceil(math.log(0.05) / math.log1p(-self.probability))))
+
+    def firing(self, tick, robot_ids, tx_index, tx_count):
+        return self.rng.random(len(robot_ids)) < self.probability
+
+
+def make_schedule(name, **kwargs):
+    """Create a schedule by name, see SCHEDULES"""
+    classes = {schedule.name: schedule for schedule in
+               (ContinuousSchedule, RoundRobinSchedule, TDMASchedule, RandomAccessSchedule)}
+    if name not in classes:
+        raise ValueError(f"Unknown schedule '{name}', expected one of {', '.join(SCHEDULES)}")
+    return classes[name](**kwargs)
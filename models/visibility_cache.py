@@ -0,0 +1,147 @@
+"""Memoized line of sight through static obstacle maps
+
+With a static map, whether two points see each other only depends on the
+two positions. VisibilityCache quantizes both end points to a grid of
+cell_size meters and remembers the result of the static-map query in an
+LRU dictionary, so a sensor pair that does not move is only ray-traced
+once. Dynamic robot occlusion is not cached and is still checked every
+tick by the caller.
+
+The cache can be stored on disk. Files are named after a fingerprint of
+the map geometry, so a later run on the same map picks up the entries of
+the previous one and a changed map starts from an empty cache.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ir_robot_simulation')
+
+
+class VisibilityCache:
+    """LRU cache of static line-of-sight results between quantized points"""
+
+    def __init__(self, cell_size=0.01, max_entries=500000, cache_dir=None):
+        """
+        Args:
+            cell_size: Quantization step of sensor positions (m)
+            max_entries: Entries kept before the least recently used are evicted
+            cache_dir: Directory for persisted caches, None to keep it in memory only
+        """
+        if cell_size <= 0:
+            raise ValueError("Cache cell size must be positive")
+        self.cell_size = float(cell_size)
+        self.max_entries = int(max_entries)
+        self.cache_dir = cache_dir
+        self.maps = []
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._map_state = None
+        self.fingerprint = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def attach(self, maps):
+        """Use these static maps; clears the cache if they changed since the last call"""
+        state = tuple((id(static_map), static_map.version) for static_map in maps)
+        if state == self._map_state:
+            return
+        if self._map_state is not None:
+            self.save()
+        self.maps = list(maps)
+        self._map_state = state
+        self._entries.clear()
+        self.hits = self.misses = 0
+        self.fingerprint = _fingerprint(self.maps, self.cell_size)
+        self.load()
+
+    def clear(self):
+        """Forget all cached results"""
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def line_of_sight(self, p1, p2, scale=1.0):
+        """Static line of sight between two points in simulation units"""
+        if not self.maps:
+            return True
+
+        # Quantize in the frame of the first map so panning keeps the keys valid
+        reference = self.maps[0]
+        step = scale * self.cell_size
+        ox, oy = reference.origin_x * scale, reference.origin_y * scale
+        a = (round((p1[0] - ox) / step), round((p1[1] - oy) / step))
+        b = (round((p2[0] - ox) / step), round((p2[1] - oy) / step))
+        key = a + b if a <= b else b + a  # Line of sight is symmetric
+
+        entries = self._entries
+        visible = entries.get(key)
+        if visible is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return visible
+
+        self.misses += 1
+        visible = all(static_map.line_of_sight(p1, p2, scale) for static_map in self.maps)
+        entries[key] = visible
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return visible
+
+    def path(self):
+        """File the cache of the current maps is stored in, or None"""
+        if self.cache_dir is None or self.fingerprint is None:
+            return None
+        return os.path.join(self.cache_dir, f"visibility-{self.fingerprint}.npz")
+
+    def save(self):
+        """Write the cache to cache_dir, returns the file name (None if not persisted)"""
+        filename = self.path()
+        if filename is None or not self._entries:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Oldest first, so that loading restores the LRU order
+        keys = np.array(list(self._entries.keys()), dtype=np.int32).reshape(-1, 4)
+        values = np.fromiter(self._entries.values(), dtype=bool, count=len(self._entries))
+        temp_name = filename + '.tmp'
+        with open(temp_name, 'wb') as f:
+            np.savez_compressed(f, keys=keys, values=values, cell_size=self.cell_size)
+        os.replace(temp_name, filename)
+        return filename
+
+    def load(self):
+        """Read a previously saved cache of the current maps, returns the number of entries"""
+        filename = self.path()
+        if filename is None or not os.path.exists(filename):
+            return 0
+        try:
+            with np.load(filename) as data:
+                if float(data['cell_size']) != self.cell_size:
+                    return 0
+                keys = data['keys'][-self.max_entries:].tolist()
+                values = data['values'][-self.max_entries:].tolist()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable visibility cache {filename}: {e}")
+            return 0
+        self._entries.update(zip(map(tuple, keys), values))
+        return len(keys)
+
+
+def _fingerprint(maps, cell_size):
+    """Hash of the map geometry, relative placement and quantization step"""
+    digest = hashlib.sha1()
+    digest.update(repr(cell_size).encode())
+    reference = maps[0] if maps else None
+    for static_map in maps:
+        digest.update(type(static_map).__name__.encode())
+        offset = (round(static_map.origin_x - reference.origin_x, 9),
+                  round(static_map.origin_y - reference.origin_y, 9))
+        digest.update(repr(offset).encode())
+        if hasattr(static_map, 'segments'):
+            digest.update(static_map.segments().tobytes())
+        if hasattr(static_map, 'occupied'):
+            digest.update(repr((static_map.resolution, static_map.occupied.shape)).encode())
+            digest.update(np.packbits(static_map.occupied).tobytes())
+    return digest.hexdigest()[:16]
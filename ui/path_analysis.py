@@ -0,0 +1,313 @@
+import base64
+import io
+import queue
+import threading
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import tkinter as tk
+from tkinter import ttk
+from utils.data_export import path_summary, waypoint_timings
+
+
+class EvaluationReport:
+    """Statistics and rendered charts of one path run
+
+    Built entirely from a PathRunSnapshot, so it can be produced in a worker
+    thread. Charts are rendered to PNG bytes with the Agg backend; the Tk
+    thread only has to decode the images.
+    """
+
+    def __init__(self, snapshot):
+        self.leader_id = snapshot.leader_id
+        self.summary = path_summary(snapshot)
+        self.waypoints = waypoint_timings(snapshot)
+        self.charts = {
+            'path': _render_png(_path_figure(snapshot)),
+            'speed_rotation': _render_png(_speed_rotation_figure(snapshot)),
+            'error': _render_png(_error_figure(snapshot)),
+        }
+
+
+def build_report_async(path_manager, callback_queue):
+    """Snapshot the run and build its report in a background thread
+
+    The finished EvaluationReport (or the exception that stopped it) is put
+    into callback_queue for the Tk thread to pick up.
+    """
+    snapshot = path_manager.snapshot()
+
+    def worker():
+        try:
+            callback_queue.put(EvaluationReport(snapshot))
+        except Exception as e:
+            callback_queue.put(e)
+
+    thread = threading.Thread(target=worker, name="evaluation-report", daemon=True)
+    thread.start()
+    return thread
+
+
+class PathEvaluationWindow(tk.Toplevel):
+    """Window with statistics and charts of a completed path run
+
+    Kept apart from models.path_manager so that matplotlib is only imported
+    when an evaluation window is actually opened. The report is computed in
+    a worker thread; the window polls for it and fills in its tabs when done.
+    """
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, path_manager, master=None):
+        super().__init__(master)
+        self.path_manager = path_manager
+        self._images = []  # Keep PhotoImage references alive
+        self._poll_id = None
+
+        self.title(f"Movement result evaluation - Robot {path_manager.leader_id}")
+        self.geometry("800x600")
+
+        # Add handler for window close event
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.status_label = ttk.Label(self, text="Building evaluation report...")
+        self.status_label.pack(expand=True)
+
+        # Start computing the report and check for it periodically
+        self._results = queue.Queue()
+        build_report_async(path_manager, self._results)
+        self._poll_id = self.after(self.POLL_INTERVAL_MS, self._poll_report)
+
+    def on_close(self):
+        """Forget the window in the path manager and close it"""
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+        if getattr(self.path_manager, 'eval_window', None) is self:
+            del self.path_manager.eval_window
+        self.destroy()
+
+    def _poll_report(self):
+        """Wait for the worker thread without blocking the Tk event loop"""
+        try:
+            result = self._results.get_nowait()
+        except queue.Empty:
+            self._poll_id = self.after(self.POLL_INTERVAL_MS, self._poll_report)
+            return
+
+        self._poll_id = None
+        if isinstance(result, Exception):
+            self.status_label.config(text=f"Error building evaluation report: {result}")
+            print(f"Evaluation report error: {result}")
+            return
+
+        self.status_label.destroy()
+        self._show_report(result)
+
+    def _show_report(self, report):
+        """Create the tabs of a finished report"""
+        # Create notebook (tabbed interface)
+        notebook = ttk.Notebook(self)
+        notebook.pack(fill='both', expand=True, padx=10, pady=10)
+
+        # Overview tab
+        overview_tab = ttk.Frame(notebook)
+        notebook.add(overview_tab, text="Overview")
+
+        summary = report.summary
+        stats_frame = ttk.LabelFrame(overview_tab, text="Movement statistics")
+        stats_frame.pack(fill='x', expand=False, padx=10, pady=10)
+
+        ttk.Label(stats_frame, text=f"Total time: {summary['total_time']:.2f} seconds").grid(row=0, column=0, sticky='w', padx=10, pady=5)
+        ttk.Label(stats_frame, text=f"Distance traveled: {summary['total_distance']:.2f} meters").grid(row=1, column=0, sticky='w', padx=10, pady=5)
+        ttk.Label(stats_frame, text=f"Average speed: {summary['average_speed']:.4f} m/s").grid(row=2, column=0, sticky='w', padx=10, pady=5)
+        ttk.Label(stats_frame, text=f"Total angle rotated: {summary['total_rotation']:.1f}°").grid(row=0, column=1, sticky='w', padx=10, pady=5)
+        ttk.Label(stats_frame, text=f"Number of rotations: {summary['rotation_steps']}").grid(row=1, column=1, sticky='w', padx=10, pady=5)
+        ttk.Label(stats_frame, text=f"Maximum deviation: {summary['max_deviation']:.3f} meters").grid(row=2, column=1, sticky='w', padx=10, pady=5)
+
+        # Draw robot path vs waypoints
+        self._add_chart(overview_tab, report.charts['path'])
+
+        # Speed & Rotation tab
+        speed_tab = ttk.Frame(notebook)
+        notebook.add(speed_tab, text="Speed & Rotation")
+        self._add_chart(speed_tab, report.charts['speed_rotation'])
+
+        # Error tab
+        error_tab = ttk.Frame(notebook)
+        notebook.add(error_tab, text="Error")
+        self._add_chart(error_tab, report.charts['error'])
+
+        # Waypoint analysis tab
+        waypoint_tab = ttk.Frame(notebook)
+        notebook.add(waypoint_tab, text="Waypoint analysis")
+        self._create_waypoint_analysis(waypoint_tab, report.waypoints)
+
+        # Export data button
+        export_button = ttk.Button(self, text="Export data", command=self.path_manager._export_data)
+        export_button.pack(side='right', padx=10, pady=10)
+
+    def _add_chart(self, parent, png_bytes):
+        """Place a pre-rendered chart in a frame"""
+        plot_frame = ttk.Frame(parent)
+        plot_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        image = tk.PhotoImage(master=self, data=base64.b64encode(png_bytes))
+        self._images.append(image)
+        ttk.Label(plot_frame, image=image).pack(fill='both', expand=True)
+
+    def _create_waypoint_analysis(self, parent, waypoints):
+        """Show time to reach each waypoint and accuracy"""
+        # waypoints rows: (waypoint, reached_time, time_to_reach, x, y, error)
+        waypoint_times = waypoints[:, 2]
+        waypoint_distances = waypoints[:, 5]
+
+        # Create waypoint information table
+        tree_frame = ttk.Frame(parent)
+        tree_frame.pack(fill='both', expand=True, padx=10, pady=10)
+
+        columns = ('waypoint', 'time', 'distance')
+        tree = ttk.Treeview(tree_frame, columns=columns, show='headings')
+
+        tree.heading('waypoint', text='Waypoint')
+        tree.heading('time', text='Time to reach (s)')
+        tree.heading('distance', text='Deviation (m)')
+
+        tree.column('waypoint', width=80)
+        tree.column('time', width=150)
+        tree.column('distance', width=150)
+
+        # Add data to table
+        for i in range(len(waypoints)):
+            tree.insert('', 'end', values=(
+                f'Point {i+1}',
+                f'{waypoint_times[i]:.2f}',
+                f'{waypoint_distances[i]:.3f}'
+            ))
+
+        # General information
+        if len(waypoint_times):
+            tree.insert('', 'end', values=('Average', f'{waypoint_times.mean():.2f}', ''))
+            tree.insert('', 'end', values=('Maximum', f'{waypoint_times.max():.2f}', ''))
+            tree.insert('', 'end', values=('Minimum', f'{waypoint_times.min():.2f}', ''))
+
+        tree.pack(fill='both', expand=True)
+
+        # Scroll bar
+        scrollbar = ttk.Scrollbar(tree_frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+
+
+def _render_png(fig):
+    """Render a figure with the Agg backend (thread-safe, no pyplot state)"""
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def _error_text(ax, error, fontsize=10):
+    """Display error message instead of chart"""
+    ax.text(0.5, 0.5, f"Error drawing chart: {str(error)}",
+            horizontalalignment='center', verticalalignment='center',
+            transform=ax.transAxes, fontsize=fontsize, color='red')
+    ax.axis('off')
+    print(f"Chart drawing error: {error}")
+
+
+def _path_figure(snapshot):
+    """Draw robot path vs waypoints"""
+    fig = Figure(figsize=(7.6, 3.6))
+    ax = fig.add_subplot()
+    max_y = snapshot.max_y
+
+    try:
+        # Draw actual robot path
+        if len(snapshot.telemetry):
+            xs, ys = snapshot.telemetry.columns_view('x', 'y')
+
+            # Convert Y coordinates to match Cartesian coordinate system (invert Y axis)
+            ax.plot(xs, max_y - ys, 'b-', label='Actual path')
+
+        # Draw waypoints
+        if snapshot.waypoints:
+            waypoints = np.array(snapshot.waypoints, dtype=np.float64)
+            waypoints[:, 1] = max_y - waypoints[:, 1]  # Invert Y axis
+
+            ax.plot(waypoints[:, 0], waypoints[:, 1], 'r--', label='Ideal path')
+            ax.scatter(waypoints[:, 0], waypoints[:, 1], color='red', zorder=5, label='Waypoints')
+
+            # Add sequence number labels for waypoints
+            for i, (x, y) in enumerate(waypoints):
+                ax.annotate(f"{i+1}", (x, y), fontsize=10, ha='right')
+
+        ax.set_title('Robot path')
+        ax.set_xlabel('X (pixel)')
+        ax.set_ylabel('Y (pixel)')
+        ax.legend()
+        ax.grid(True)
+
+        # Ensure X and Y axis scales are equal
+        ax.set_aspect('equal', 'box')
+    except Exception as e:
+        _error_text(ax, e, fontsize=12)
+
+    return fig
+
+
+def _speed_rotation_figure(snapshot):
+    """Draw speed and rotation angle charts over time"""
+    fig = Figure(figsize=(7.6, 4.6), layout='tight')
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
+
+    try:
+        # Telemetry columns are always aligned, so no trimming is needed
+        if not len(snapshot.telemetry):
+            raise ValueError("No time data")
+        times, speeds, rotations = snapshot.telemetry.columns_view('timestamp', 'speed', 'rotation')
+
+        ax1.plot(times, speeds, 'g-')
+        ax1.set_title('Speed over time')
+        ax1.set_ylabel('Speed (m/s)')
+        ax1.grid(True)
+
+        ax2.plot(times, rotations, 'm-')
+        ax2.set_title('Rotation angle over time')
+        ax2.set_xlabel('Time (s)')
+        ax2.set_ylabel('Rotation angle (degrees)')
+        ax2.grid(True)
+    except Exception as e:
+        for ax in (ax1, ax2):
+            _error_text(ax, e)
+
+    return fig
+
+
+def _error_figure(snapshot):
+    """Draw error charts (distance to waypoint, angle error)"""
+    fig = Figure(figsize=(7.6, 4.6), layout='tight')
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
+
+    # Get all data arrays (aligned views, no copies)
+    times, distances, target_angles, orientations = snapshot.telemetry.columns_view(
+        'timestamp', 'distance_to_waypoint', 'target_angle', 'orientation')
+
+    # Convert from pixels to meters
+    distances_m = np.round(distances / snapshot.scale, 2)
+    ax1.plot(times, distances_m, 'b-')
+    ax1.set_title('Distance to waypoint')
+    ax1.set_ylabel('Distance (m)')
+    ax1.grid(True)
+
+    # Calculate angle error (NaN on ticks without a target angle leaves a gap)
+    angle_errors = np.abs(target_angles - orientations) % 360
+    angle_errors = np.minimum(angle_errors, 360 - angle_errors)
+
+    ax2.plot(times, angle_errors, 'r-')
+    ax2.set_title('Angle error over time')
+    ax2.set_xlabel('Time (s)')
+    ax2.set_ylabel('Angle error (degrees)')
+    ax2.grid(True)
+
+    return fig
@@ -1,7 +1,8 @@
 import math
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, filedialog, simpledialog
 import tkinter.messagebox as msgbox
+from models.ir_sensor import apply_sensor_config
 
 class RobotControlPanel(tk.Frame):
     def __init__(self, parent, simulation, canvas):
@@ -183,6 +184,7 @@ class RobotControlPanel(tk.Frame):
         # self._build_remove_robot_controls()  # Already built directly in __init__
         # self._build_simulation_controls()    # Already built directly in __init__
         self._build_path_controls()           # Keep path drawing part
+        self._build_scenario_controls()
         # self._build_sensor_controls()        # Already built directly in __init__
     
         # Update robot list
@@ -202,55 +204,12 @@ class RobotControlPanel(tk.Frame):
             # Convert from meters to pixels
             x_pixel, y_pixel = self.simulation.real_to_pixel(x_m, y_m)
             
-            # Create new robot at the converted position
-            robot = self.simulation.add_robot(x_pixel, y_pixel)
+            # Create new robot at the converted position, with the current sensor parameters
+            self.simulation.add_robots([(x_pixel, y_pixel, 0)], self.sensor_config())
             
             # Update robot list
             self.update_robot_list()
             
-            # Apply current sensor parameters to new robot
-            angle = self.beam_angle_var.get()
-            viewing_angle = self.viewing_angle_var.get()  # Get viewing angle from slider
-            real_distance = self.beam_distance_var.get()
-            pixel_distance = self.simulation.real_distance_to_pixel(real_distance)
-            
-            # Apply parameters to all transmitters of new robot
-            for transmitter in robot.transmitters:
-                # Save real distance
-                transmitter.real_beam_distance = real_distance
-                # Apply pixel parameters
-                transmitter.set_beam_parameters(angle, pixel_distance, self.simulation)
-
-            # In add_robot() method, after applying angle and distance parameters:
-            offset_angle = self.beam_offset_var.get()  # Get current offset angle
-            # Apply offset angle to transmitters - synchronize with robot.py
-            for transmitter in robot.transmitters:        
-                if transmitter.side == 0:  # top
-                    if transmitter.position_index == 0:
-                        transmitter.beam_direction_offset = -offset_angle        
-                    else:
-                        transmitter.beam_direction_offset = +offset_angle
-                elif transmitter.side == 1:  # right
-                    if transmitter.position_index == 0:
-                        transmitter.beam_direction_offset = -offset_angle
-                    else:
-                        transmitter.beam_direction_offset = +offset_angle
-                elif transmitter.side == 2:  # bottom
-                    if transmitter.position_index == 0:
-                        transmitter.beam_direction_offset = +offset_angle
-                    else:
-                        transmitter.beam_direction_offset = -offset_angle
-                elif transmitter.side == 3:  # left
-                    if transmitter.position_index == 0:
-                        transmitter.beam_direction_offset = +offset_angle
-                    else:
-                        transmitter.beam_direction_offset = -offset_angle
-            
-            # Apply to receivers
-            for receiver in robot.receivers:
-                receiver.real_max_distance = real_distance
-                receiver.set_receiver_parameters(viewing_angle, pixel_distance, self.simulation)
-            
             # Update canvas
             self.canvas.update_canvas()
             
@@ -269,7 +228,8 @@ class RobotControlPanel(tk.Frame):
     
     def update_robot_list(self):
         """Update robot list in combobox"""
-        robot_list = [f"Robot {robot.id}" for robot in self.simulation.robots]
+        # Removals reorder simulation.robots, list the robots by id
+        robot_list = [f"Robot {robot.id}" for robot in sorted(self.simulation.robots, key=lambda robot: robot.id)]
         
         # Update robot selection combobox
         self.robot_combobox['values'] = robot_list
@@ -296,49 +256,19 @@ class RobotControlPanel(tk.Frame):
         self.canvas.update_canvas()
         self.update_robot_list()
     
+    def sensor_config(self):
+        """Sensor parameters of the sliders, as accepted by Simulation.add_robots"""
+        return {'beam_angle': self.beam_angle_var.get(),
+                'beam_distance': self.beam_distance_var.get(),
+                'beam_offset': self.beam_offset_var.get(),
+                'viewing_angle': self.viewing_angle_var.get()}
+
     def apply_sensor_params(self):
         """Apply sensor parameters to all robots"""
-        angle = self.beam_angle_var.get()
-        real_distance = self.beam_distance_var.get()
-        pixel_distance = self.simulation.real_distance_to_pixel(real_distance)
-        offset_angle = self.beam_offset_var.get()
-        viewing_angle = self.viewing_angle_var.get()
-        print(f"Applying parameters: beam angle={angle}°, viewing angle={viewing_angle}°, distance={real_distance}m, offset angle={offset_angle}°")
-        
-        for robot in self.simulation.robots:
-            # Apply to transmitters
-            for transmitter in robot.transmitters:    
-                # Save real distance
-                transmitter.real_beam_distance = real_distance
-                # Apply angle and distance parameters
-                transmitter.set_beam_parameters(angle, pixel_distance, self.simulation)
-                
-                # Fix offset angle application for synchronization
-                if transmitter.side == 0:  # top
-                    if transmitter.position_index == 0:  # left
-                        transmitter.beam_direction_offset = -offset_angle
-                    else:  # right (position_index == 1)
-                        transmitter.beam_direction_offset = +offset_angle
-                elif transmitter.side == 1:  # right
-                    if transmitter.position_index == 0:  # top
-                        transmitter.beam_direction_offset = -offset_angle
-                    else:  # bottom (position_index == 1)
-                        transmitter.beam_direction_offset = +offset_angle
-                elif transmitter.side == 2:  # bottom
-                    if transmitter.position_index == 0:  # left
-                        transmitter.beam_direction_offset = +offset_angle
-                    else:  # right (position_index == 1)
-                        transmitter.beam_direction_offset = -offset_angle
-                elif transmitter.side == 3:  # left
-                    if transmitter.position_index == 0:  # top
-                        transmitter.beam_direction_offset = offset_angle
-                    else:  # bottom (position_index == 1)
-                        transmitter.beam_direction_offset = -offset_angle
-            
-            # Add application for receivers - use viewing angle from slider
-            for receiver in robot.receivers:
-                receiver.real_max_distance = real_distance
-                receiver.set_receiver_parameters(viewing_angle, pixel_distance, self.simulation)
+        config = self.sensor_config()
+        print(f"Applying parameters: beam angle={config['beam_angle']}°, viewing angle={config['viewing_angle']}°, "
+              f"distance={config['beam_distance']}m, offset angle={config['beam_offset']}°")
+        apply_sensor_config(self.simulation.robots, config, self.simulation.scale)
     
     def toggle_beams(self):
         """Toggle IR beam display"""
@@ -403,7 +333,7 @@ class RobotControlPanel(tk.Frame):
                             yscrollcommand=scrollbar.set)
         robot_list.pack(fill=tk.BOTH, expand=True)
         scrollbar.config(command=robot_list.yview)
-        for robot in self.simulation.robots:
+        for robot in sorted(self.simulation.robots, key=lambda robot: robot.id):
             robot_list.insert(tk.END, f"Robot {robot.id}")
         btn_frame = tk.Frame(dialog)
         btn_frame.pack(fill=tk.X, pady=10)
@@ -478,6 +408,146 @@ class RobotControlPanel(tk.Frame):
         button_frame.grid_columnconfigure(0, weight=1)
         button_frame.grid_columnconfigure(1, weight=1)
 
+    def _build_scenario_controls(self):
+        """Create buttons for loading and saving scenario files"""
+        scenario_frame = tk.LabelFrame(self.scrollable_frame, text="Scenario", padx=5, pady=5, bg='#f0f0f0')
+        scenario_frame.pack(fill=tk.X, pady=5)
+
+        self.load_scenario_btn = tk.Button(scenario_frame, text="Load Scenario", command=self._load_scenario)
+        self.load_scenario_btn.pack(fill=tk.X, pady=2)
+
+        self.save_scenario_btn = tk.Button(scenario_frame, text="Save Scenario", command=self._save_scenario)
+        self.save_scenario_btn.pack(fill=tk.X, pady=2)
+
+        self.load_map_btn = tk.Button(scenario_frame, text="Load Map Image", command=self._load_map_image)
+        self.load_map_btn.pack(fill=tk.X, pady=2)
+
+        self.visibility_cache_var = tk.BooleanVar(value=False)
+        self.visibility_cache_check = tk.Checkbutton(scenario_frame, text="Cache Static Visibility",
+                                                     variable=self.visibility_cache_var,
+                                                     command=self._toggle_visibility_cache,
+                                                     bg='#f0f0f0')
+        self.visibility_cache_check.pack(anchor='w')
+
+        reflection_frame = tk.Frame(scenario_frame, bg='#f0f0f0')
+        reflection_frame.pack(fill=tk.X, pady=2)
+        tk.Label(reflection_frame, text="Wall Reflections:", bg='#f0f0f0').pack(side=tk.LEFT)
+        self.reflection_order_var = tk.IntVar(value=self.simulation.link_engine.reflection_order)
+        self.reflection_order_spin = tk.Spinbox(reflection_frame, from_=0, to=3, width=4,
+                                                textvariable=self.reflection_order_var,
+                                                command=self._set_reflection_order)
+        self.reflection_order_spin.pack(side=tk.LEFT, padx=5)
+
+        from models.tx_schedule import SCHEDULES
+        schedule_frame = tk.Frame(scenario_frame, bg='#f0f0f0')
+        schedule_frame.pack(fill=tk.X, pady=2)
+        tk.Label(schedule_frame, text="Transmit Schedule:", bg='#f0f0f0').pack(side=tk.LEFT)
+        self.schedule_var = tk.StringVar(value=self.simulation.schedule.name)
+        self.schedule_menu = tk.OptionMenu(schedule_frame, self.schedule_var, *SCHEDULES,
+                                           command=self._set_schedule)
+        self.schedule_menu.pack(side=tk.LEFT, padx=5)
+
+        from models.signal_history import FILTERS
+        filter_frame = tk.Frame(scenario_frame, bg='#f0f0f0')
+        filter_frame.pack(fill=tk.X, pady=2)
+        tk.Label(filter_frame, text="Signal Filter:", bg='#f0f0f0').pack(side=tk.LEFT)
+        self.signal_filter_var = tk.StringVar(value=self.simulation.signal_history.filter_name)
+        self.signal_filter_menu = tk.OptionMenu(filter_frame, self.signal_filter_var, *FILTERS,
+                                                command=self._set_signal_filter)
+        self.signal_filter_menu.pack(side=tk.LEFT, padx=5)
+
+        self.formation_tracker_var = tk.BooleanVar(value=False)
+        self.formation_tracker_check = tk.Checkbutton(scenario_frame, text="Formation from Tracked Estimates",
+                                                      variable=self.formation_tracker_var,
+                                                      command=self._toggle_formation_tracker,
+                                                      bg='#f0f0f0')
+        self.formation_tracker_check.pack(anchor='w')
+
+    def _load_scenario(self):
+        """Load robots, sensors and path from a scenario file"""
+        filename = filedialog.askopenfilename(
+            filetypes=[("Scenario files", "*.json *.toml"), ("JSON files", "*.json"),
+                       ("TOML files", "*.toml"), ("All files", "*.*")],
+            title="Load scenario")
+        if not filename:
+            return
+
+        from models.scenario import load_scenario
+        try:
+            scenario = load_scenario(filename)
+            self.canvas.load_scenario(scenario)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading scenario: {e}")
+            msgbox.showerror("Load scenario", f"Could not load scenario:\n{e}")
+            return
+
+        self.update_robot_list()
+        if self.canvas.path_manager.leader_id is not None:
+            self.path_leader_var.set(f"Robot {self.canvas.path_manager.leader_id}")
+
+    def _load_map_image(self):
+        """Load a floor plan image as occupancy grid"""
+        filename = filedialog.askopenfilename(
+            filetypes=[("Images", "*.png *.bmp *.gif *.jpg *.jpeg"), ("All files", "*.*")],
+            title="Load map image")
+        if not filename:
+            return
+
+        resolution = simpledialog.askfloat("Map resolution", "Meters per pixel:",
+                                           initialvalue=0.02, minvalue=0.001, parent=self)
+        if not resolution:
+            return
+
+        try:
+            grid = self.simulation.load_map_image(filename, resolution)
+        except (OSError, ValueError) as e:
+            print(f"Error loading map image: {e}")
+            msgbox.showerror("Load map image", f"Could not load map image:\n{e}")
+            return
+
+        rows, cols = grid.shape
+        print(f"Loaded {cols}x{rows} map ({grid.width:.2f}m x {grid.height:.2f}m)")
+        self.canvas.update_canvas()
+
+    def _toggle_visibility_cache(self):
+        """Enable or disable memoized line of sight through static obstacles"""
+        self.simulation.enable_visibility_cache(self.visibility_cache_var.get())
+
+    def _set_reflection_order(self):
+        """Set how many wall bounces reflected IR paths may have"""
+        try:
+            self.simulation.set_reflection_order(self.reflection_order_var.get())
+        except (tk.TclError, ValueError) as e:
+            print(f"Invalid reflection order: {e}")
+
+    def _set_schedule(self, name):
+        """Choose which transmitters fire in each simulation tick"""
+        self.simulation.set_schedule(name)
+
+    def _set_signal_filter(self, name):
+        """Choose how received strengths are smoothed before RPA"""
+        self.simulation.set_signal_filter(name)
+
+    def _toggle_formation_tracker(self):
+        """Let formation followers move on their EKF estimates instead of global coordinates"""
+        self.canvas.formation_use_tracker = self.formation_tracker_var.get()
+
+    def _save_scenario(self):
+        """Save the current robots, sensors and path as a scenario file"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            title="Save scenario")
+        if not filename:
+            return
+
+        from models.scenario import save_scenario, scenario_from_simulation
+        try:
+            save_scenario(scenario_from_simulation(self.simulation, self.canvas.path_manager), filename)
+            print(f"Scenario saved to {filename}")
+        except (OSError, ValueError) as e:
+            print(f"Error saving scenario: {e}")
+
     def _start_drawing(self):
         """Start drawing path"""
         self.canvas.start_drawing_path()
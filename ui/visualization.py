@@ -97,6 +97,9 @@ class SimulationCanvas(tk.Canvas):
         # Draw coordinate grid
         self._draw_grid()
         
+        # Draw static obstacles
+        self._draw_obstacles()
+        
         # Redraw path if exists
         if current_waypoints:
             self._draw_path(current_waypoints)
@@ -146,7 +149,15 @@ class SimulationCanvas(tk.Canvas):
         self._handle_leader_obstacle_avoidance(leader, follower_robots)
         
         # Desired distance between robots in formation
-        desired_distance = leader.size * 4.0  # Increased from 2.5 to 4.0 times robot size
+        if getattr(self, 'formation_spacing', None):
+            # Spacing given by a loaded scenario (m)
+            desired_distance = self.simulation.real_distance_to_pixel(self.formation_spacing)
+        else:
+            desired_distance = leader.size * 4.0  # Increased from 2.5 to 4.0 times robot size
+        
+        # Measure the robot ahead of every follower and update their trackers in one batch
+        targets = self._track_formation_targets()
+        use_tracker = getattr(self, 'formation_use_tracker', False)
         
         # Update position of each robot in formation
         for i in range(1, len(self.formation_order)):
@@ -157,24 +168,32 @@ class SimulationCanvas(tk.Canvas):
             print(f"Updating robot {current_robot.id} following robot {robot_ahead.id}")
             
             # === USE RPA TO DETERMINE RELATIVE POSITION ===
-            rpa_result = current_robot.calculate_relative_position_rpa(robot_ahead.id)
-            
-            if rpa_result is None:
-                # If no IR signal detected, don't move
-                print(f"Robot {current_robot.id} cannot detect signal from robot {robot_ahead.id}")
-                continue
+            rpa_result, tracked = targets[current_robot.id]
             
-            # Get results from RPA - (bearing_angle, distance, confidence) to know if visible
-            relative_angle, distance_m, confidence = rpa_result
-            
-            # Debug RPA info
-            print(f"RPA: Robot {current_robot.id} detects robot {robot_ahead.id} at angle {relative_angle:.1f}°, distance {distance_m:.2f}m, confidence {confidence:.2f}")
-            
-            # === USE GLOBAL COORDINATES FOR MOVEMENT ===
+            if use_tracker:
+                # Move on the filtered relative estimate alone, which also bridges short signal gaps
+                if tracked is None:
+                    print(f"Robot {current_robot.id} has no estimate of robot {robot_ahead.id}")
+                    continue
+                dx, dy = tracked
+            else:
+                if rpa_result is None:
+                    # If no IR signal detected, don't move
+                    print(f"Robot {current_robot.id} cannot detect signal from robot {robot_ahead.id}")
+                    continue
+                
+                # Get results from RPA - (bearing_angle, distance, confidence) to know if visible
+                relative_angle, distance_m, confidence = rpa_result
+                
+                # Debug RPA info
+                print(f"RPA: Robot {current_robot.id} detects robot {robot_ahead.id} at angle {relative_angle:.1f}°, distance {distance_m:.2f}m, confidence {confidence:.2f}")
+                
+                # === USE GLOBAL COORDINATES FOR MOVEMENT ===
+                
+                # Calculate distance and direction based on absolute coordinates
+                dx = robot_ahead.x - current_robot.x
+                dy = robot_ahead.y - current_robot.y
             
-            # Calculate distance and direction based on absolute coordinates
-            dx = robot_ahead.x - current_robot.x
-            dy = robot_ahead.y - current_robot.y
             global_distance = math.sqrt(dx*dx + dy*dy)  # Distance in pixels
             global_angle = math.degrees(math.atan2(dy, dx)) % 360  # Absolute angle
             
@@ -212,7 +231,7 @@ class SimulationCanvas(tk.Canvas):
                     print(f"Robot {current_robot.id} backing away from Robot {robot_ahead.id}: {move_distance:.2f}px")
                 
                 # Move the robot
-                current_robot.move(move_x, move_y)
+                current_robot.drive(move_x, move_y)
             
             # Set direction for robot - point toward robot ahead
             current_angle = current_robot.orientation % 360
@@ -243,6 +262,55 @@ class SimulationCanvas(tk.Canvas):
                 desired_distance_px
             )
 
+    def _track_formation_targets(self):
+        """Measure the robot ahead of each follower and step the relative tracker
+
+        Range comes from the receivers' distance estimates, bearing from RPA
+        (turned to global axes with the follower's own heading) and motion
+        from the follower's odometry since the previous call. All followers
+        are predicted and updated together.
+
+        Returns:
+            dict: follower id -> (RPA result or None, tracked (dx, dy) in pixels or None)
+        """
+        scale = self.simulation.scale
+        if not hasattr(self, 'formation_odometry'):
+            self.formation_odometry = {}
+        
+        keys, odometry, ranges, bearings, confidence = [], [], [], [], []
+        rpa_results = {}
+        for i in range(1, len(self.formation_order)):
+            follower = self.formation_order[i]
+            robot_ahead = self.formation_order[i-1]
+            rpa_result = follower.calculate_relative_position_rpa(robot_ahead.id)
+            rpa_results[follower.id] = rpa_result
+            
+            last_x, last_y = self.formation_odometry.get(follower.id, (follower.x, follower.y))
+            odometry.append(((follower.x - last_x) / scale, (follower.y - last_y) / scale))
+            self.formation_odometry[follower.id] = (follower.x, follower.y)
+            
+            range_m = follower.estimate_range_to(robot_ahead.id) if rpa_result else None
+            if range_m is None:
+                ranges.append(math.nan)
+                bearings.append(math.nan)
+                confidence.append(0.0)
+            else:
+                bearing, _, rpa_confidence = rpa_result
+                ranges.append(range_m)
+                bearings.append(bearing + follower.orientation)
+                confidence.append(rpa_confidence)
+            keys.append((follower.id, robot_ahead.id))
+        
+        tracker = self.simulation.relative_tracker
+        tracker.step(keys, odometry, ranges, bearings, confidence)
+        
+        targets = {}
+        for follower_id, ahead_id in keys:
+            estimate = tracker.estimate(follower_id, ahead_id)
+            tracked = None if estimate is None else (estimate[0] * scale, estimate[1] * scale)
+            targets[follower_id] = (rpa_results[follower_id], tracked)
+        return targets
+
     def _handle_leader_obstacle_avoidance(self, leader, follower_robots):
         """Handle obstacle avoidance for the leader robot - improved version for smoother motion
         and proper alignment of robot's heading with movement direction"""
@@ -440,7 +508,7 @@ class SimulationCanvas(tk.Canvas):
             self.current_speed = max(target_speed, self.current_speed - speed_change_rate)
         
         # --- STEP 7: Move the robot with final vector and speed ---
-        leader.move(final_vector[0] * self.current_speed, final_vector[1] * self.current_speed)
+        leader.drive(final_vector[0] * self.current_speed, final_vector[1] * self.current_speed)
         
         # --- STEP 8: Smooth rotation towards movement direction ---
         # Calculate angle for robot orientation based on ACTUAL movement direction
@@ -512,6 +580,29 @@ class SimulationCanvas(tk.Canvas):
         # env_height = int(self.simulation.real_height * self.simulation.scale)
         # self.create_rectangle(0, 0, env_width, env_height, outline="blue", width=2)
 
+    def _draw_obstacles(self):
+        """Draw the occupancy grid and static walls, boxes and polygons"""
+        grid = self.simulation.occupancy_grid
+        if grid:
+            scale = self.simulation.scale
+            # Rescale the grid image only when the grid or the zoom changed
+            key = (id(grid), round(grid.resolution * scale, 3))
+            if getattr(self, '_grid_image_key', None) != key:
+                from PIL import Image, ImageTk
+                size = (max(1, round(grid.width * scale)), max(1, round(grid.height * scale)))
+                image = Image.fromarray(grid.to_rgba()).resize(size, Image.NEAREST)
+                self._grid_image = ImageTk.PhotoImage(image)
+                self._grid_image_key = key
+            self.create_image(grid.origin_x * scale, grid.origin_y * scale,
+                              image=self._grid_image, anchor=tk.NW, tags='obstacle')
+
+        for kind, points in self.simulation.obstacles.shape_points(self.simulation.scale):
+            flat = [coord for point in points for coord in point]
+            if kind == 'wall':
+                self.create_line(*flat, fill='#555555', width=3, tags='obstacle')
+            else:
+                self.create_polygon(*flat, fill='#999999', outline='#555555', width=2, tags='obstacle')
+
     def _draw_real_world_info(self):
         """Display information about the real environment"""
         # No display here as it's handled in _update_info
@@ -723,87 +814,60 @@ class SimulationCanvas(tk.Canvas):
 
     def _draw_ir_signals(self):
         """Draw IR signals between robots"""
-        # Collect sensor and robot positions
-        robot_positions = {}
-        tx_positions = []
-        rx_positions = []
-        
-        for robot in self.simulation.robots:
-            # Save robot position for can_receive_signal
-            robot_positions[robot.id] = {
-                'x': robot.x, 
-                'y': robot.y, 
-                'size': robot.size, 
-                'orientation': robot.orientation
-            }
-            
-            for tx, pos in robot.get_transmitter_positions():
-                tx_positions.append((tx, pos))
-            
-            for rx, pos in robot.get_receiver_positions():
-                rx_positions.append((rx, pos))
-        
-        # Collect obstacle information
-        obstacles = []
-        for robot in self.simulation.robots:
-            robot_polygon = [
-                (robot.x - robot.size/2, robot.y - robot.size/2),
-                (robot.x + robot.size/2, robot.y - robot.size/2),
-                (robot.x + robot.size/2, robot.y + robot.size/2),
-                (robot.x - robot.size/2, robot.y + robot.size/2)
-            ]
-            obstacles.append(robot_polygon)
-        
-        # Draw all valid IR signals
-        from models.ir_sensor import can_receive_signal
-        
-        for tx, tx_pos in tx_positions:
-            for rx, rx_pos in rx_positions:
-                # Skip if same robot
-                if tx.robot_id == rx.robot_id:
-                    continue
-                
-                # Use combined Pathloss-Rician model
-                can_receive, estimated_distance, signal_strength = can_receive_signal(
-                    tx, rx, robot_positions, obstacles)
-                
-                if can_receive:
-                    # Color based on signal strength
-                    color, stipple = self._get_signal_color(signal_strength/100)
-                    
-                    # Line width proportional to signal strength
-                    line_width = max(1, min(3, signal_strength / 30))
-                    
-                    # Draw connection line with glow effect
-                    # First draw a wider faded line as background for glow effect
-                    glow_width = line_width * 1.5
-                    glow_color = f"#{255:02x}{255:02x}{200:02x}"  # Light yellow color
-                    
-                    self.create_line(tx_pos[0], tx_pos[1], rx_pos[0], rx_pos[1], 
-                                   fill=glow_color, width=glow_width, 
-                                   stipple='gray75',  # Add stipple for faded effect
-                                   tags="ir_signal_glow")
-                    
-                    # Then draw main line
-                    self.create_line(tx_pos[0], tx_pos[1], rx_pos[0], rx_pos[1], 
-                                   fill=color, width=line_width, 
-                                   dash=(3, 2) if signal_strength < 40 else "", 
-                                   stipple=stipple, tags="ir_signal")
-                    
-                    # Display strength value with font appropriate to signal strength
-                    mid_x = (tx_pos[0] + rx_pos[0]) / 2
-                    mid_y = (tx_pos[1] + rx_pos[1]) / 2
-                    
-                    # Adjust font size based on signal strength
-                    font_size = max(6, min(9, int(signal_strength / 15)))
-                    
-                    # Only show background for strong enough signals
-                    if signal_strength > 20:
-                        self.create_oval(mid_x-15, mid_y-10, mid_x+15, mid_y+10,
-                                      fill='white', outline='', tags="ir_signal_bg")
-                    
-                    self.create_text(mid_x, mid_y, text=f"{signal_strength:.1f}", 
-                                   fill="black", font=("Arial", font_size), tags="ir_signal")
+        # Links of the last simulation step, computed in one pass by the link engine
+        links = self.simulation.links
+        if links is None:
+            links = self.simulation.link_engine.compute()
+
+        for i in range(len(links)):
+            signal_strength = float(links.strength[i])
+            tx_pos = (float(links.tx_x[i]), float(links.tx_y[i]))
+            rx_pos = (float(links.rx_x[i]), float(links.rx_y[i]))
+
+            # Reflected paths are drawn through their bounce points
+            order = int(links.order[i])
+            points = [tx_pos]
+            for bounce in links.bounces[i, :order].tolist():
+                points.append(tuple(bounce))
+            points.append(rx_pos)
+            coords = [value for point in points for value in point]
+
+            # Color based on signal strength
+            color, stipple = self._get_signal_color(signal_strength/100)
+            
+            # Line width proportional to signal strength
+            line_width = max(1, min(3, signal_strength / 30))
+            
+            # Draw connection line with glow effect
+            # First draw a wider faded line as background for glow effect
+            glow_width = line_width * 1.5
+            glow_color = f"#{255:02x}{255:02x}{200:02x}"  # Light yellow color
+            
+            self.create_line(*coords, 
+                           fill=glow_color, width=glow_width, 
+                           stipple='gray75',  # Add stipple for faded effect
+                           tags="ir_signal_glow")
+            
+            # Then draw main line, dashed for weak or reflected signals
+            self.create_line(*coords, 
+                           fill=color, width=line_width, 
+                           dash=(3, 2) if signal_strength < 40 or order else "", 
+                           stipple=stipple, tags="ir_signal")
+            
+            # Display strength value in the middle of the first leg
+            mid_x = (points[0][0] + points[1][0]) / 2
+            mid_y = (points[0][1] + points[1][1]) / 2
+            
+            # Adjust font size based on signal strength
+            font_size = max(6, min(9, int(signal_strength / 15)))
+            
+            # Only show background for strong enough signals
+            if signal_strength > 20:
+                self.create_oval(mid_x-15, mid_y-10, mid_x+15, mid_y+10,
+                              fill='white', outline='', tags="ir_signal_bg")
+            
+            self.create_text(mid_x, mid_y, text=f"{signal_strength:.1f}", 
+                           fill="black", font=("Arial", font_size), tags="ir_signal")
 
     def _get_signal_color(self, strength):
         """Convert signal strength to color with smooth gradation"""
@@ -876,6 +940,9 @@ class SimulationCanvas(tk.Canvas):
                 self.selected_robot = robot
                 self.dragging = True
                 self.panning = False
+                # Robots in the way are pushed aside, the dragged one follows the mouse
+                if self.simulation.collisions is not None:
+                    self.simulation.collisions.pinned.add(robot.id)
                 self.last_x = event.x
                 self.last_y = event.y
                 self.focus_set()
@@ -910,9 +977,8 @@ class SimulationCanvas(tk.Canvas):
             dx = event.x - self.last_x
             dy = event.y - self.last_y
             
-            # Move all robots (create view panning effect)
-            for robot in self.simulation.robots:
-                robot.move(dx, dy)
+            # Move all robots and obstacles (create view panning effect)
+            self.simulation.pan(dx, dy)
             
             # Update last position
             self.last_x = event.x
@@ -959,12 +1025,11 @@ class SimulationCanvas(tk.Canvas):
             
             # Restore real positions of all robots
             for robot_id, real_x, real_y in robot_real_positions:
-                for robot in self.simulation.robots:
-                    if robot.id == robot_id:
-                        new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
-                        robot.x = new_pixel_x
-                        robot.y = new_pixel_y
-                        break
+                robot = self.simulation.get_robot_by_id(robot_id)
+                if robot:
+                    new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
+                    robot.x = new_pixel_x
+                    robot.y = new_pixel_y
             
             # Restore real positions of path points if any
             if path_points_real or hasattr(self, 'path_manager') and hasattr(self.path_manager, 'waypoints'):
@@ -1018,12 +1083,11 @@ class SimulationCanvas(tk.Canvas):
             
             # Restore real positions of robots
             for robot_id, real_x, real_y in robot_real_positions:
-                for robot in self.simulation.robots:
-                    if robot.id == robot_id:
-                        new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
-                        robot.x = new_pixel_x
-                        robot.y = new_pixel_y
-                        break
+                robot = self.simulation.get_robot_by_id(robot_id)
+                if robot:
+                    new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
+                    robot.x = new_pixel_x
+                    robot.y = new_pixel_y
             
             # Update beam parameters based on real distances
             self.update_beam_distances_from_real()
@@ -1056,12 +1120,11 @@ class SimulationCanvas(tk.Canvas):
             
             # Restore real positions of robots
             for robot_id, real_x, real_y in robot_real_positions:
-                for robot in self.simulation.robots:
-                    if robot.id == robot_id:
-                        new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
-                        robot.x = new_pixel_x
-                        robot.y = new_pixel_y
-                        break
+                robot = self.simulation.get_robot_by_id(robot_id)
+                if robot:
+                    new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
+                    robot.x = new_pixel_x
+                    robot.y = new_pixel_y
             
             # Use same method as zoom_in
             self.update_beam_distances_from_real()
@@ -1092,12 +1155,11 @@ class SimulationCanvas(tk.Canvas):
         
         # Restore real positions of all robots
         for robot_id, real_x, real_y in robot_real_positions:
-            for robot in self.simulation.robots:
-                if robot.id == robot_id:
-                    new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
-                    robot.x = new_pixel_x
-                    robot.y = new_pixel_y
-                    break
+            robot = self.simulation.get_robot_by_id(robot_id)
+            if robot:
+                new_pixel_x, new_pixel_y = self.simulation.real_to_pixel(real_x, real_y)
+                robot.x = new_pixel_x
+                robot.y = new_pixel_y
         
         # Restore real positions of path points if any
         if path_points_real and hasattr(self, 'path_manager') and hasattr(self.path_manager, 'waypoints'):
@@ -1282,9 +1344,8 @@ class SimulationCanvas(tk.Canvas):
         offset_x = canvas_center_x - center_pixel_x
         offset_y = canvas_center_y - center_pixel_y
         
-        # Move all robots
-        for robot in self.simulation.robots:
-            robot.move(offset_x, offset_y)
+        # Move all robots and obstacles
+        self.simulation.pan(offset_x, offset_y)
         
         self.update_canvas()
 
@@ -1418,9 +1479,8 @@ class SimulationCanvas(tk.Canvas):
             dx = event.x - self.last_x
             dy = event.y - self.last_y
             
-            # Move all robots and paths (create view panning effect)
-            for robot in self.simulation.robots:
-                robot.move(dx, dy)
+            # Move all robots, obstacles and paths (create view panning effect)
+            self.simulation.pan(dx, dy)
             
             # Update waypoint positions if any
             if hasattr(self, 'path_manager') and self.path_manager.waypoints:
@@ -1447,6 +1507,8 @@ class SimulationCanvas(tk.Canvas):
         self.delete('preview_line')
         
         # End drag state
+        if self.dragging and self.selected_robot and self.simulation.collisions is not None:
+            self.simulation.collisions.pinned.discard(self.selected_robot.id)
         self.dragging = False
         self.panning = False
         
@@ -1546,6 +1608,30 @@ class SimulationCanvas(tk.Canvas):
                               dash=(max(1, int(3/self.zoom_factor)), max(1, int(3/self.zoom_factor))), 
                               tags='waypoint')
 
+    def load_scenario(self, scenario):
+        """Replace robots, path and formation with those of a scenario"""
+        if self.path_manager.active:
+            self.path_manager.stop()
+        self.drawing_path = False
+        self.selected_robot = None
+        self.delete('waypoint')
+        self.delete('drawing_instructions')
+
+        robots = scenario.apply(self.simulation, self.path_manager)
+        self.waypoints = self.path_manager.waypoints.copy()
+
+        # Use the formation order of the scenario, otherwise sort by distance when following starts
+        formation = scenario.formation_robots(robots)
+        if formation is not None:
+            self.formation_order = formation
+        elif hasattr(self, 'formation_order'):
+            del self.formation_order
+        self.formation_spacing = (scenario.formation or {}).get('spacing')
+
+        self.update_canvas()
+        print(f"Loaded scenario '{scenario.name}' with {len(robots)} robots")
+        return robots
+
     def clear_path(self):
         """Clear current path"""
         if hasattr(self, 'path_manager'):
@@ -1700,11 +1786,11 @@ class SimulationCanvas(tk.Canvas):
             final_y = move_y * following_weight + avoidance_y * avoidance_weight
             
             # Apply the combined movement
-            robot.move(final_x, final_y)
+            robot.drive(final_x, final_y)
             print(f"Robot {robot.id} avoiding collision with other robots while following {robot_ahead.id}")
         else:
             # No obstacles - just follow the robot ahead
-            robot.move(move_x, move_y)
+            robot.drive(move_x, move_y)
 
     def cleanup(self):
         """Clear all before closing the visualization"""
@@ -0,0 +1,157 @@
+import math
+import os
+import zipfile
+import numpy as np
+
+# Rows written per chunk when streaming telemetry to CSV/NPZ
+DEFAULT_CHUNK_ROWS = 4096
+
+WAYPOINT_COLUMNS = ('waypoint', 'reached_time', 'time_to_reach', 'x', 'y', 'error')
+
+
+def path_summary(path_manager):
+    """Calculate deviation and movement metrics for a path run
+
+    Accepts a PathManager or a PathRunSnapshot. Distances are returned in
+    meters, times in seconds and angles in degrees.
+    """
+    telemetry = path_manager.telemetry
+    scale = path_manager.scale
+
+    summary = {
+        'leader_id': path_manager.leader_id if path_manager.leader_id is not None else -1,
+        'scale': scale,
+        'samples': len(telemetry),
+        'sample_stride': telemetry.stride,
+        'waypoints': len(path_manager.waypoints),
+        'waypoints_reached': len(path_manager.waypoint_log),
+        'total_time': telemetry.last('timestamp', 0.0),
+        'total_distance': path_manager.total_distance,
+        'total_rotation': path_manager.total_rotation,
+        'rotation_steps': int(np.count_nonzero(telemetry.column('rotation'))),
+        'max_deviation': path_manager.max_deviation / scale,
+        'mean_deviation': math.nan,
+        'rms_deviation': math.nan,
+    }
+    summary['average_speed'] = (summary['total_distance'] / summary['total_time']
+                                if summary['total_time'] > 0 else 0.0)
+
+    deviation = telemetry.column('deviation')
+    measured = deviation[~np.isnan(deviation)]
+    if measured.size:
+        summary['mean_deviation'] = float(measured.mean()) / scale
+        summary['rms_deviation'] = float(np.sqrt(np.mean(measured * measured))) / scale
+
+    return summary
+
+
+def waypoint_timings(path_manager):
+    """Build an (N, 6) array of waypoint arrival data, see WAYPOINT_COLUMNS
+
+    Positions and errors are in meters.
+    """
+    log = path_manager.waypoint_log
+    table = np.full((len(log), len(WAYPOINT_COLUMNS)), np.nan)
+    if not log:
+        return table
+
+    scale = path_manager.scale
+    table[:, [0, 1, 3, 4]] = log
+    table[:, 2] = np.diff(table[:, 1], prepend=0.0)
+
+    # Distance between the robot and the waypoint it was heading for
+    waypoints = np.asarray(path_manager.waypoints, dtype=np.float64).reshape(-1, 2)
+    index = table[:, 0].astype(np.intp)
+    valid = index < len(waypoints)
+    table[valid, 5] = np.hypot(table[valid, 3] - waypoints[index[valid], 0],
+                               table[valid, 4] - waypoints[index[valid], 1])
+    table[:, 3:] /= scale
+    return table
+
+
+def export_path_data(path_manager, filename, fmt=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Export telemetry, waypoint timings and deviation metrics of a path run
+
+    Works without any UI, so it can be called at the end of batch runs.
+
+    Args:
+        path_manager: PathManager holding the run data
+        filename: Output path; '.csv' or '.npz' selects the format
+        fmt: 'csv' or 'npz' to override the extension
+        chunk_rows: Rows per chunk when streaming telemetry
+
+    Returns:
+        list: Paths of all files written. CSV export writes three files:
+              <name>.csv (telemetry), <name>_waypoints.csv and <name>_summary.csv
+    """
+    if fmt is None:
+        fmt = os.path.splitext(filename)[1].lstrip('.').lower() or 'csv'
+    if fmt == 'csv':
+        return _export_csv(path_manager, filename, chunk_rows)
+    if fmt == 'npz':
+        return _export_npz(path_manager, filename, chunk_rows)
+    raise ValueError(f"Unsupported export format '{fmt}', expected 'csv' or 'npz'")
+
+
+def _export_csv(path_manager, filename, chunk_rows):
+    base, ext = os.path.splitext(filename)
+    ext = ext or '.csv'
+    telemetry_path = base + ext
+    waypoints_path = f"{base}_waypoints{ext}"
+    summary_path = f"{base}_summary{ext}"
+
+    # Telemetry - written straight from the buffer view, one chunk at a time
+    telemetry = path_manager.telemetry
+    data = telemetry.view()
+    with open(telemetry_path, 'w', newline='') as f:
+        f.write(','.join(telemetry.columns) + '\n')
+        for start in range(0, len(data), chunk_rows):
+            np.savetxt(f, data[start:start + chunk_rows], delimiter=',', fmt='%.9g')
+
+    with open(waypoints_path, 'w', newline='') as f:
+        f.write(','.join(WAYPOINT_COLUMNS) + '\n')
+        np.savetxt(f, waypoint_timings(path_manager), delimiter=',', fmt='%.9g')
+
+    with open(summary_path, 'w', newline='') as f:
+        f.write('metric,value\n')
+        for key, value in path_summary(path_manager).items():
+            f.write(f"{key},{value:.9g}\n")
+
+    return [telemetry_path, waypoints_path, summary_path]
+
+
+def _export_npz(path_manager, filename, chunk_rows):
+    if not filename.endswith('.npz'):
+        filename += '.npz'
+
+    telemetry = path_manager.telemetry
+    data = telemetry.view()
+    summary = path_summary(path_manager)
+
+    # Each member is streamed into the zip archive; large columns are written
+    # in chunks so no full-size temporary buffer is created
+    with zipfile.ZipFile(filename, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for i, name in enumerate(telemetry.columns):
+            _write_npy_chunked(archive, f"telemetry/{name}", data[:, i], chunk_rows)
+        _write_npy_chunked(archive, 'waypoints', waypoint_timings(path_manager), chunk_rows)
+        _write_npy_chunked(archive, 'waypoint_columns', np.array(WAYPOINT_COLUMNS), chunk_rows)
+        for key, value in summary.items():
+            _write_npy_chunked(archive, f"summary/{key}", np.asarray(value), chunk_rows)
+
+    return [filename]
+
+
+def _write_npy_chunked(archive, name, array, chunk_rows):
+    """Write one array as a .npy member of an open zip archive"""
+    header = {
+        'descr': np.lib.format.dtype_to_descr(array.dtype),
+        'fortran_order': False,
+        'shape': array.shape,
+    }
+    with archive.open(name + '.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        if array.ndim == 0:
+            f.write(array.tobytes())
+            return
+        for start in range(0, len(array), chunk_rows):
+            f.write(np.ascontiguousarray(array[start:start + chunk_rows]).tobytes())
@@ -40,7 +40,7 @@ def calculate_ir_signal_strength(transmitter, receiver, simulation=None, tx_pos=
     if tx_pos is None:
         if simulation:
             # Find robot with id = transmitter.robot_id
-            tx_robot = next((r for r in simulation.robots if r.id == transmitter.robot_id), None)
+            tx_robot = simulation.get_robot_by_id(transmitter.robot_id)
             if not tx_robot:
                 return 0
             tx_pos = transmitter.get_position(tx_robot.x, tx_robot.y, tx_robot.size, tx_robot.orientation)
@@ -49,7 +49,7 @@ def calculate_ir_signal_strength(transmitter, receiver, simulation=None, tx_pos=
     
     if rx_pos is None:
         if simulation:
-            rx_robot = next((r for r in simulation.robots if r.id == receiver.robot_id), None)
+            rx_robot = simulation.get_robot_by_id(receiver.robot_id)
             if not rx_robot:
                 return 0
             rx_pos = receiver.get_position(rx_robot.x, rx_robot.y, rx_robot.size, rx_robot.orientation)
@@ -75,7 +75,7 @@ def calculate_ir_signal_strength(transmitter, receiver, simulation=None, tx_pos=
     
     # Calculate beam direction of transmitter
     if simulation:
-        tx_robot = next((r for r in simulation.robots if r.id == transmitter.robot_id), None)
+        tx_robot = simulation.get_robot_by_id(transmitter.robot_id)
         if tx_robot:
             beam_direction = transmitter.get_beam_direction(tx_robot.orientation)
         else:
@@ -95,7 +95,7 @@ def calculate_ir_signal_strength(transmitter, receiver, simulation=None, tx_pos=
     
     # --- Check receiver viewing angle ---
     if simulation:
-        rx_robot = next((r for r in simulation.robots if r.id == receiver.robot_id), None)
+        rx_robot = simulation.get_robot_by_id(receiver.robot_id)
         if rx_robot:
             receiver_direction = receiver.get_viewing_direction(rx_robot.orientation)
         else:
@@ -518,4 +518,61 @@ def signal_strength_to_distance_rician(signal_strength, beam_distance, tx_streng
     distance *= noise_factor
     
     # Ensure distance is within reasonable limits
-    return max(0.05, min(beam_distance, distance))
\ No newline at end of file
+    return max(0.05, min(beam_distance, distance))
+
+def distance_to_signal_strength_rician_array(distance, beam_distance, tx_strength, rx_sensitivity, angle_factor, has_los, noise=True):
+    """
+    Array version of distance_to_signal_strength_rician for many links at once
+
+    All arguments are numpy arrays (or scalars) of the same shape, has_los
+    a boolean array. Returns an array of signal strengths (0-100). With
+    noise=False the expected strength is returned, e.g. for likelihoods.
+    """
+    distance = np.asarray(distance, dtype=np.float64)
+    shape = np.broadcast(distance, beam_distance, tx_strength, rx_sensitivity, angle_factor, has_los).shape
+    has_los = np.asarray(has_los)  # LOS-dependent factors are computed before broadcasting
+    gain = np.broadcast_to(tx_strength * angle_factor * (rx_sensitivity / 40.0), shape)
+
+    distance_ratio = np.clip(distance / beam_distance, 0.0, 1.0)
+    signal_factor = (1.0 - distance_ratio) ** 0.6
+    k_factor = np.where(has_los, 10.0, 0.5)
+    combined = k_factor / (k_factor + 1.0) + 0.95 / (k_factor + 1.0)
+    signal_strength = combined * signal_factor * gain
+
+    # Same noise and near-field floor as the scalar model
+    if noise:
+        noise_range = np.where(has_los, 0.5, 1.0)
+        signal_strength = signal_strength + np.random.uniform(-1.0, 1.0, shape) * noise_range
+    min_signal = np.where(distance_ratio < 0.3, 100 - (distance_ratio / 0.3) * 50, 0.0)
+    signal_strength = np.clip(np.maximum(signal_strength, min_signal), 0, 100)
+
+    signal_strength = np.where(distance <= 0.10, gain, signal_strength)
+    return np.where(distance >= beam_distance, 0.0, signal_strength)
+
+def signal_strength_to_distance_rician_array(signal_strength, beam_distance, tx_strength, rx_sensitivity, angle_factor, has_los):
+    """
+    Array version of signal_strength_to_distance_rician
+
+    Inverts the expected strength of distance_to_signal_strength_rician_array
+    exactly, including its near-field floor, so that estimates are unbiased
+    up to the measurement noise. Returns an array of estimated distances (m).
+    """
+    signal_strength = np.asarray(signal_strength, dtype=np.float64)
+    shape = np.broadcast(signal_strength, beam_distance, tx_strength, rx_sensitivity, angle_factor, has_los).shape
+    beam_distance = np.broadcast_to(beam_distance, shape)
+
+    # Main model: strength = combined * gain * (1 - ratio)^0.6
+    k_factor = np.where(has_los, 10.0, 0.5)
+    combined = k_factor / (k_factor + 1.0) + 0.95 / (k_factor + 1.0)
+    gain = combined * tx_strength * angle_factor * (rx_sensitivity / 40.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized_signal = np.clip(np.nan_to_num(signal_strength / gain, nan=0.0), 0.0, 1.0)
+    ratio = 1.0 - normalized_signal ** (1 / 0.6)
+
+    # Near-field floor: strength >= 100 - 50 * ratio / 0.3 within the first 30% of the beam
+    floor_ratio = np.clip((100.0 - signal_strength) * 0.3 / 50.0, 0.0, 0.3)
+    ratio = np.maximum(ratio, floor_ratio)
+
+    distance = beam_distance * ratio * np.random.uniform(0.95, 1.05, shape)
+    distance = np.maximum(0.05, np.minimum(beam_distance, distance))
+    return np.where(signal_strength <= 1, beam_distance * 0.95, distance)
\ No newline at end of file